@@ -0,0 +1,319 @@
+"""Module for serving precomputed answers to anticipated questions.
+
+Build or refresh the index offline:
+
+    python -m src.answer_index --config config.yaml
+
+For every indexed chunk, a local model writes a few questions the chunk
+answers. Each question is answered through the normal retrieval pipeline and
+stored with its embedding, the ids of the chunks behind the answer and their
+content hashes. At query time a question close enough to a stored one is
+answered instantly. Entries are dropped as soon as any of their chunks change.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import re
+from typing import Dict, List, Optional
+
+from src.vectorstore.embeddings import EmbeddingModelMismatchError, check_fingerprint
+from src.vectorstore.vector_store import chunk_id
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "answer_index"
+
+QUESTION_PROMPT = """Write {count} different questions a user might ask that are answered by the documentation excerpt below. Write one question per line and nothing else.
+
+Excerpt:
+{content}
+
+Questions:"""
+
+
+def content_hash(text: str) -> str:
+    """Return a short hash identifying a chunk's content."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def source_key(source: str) -> str:
+    """Return the metadata key marking an entry that depends on a source file."""
+    # Reason: Chroma metadata values must be scalars, so each source becomes a
+    # flag key (like tag_key) that `where` filters can match
+    return "src_" + hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_questions(text: str, limit: int) -> List[str]:
+    """Extract distinct questions from model output.
+
+    Args:
+        text: One question per line, optionally numbered or bulleted
+        limit: Maximum number of questions
+
+    Returns:
+        Cleaned questions in order of appearance
+    """
+    questions, seen = [], set()
+    for line in text.splitlines():
+        question = re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line).strip()
+        if len(question) < 10 or not question.endswith('?') or question.lower() in seen:
+            continue
+        seen.add(question.lower())
+        questions.append(question)
+        if len(questions) == limit:
+            break
+    return questions
+
+
+class AnswerIndex:
+    """Question-answer pairs searchable by question embedding."""
+
+    def __init__(self, vectorstore, max_distance: float = 0.08):
+        """Open (or create) the answer collection next to the document index.
+
+        Args:
+            vectorstore: VectorStore whose embedding model and client are reused
+            max_distance: Largest cosine distance between a new and a stored
+                question for the stored answer to be served
+        """
+        self.vectorstore = vectorstore
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self.collection = self._open()
+
+    def _open(self):
+        """Open the collection, discarding it if built with another embedding model."""
+        client = self.vectorstore.client
+        metadata = {**self.vectorstore.fingerprint, 'hnsw:space': 'cosine'}
+        collection = client.get_or_create_collection(COLLECTION, metadata=metadata)
+        try:
+            check_fingerprint(collection.metadata or {}, self.vectorstore.fingerprint)
+        except EmbeddingModelMismatchError as e:
+            logger.warning(f"Discarding precomputed answers: {e}")
+            client.delete_collection(COLLECTION)
+            collection = client.get_or_create_collection(COLLECTION, metadata=metadata)
+        return collection
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """Find a stored answer to a question.
+
+        Args:
+            query: User's question
+
+        Returns:
+            Dictionary with `question`, `response`, `sources` and `distance`,
+            or None if no stored question is close enough
+        """
+        if self.collection.count() == 0:
+            return None
+        results = self.collection.query(
+            query_embeddings=self.vectorstore.encode_queries([query]),
+            n_results=1,
+            include=['documents', 'metadatas', 'distances']
+        )
+        if not results['ids'][0] or results['distances'][0][0] > self.max_distance:
+            self.misses += 1
+            return None
+        self.hits += 1
+        metadata = results['metadatas'][0][0]
+        logger.info(f"Serving precomputed answer to: {metadata['question']}")
+        return {
+            'question': metadata['question'],
+            'response': results['documents'][0][0],
+            'sources': json.loads(metadata['sources']),
+            'distance': results['distances'][0][0]
+        }
+
+    def add(self, entries: List[Dict]) -> None:
+        """Store answered questions.
+
+        Args:
+            entries: Dictionaries with `question`, `response`, `sources`
+                (chunk metadata), `chunk_hashes` ({chunk id: content hash}),
+                `origin_chunk`, `origin_hash` and `origin_source` (the chunk
+                the question was generated from)
+        """
+        if not entries:
+            return
+        ids, metadatas = [], []
+        for entry in entries:
+            ids.append(content_hash(f"{entry['origin_chunk']}\n{entry['question']}"))
+            metadata = {
+                'question': entry['question'],
+                'sources': json.dumps(entry['sources']),
+                'chunk_hashes': json.dumps(entry['chunk_hashes']),
+                'origin_chunk': entry['origin_chunk'],
+                'origin_hash': entry['origin_hash']
+            }
+            for source in {s['source'] for s in entry['sources']} | {entry['origin_source']}:
+                metadata[source_key(source)] = True
+            metadatas.append(metadata)
+        self.collection.upsert(
+            ids=ids,
+            embeddings=self.vectorstore.encode_queries([entry['question'] for entry in entries]),
+            documents=[entry['response'] for entry in entries],
+            metadatas=metadatas
+        )
+
+    def invalidate_sources(self, sources: List[str]) -> None:
+        """Drop every entry built from chunks of the given source files."""
+        for source in sources:
+            self.collection.delete(where={source_key(source): True})
+        if sources:
+            logger.info(f"Invalidated precomputed answers for {len(sources)} changed files")
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self.vectorstore.client.delete_collection(COLLECTION)
+        self.collection = self._open()
+
+    def _entries(self) -> Dict[str, Dict]:
+        """Return the metadata of every entry by id."""
+        page = self.collection.get(include=['metadatas'])
+        return dict(zip(page['ids'], page['metadatas']))
+
+    def prune(self, current: Dict[str, str]) -> int:
+        """Drop entries whose chunks no longer exist or have changed.
+
+        Args:
+            current: Content hash of every indexed chunk by chunk id
+
+        Returns:
+            Number of entries dropped
+        """
+        stale = []
+        for entry_id, metadata in self._entries().items():
+            chunk_hashes = {**json.loads(metadata['chunk_hashes']),
+                            metadata['origin_chunk']: metadata['origin_hash']}
+            if any(current.get(cid) != digest for cid, digest in chunk_hashes.items()):
+                stale.append(entry_id)
+        if stale:
+            self.collection.delete(ids=stale)
+        return len(stale)
+
+    def covered_chunks(self) -> Dict[str, str]:
+        """Return the content hash each chunk had when its questions were generated."""
+        return {m['origin_chunk']: m['origin_hash'] for m in self._entries().values()}
+
+    def get_stats(self) -> Dict:
+        """Return entry count and lookup hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': self.collection.count(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+def _generate(model, prompts: List[str]) -> List[str]:
+    """Generate responses, batched when the backend supports it."""
+    if model.supports_batching() and len(prompts) > 1:
+        return model.generate_batch(prompts)
+    return [model.generate_response(prompt) for prompt in prompts]
+
+
+def build_answer_index(handler, answer_index: AnswerIndex, questions_per_chunk: int = 3,
+                       batch_size: int = 8, limit: Optional[int] = None) -> Dict:
+    """Generate and answer questions for chunks not covered yet.
+
+    Args:
+        handler: ChatHandler with indexed documents and a loaded model
+        answer_index: Index receiving the entries
+        questions_per_chunk: Questions generated per chunk
+        batch_size: Chunks processed per generation batch
+        limit: Maximum number of chunks to process in this run
+
+    Returns:
+        Counts of pruned entries, processed chunks and stored answers
+    """
+    records = handler.retriever.vectorstore.export_records()
+    current = {cid: content_hash(doc) for cid, doc in zip(records['ids'], records['documents'])}
+    pruned = answer_index.prune(current)
+    covered = answer_index.covered_chunks()
+    pending = [
+        (cid, document, metadata)
+        for cid, document, metadata in zip(records['ids'], records['documents'], records['metadatas'])
+        if covered.get(cid) != current[cid]
+    ][:limit]
+    logger.info(f"Pruned {pruned} stale answers, {len(pending)} chunks need questions")
+
+    answered = 0
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        outputs = _generate(handler.model, [
+            QUESTION_PROMPT.format(count=questions_per_chunk, content=document) for _, document, _ in batch
+        ])
+        items = [
+            (question, cid, metadata['source'])
+            for (cid, _, metadata), output in zip(batch, outputs)
+            for question in parse_questions(output, questions_per_chunk)
+        ]
+        if not items:
+            continue
+        contexts = handler.retriever.retrieve_batch([question for question, _, _ in items])
+        prepared = [handler.prepare_prompt(question, chunks) for (question, _, _), chunks in zip(items, contexts)]
+        responses = _generate(handler.model, [prompt for prompt, _, _ in prepared])
+
+        entries = []
+        for (question, cid, source), (_, chunks, _), response in zip(items, prepared, responses):
+            entries.append({
+                'question': question,
+                'response': handler.format_response(response, chunks),
+                'sources': [chunk['metadata'] for chunk in chunks],
+                # Reason: compressed or merged chunks differ from the stored
+                # text, so hash what is stored under each chunk id
+                'chunk_hashes': {
+                    chunk_id(chunk['metadata']): current.get(chunk_id(chunk['metadata']), '')
+                    for chunk in chunks
+                },
+                'origin_chunk': cid,
+                'origin_hash': current[cid],
+                'origin_source': source
+            })
+        answer_index.add(entries)
+        answered += len(entries)
+        logger.info(f"Processed {i + len(batch)}/{len(pending)} chunks, {answered} answers stored")
+    return {'pruned': pruned, 'chunks': len(pending), 'answers': answered}
+
+
+def main():
+    """Command line entry point."""
+    import yaml
+    from src.chat_handler import ChatHandler
+
+    parser = argparse.ArgumentParser(description="Precompute answers to likely questions per chunk")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--limit", type=int, help="Maximum number of chunks to process")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    logging.basicConfig(
+        level=getattr(logging, config.get('logging', {}).get('level', 'INFO').upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    settings = config.get('answer_index', {})
+
+    handler = ChatHandler(config)
+    handler.process_documents()
+    handler.model.load_model(settings.get('model') or config['active_model'])
+    answer_index = handler.answer_index or AnswerIndex(
+        handler.retriever.vectorstore, settings.get('max_distance', 0.08)
+    )
+    summary = build_answer_index(
+        handler, answer_index,
+        questions_per_chunk=settings.get('questions_per_chunk', 3),
+        batch_size=settings.get('batch_size', 8),
+        limit=args.limit
+    )
+    print(
+        f"Pruned {summary['pruned']} stale answers, processed {summary['chunks']} chunks, "
+        f"stored {summary['answers']} answers ({answer_index.get_stats()['entries']} total)"
+    )
+
+
+if __name__ == "__main__":
+    main()
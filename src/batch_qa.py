@@ -0,0 +1,225 @@
+"""Offline batch question answering from a JSONL file.
+
+Usage:
+    python -m src.batch_qa questions.jsonl answers.jsonl [--config config.yaml]
+
+Each input line is a JSON object with a `question` and an optional `id`
+(the line number is used otherwise). Answers are appended to the output file
+as they are produced, so an interrupted run resumes where it stopped.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterator, List, Set
+
+import yaml
+
+from src.chat_handler import ChatHandler
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # Queue sentinel marking the end of the input
+
+
+def read_questions(path: str) -> Iterator[Dict]:
+    """Yield questions from a JSONL file.
+
+    Args:
+        path: Input JSONL file
+
+    Yields:
+        Dictionaries with `id` and `question`
+    """
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            yield {'id': str(item.get('id', line_number)), 'question': item['question']}
+
+
+def load_completed_ids(path: str) -> Set[str]:
+    """Return ids already answered in an output file and drop a torn last line.
+
+    Args:
+        path: Output JSONL file from a previous run
+
+    Returns:
+        Set of completed ids
+    """
+    if not os.path.exists(path):
+        return set()
+    completed, valid_lines = set(), []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                completed.add(json.loads(line)['id'])
+                valid_lines.append(line if line.endswith('\n') else line + '\n')
+            except (json.JSONDecodeError, KeyError):
+                logger.warning("Dropping incomplete output line from interrupted run")
+    # Reason: an interrupted write can leave a partial line that would
+    # corrupt the next appended record.
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(valid_lines)
+    return completed
+
+
+def batched(items: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    """Group an iterator into lists of at most `size` items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BatchAnswerer:
+    """Answers questions in batches with retrieval overlapped with generation."""
+
+    def __init__(self, handler: ChatHandler, batch_size: int = 8, k: int = 3):
+        """Initialize with a ready ChatHandler.
+
+        Args:
+            handler: ChatHandler with indexed documents
+            batch_size: Questions retrieved and generated together
+            k: Chunks retrieved per question
+        """
+        self.handler = handler
+        self.batch_size = batch_size
+        self.k = k
+
+    def _retrieve(self, batches: Iterator[List[Dict]], prepared: queue.Queue):
+        """Producer thread: retrieve and build prompts ahead of generation."""
+        try:
+            for batch in batches:
+                start = time.perf_counter()
+                contexts = self.handler.retriever.retrieve_batch(
+                    [item['question'] for item in batch], k=self.k
+                )
+                per_item = (time.perf_counter() - start) / len(batch)
+                for item, chunks in zip(batch, contexts):
+                    prompt_start = time.perf_counter()
+                    item['prompt'], item['chunks'], item['compression'] = \
+                        self.handler.prepare_prompt(item['question'], chunks)
+                    item['retrieval_seconds'] = per_item + time.perf_counter() - prompt_start
+                prepared.put(batch)
+        except Exception as e:
+            prepared.put(e)
+        finally:
+            prepared.put(_DONE)
+
+    def _generate(self, batch: List[Dict]) -> List[str]:
+        """Generate answers for a batch and record per-item generation time."""
+        model = self.handler.model
+        if model.supports_batching() and len(batch) > 1:
+            start = time.perf_counter()
+            responses = model.generate_batch([item['prompt'] for item in batch])
+            per_item = (time.perf_counter() - start) / len(batch)
+            for item in batch:
+                item['generation_seconds'] = per_item
+            return responses
+
+        responses = []
+        for item in batch:
+            start = time.perf_counter()
+            responses.append(model.generate_response(item['prompt']))
+            item['generation_seconds'] = time.perf_counter() - start
+        return responses
+
+    def run(self, questions: Iterator[Dict], output_path: str) -> Dict:
+        """Answer all questions and append results to the output file.
+
+        Args:
+            questions: Questions not answered yet
+            output_path: Output JSONL file
+
+        Returns:
+            Throughput summary
+        """
+        if self.handler.model.llm is None:
+            self.handler.model.load_model()
+
+        # Reason: a bounded queue lets retrieval run one batch ahead so the
+        # model never waits for embedding/search, without unbounded memory.
+        prepared: queue.Queue = queue.Queue(maxsize=2)
+        producer = threading.Thread(
+            target=self._retrieve,
+            args=(batched(questions, self.batch_size), prepared),
+            name="batch-retrieval",
+            daemon=True
+        )
+        start = time.perf_counter()
+        producer.start()
+
+        answered = completion_tokens = 0
+        with open(output_path, 'a', encoding='utf-8') as out:
+            while (batch := prepared.get()) is not _DONE:
+                if isinstance(batch, Exception):
+                    raise batch
+                for item, response in zip(batch, self._generate(batch)):
+                    record = {
+                        'id': item['id'],
+                        'question': item['question'],
+                        'answer': response,
+                        'sources': [chunk['metadata'] for chunk in item['chunks']],
+                        'prompt_tokens': len(item['prompt'].split()),
+                        'completion_tokens': len(response.split()),
+                        'retrieval_seconds': round(item['retrieval_seconds'], 4),
+                        'generation_seconds': round(item['generation_seconds'], 4)
+                    }
+                    out.write(json.dumps(record) + '\n')
+                    answered += 1
+                    completion_tokens += record['completion_tokens']
+                out.flush()  # Persist progress after every batch for resuming
+                logger.info(f"Answered {answered} questions")
+
+        elapsed = time.perf_counter() - start
+        return {
+            'answered': answered,
+            'seconds': elapsed,
+            'questions_per_second': answered / elapsed if elapsed else 0.0,
+            'completion_tokens_per_second': completion_tokens / elapsed if elapsed else 0.0
+        }
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Answer questions from a JSONL file offline")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"question\"} object per line")
+    parser.add_argument("output", help="JSONL file answers are appended to")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("-k", type=int, default=3, help="Chunks retrieved per question")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    logging.basicConfig(
+        level=getattr(logging, config.get('logging', {}).get('level', 'INFO').upper()),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    completed = load_completed_ids(args.output)
+    if completed:
+        logger.info(f"Resuming: {len(completed)} questions already answered")
+    pending = (q for q in read_questions(args.input) if q['id'] not in completed)
+
+    handler = ChatHandler(config)
+    handler.process_documents()
+    summary = BatchAnswerer(handler, batch_size=args.batch_size, k=args.k).run(pending, args.output)
+    print(
+        f"Answered {summary['answered']} questions in {summary['seconds']:.1f}s "
+        f"({summary['questions_per_second']:.2f} questions/s, "
+        f"{summary['completion_tokens_per_second']:.1f} tokens/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
 """Module for handling chat interactions."""
 import logging
-from typing import Dict, List
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 from src.models.model_manager import ModelManager
 from src.document_loader import DocumentLoader
 from src.retriever import Retriever
+from src.context_compressor import ContextCompressor
+from src.answer_index import AnswerIndex
+from src.reindexer import BackgroundReindexer, open_live_index
+from src.vectorstore.generations import index_settings, save_active_index
+from src.vectorstore.manifest import build_manifest, diff_manifest
+from src.vectorstore.snapshot import import_snapshot
+from src.utils.profiler import RequestProfiler
+from src.utils.config_watcher import diff_config
+from src.utils.rw_lock import ReadWriteLock
+from src.utils.citations import format_sources
 
 class ChatHandler:
     """Coordinates chat interactions between components."""
@@ -15,39 +28,341 @@ class ChatHandler:
         logger.info("Initializing ChatHandler with config")
         self.config = config
         self.model = ModelManager(config)
+        self.reindexer = None
+        if config.get('reindex', {}).get('background', False):
+            self.retriever, self.index_config = open_live_index(config)
+        else:
+            self.retriever, self.index_config = Retriever(config['vectorstore_path'], config=config), config
+        # Reason: rebuild only after the live index has been synced
+        self._reindex_target = config if index_settings(self.index_config) != index_settings(config) else None
         self.loader = DocumentLoader(
             config['docs_dir'],
-            chunk_size=config['chunk_size'],
-            chunk_overlap=config['chunk_overlap']
+            chunk_size=self.index_config['chunk_size'],
+            chunk_overlap=self.index_config['chunk_overlap']
         )
-        self.retriever = Retriever(config['vectorstore_path'])
         self._current_model = None  # Track current model
-
+        self.compressor = self._init_compressor(config.get('context_compression', {}))
+        self.answer_index = self._init_answer_index(config.get('answer_index', {}))
+        self._warmup_thread = None
+        self._model_ready = threading.Event()
+        self._documents_ready = threading.Event()
+        self.warmup_error = None
+        self.profiler = RequestProfiler.from_config(config.get('profiling', {}))
+        # Reason: queries read the model and index while config changes and
+        # syncs replace them from the watcher and rebuild threads
+        self._state_lock = ReadWriteLock()
         
         logger.info("ChatHandler components initialized")
 
+    def start_reindex(self, config: Dict) -> BackgroundReindexer:
+        """
+        Rebuild the index with new embedding or chunk settings in the background.
+
+        Queries keep using the live index until the new generation is
+        complete; a rebuild for other settings that is still running is
+        cancelled first.
+
+        Args:
+            config: Application config with the new settings
+
+        Returns:
+            The running BackgroundReindexer
+        """
+        if self.reindexer and self.reindexer.is_running():
+            if self.reindexer.settings == index_settings(config):
+                return self.reindexer
+            self.reindexer.cancel()
+            self.reindexer.join()
+        self.reindexer = BackgroundReindexer(self, config, config.get('reindex', {}))
+        self.reindexer.start()
+        return self.reindexer
+
+    def reindex_progress(self) -> Optional[Dict]:
+        """Return the progress of the latest background rebuild, or None if there was none."""
+        return self.reindexer.progress() if self.reindexer else None
+
+    def switch_index(self, retriever: Retriever, config: Dict) -> bool:
+        """
+        Make a completely built index generation the live one.
+
+        Running queries finish on the old generation first.
+
+        Args:
+            retriever: Retriever over the new generation
+            config: Config the generation was built with
+
+        Returns:
+            False if the config changed to other index settings meanwhile
+            and the generation was not switched to
+        """
+        with self._state_lock.write():
+            if index_settings(config) != index_settings(self.config):
+                return False
+            vectorstore = retriever.vectorstore
+            save_active_index(config['vectorstore_path'], vectorstore.generation, index_settings(config))
+            self.retriever = retriever
+            self.index_config = config
+            self.loader.chunk_size = config['chunk_size']
+            self.loader.chunk_overlap = config['chunk_overlap']
+            # Reason: both hold the embedding model of the old generation
+            self.compressor = self._init_compressor(self.config.get('context_compression', {}))
+            self.answer_index = self._init_answer_index(self.config.get('answer_index', {}))
+            if self.answer_index:
+                # Stored answers cite chunks of the old generation
+                self.answer_index.clear()
+        # Catch up with files changed while the rebuild ran; this also
+        # updates the index version, so cached responses are not reused
+        self.process_documents()
+        return True
+
+    def _init_compressor(self, compression_config: Dict):
+        """
+        Create the context compressor if enabled in config.
+
+        Args:
+            compression_config: The `context_compression` config section
+
+        Returns:
+            ContextCompressor instance or None when disabled
+        """
+        if not compression_config.get('enabled', False):
+            return None
+        # Reuse the embedding model already loaded by the vector store
+        return ContextCompressor(
+            self.retriever.vectorstore.embedding_model,
+            token_budget=compression_config.get('token_budget', 256),
+            min_sentence_chars=compression_config.get('min_sentence_chars', 20),
+            prefill_tokens_per_second=compression_config.get('prefill_tokens_per_second', 50.0)
+        )
+
+    def _init_answer_index(self, answer_config: Dict):
+        """
+        Open the precomputed answer index if enabled in config.
+
+        Args:
+            answer_config: The `answer_index` config section
+
+        Returns:
+            AnswerIndex instance or None when disabled
+        """
+        if not answer_config.get('enabled', False):
+            return None
+        return AnswerIndex(self.retriever.vectorstore, max_distance=answer_config.get('max_distance', 0.08))
+
+    def apply_config(self, new_config: Dict) -> Dict:
+        """
+        Apply a changed configuration to the running components.
+
+        Only what changed is touched: affected models are reloaded or
+        unloaded, documents are re-chunked and re-embedded only when the
+        chunking settings or the documents directory changed, and the index
+        and response cache are left alone otherwise. Running queries finish
+        first and new ones wait until the changes are applied.
+
+        Args:
+            new_config: Validated configuration from utils.config_loader
+
+        Returns:
+            Description of the applied changes, see diff_config()
+        """
+        with self._state_lock.write():
+            changes, rebuild = self._apply_changes(new_config)
+        if rebuild:
+            self.start_reindex(new_config)
+        elif changes['chunking'] or changes['docs_dir']:
+            # The manifest diff re-indexes everything if chunking changed and
+            # only new or changed files if just the directory changed
+            self.process_documents()
+        logger.info(f"Applied config changes: {changes}")
+        return changes
+
+    def _apply_changes(self, new_config: Dict) -> Tuple[Dict, bool]:
+        """Apply a changed configuration except for re-indexing, see apply_config().
+
+        Returns:
+            Tuple of (changes, whether a background rebuild is needed)
+        """
+        changes = diff_config(self.config, new_config)
+        if changes['logging']:
+            level = new_config['logging']['level'].upper()
+            logging.getLogger().setLevel(getattr(logging, level))
+            logger.info(f"Log level set to {level}")
+
+        if changes['models'] or changes['active_model']:
+            # Reason: keep a model picked in the UI unless the config names a
+            # new active model or removes the picked one
+            active_model = self.model.active_model
+            if changes['active_model'] or active_model not in new_config['models']:
+                active_model = new_config['active_model']
+            # Reason: worker pools started by the reload copy the model's config
+            self.model.config = new_config
+            self.model.apply_model_config(new_config['models'], active_model)
+            self._current_model = self.model.active_model
+        self.model.config = new_config
+
+        if 'context_compression' in changes['sections']:
+            self.compressor = self._init_compressor(new_config.get('context_compression', {}))
+        if 'answer_index' in changes['sections']:
+            self.answer_index = self._init_answer_index(new_config.get('answer_index', {}))
+        background = new_config.get('reindex', {}).get('background', False)
+        rebuild = background and index_settings(new_config) != index_settings(self.index_config)
+        if not rebuild and self.reindexer and self.reindexer.is_running():
+            # The live index matches the config again
+            self.reindexer.cancel()
+        if 'profiling' in changes['sections']:
+            profiling = new_config.get('profiling', {})
+            self.profiler.configure(**{
+                key: profiling[key] for key in self.profiler.settings() if key in profiling
+            })
+
+        if changes['restart_required']:
+            logger.warning(f"Config changes to {changes['restart_required']} take effect after a restart")
+        self.config = new_config
+
+        if rebuild:
+            self.loader.docs_dir = Path(new_config['docs_dir'])
+        elif changes['chunking'] or changes['docs_dir']:
+            self.index_config = new_config
+            self.loader.docs_dir = Path(new_config['docs_dir'])
+            self.loader.chunk_size = new_config['chunk_size']
+            self.loader.chunk_overlap = new_config['chunk_overlap']
+        return changes, rebuild
+
+    def start_warmup(self):
+        """
+        Load the active model in a background thread.
+
+        Meant to run while process_documents() indexes documents, so startup
+        takes as long as the slower of the two instead of their sum.
+        """
+        if self._warmup_thread is not None or self._model_ready.is_set():
+            return
+        self._warmup_thread = threading.Thread(target=self._warmup, name="model-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    def _warmup(self):
+        """Thread target that warms up the model and records the outcome."""
+        try:
+            self.model.warm_up()
+        except Exception as e:
+            logger.error(f"Model warm-up failed: {e}")
+            self.warmup_error = str(e)
+        finally:
+            # Reason: set even on failure so gated queries fall back to lazy
+            # loading instead of waiting forever.
+            self._model_ready.set()
+
+    def readiness(self) -> Dict:
+        """
+        Report startup progress.
+
+        Returns:
+            Dictionary with `model` and `documents` readiness flags and the
+            warm-up `error`, if any
+        """
+        return {
+            'model': self._model_ready.is_set(),
+            'documents': self._documents_ready.is_set(),
+            'error': self.warmup_error
+        }
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until model warm-up and document indexing have finished.
+
+        Args:
+            timeout: Maximum seconds to wait for each step (None waits forever)
+
+        Returns:
+            True if both steps finished
+        """
+        model_ready = self._warmup_thread is None or self._model_ready.wait(timeout)
+        return model_ready and self._documents_ready.wait(timeout)
+
     def process_documents(self):
-        """Process documents.""" 
+        """
+        Index new and changed documents.
+
+        When the vector store is empty and a snapshot is configured, the
+        snapshot is imported first so only files changed since it was taken
+        need to be embedded. Queries wait while the index is being changed.
+        """
+        with self._state_lock.write():
+            try:
+                self._sync_index()
+            finally:
+                # Reason: release gated queries even if indexing failed
+                self._documents_ready.set()
+        # Reason: outside the lock, since start_reindex() waits for a
+        # cancelled rebuild that may be waiting for the lock to switch
+        if self._reindex_target is not None:
+            config, self._reindex_target = self._reindex_target, None
+            self.start_reindex(config)
+
+    def _sync_index(self):
+        """Bring the vector store in line with the documents on disk."""
         logger.info("Processing documents")
+        vectorstore = self.retriever.vectorstore
+        indexed_manifest = {}
+        if vectorstore._has_documents():
+            indexed_manifest = vectorstore.load_manifest()
+        else:
+            if self.answer_index:
+                # Reason: stored answers cite chunks of an index that is gone
+                self.answer_index.clear()
+            snapshot_path = self.config.get('snapshot', {}).get('path')
+            if snapshot_path and os.path.exists(snapshot_path):
+                indexed_manifest = import_snapshot(vectorstore, snapshot_path)
+
         documents = self.loader.load_documents()
-        chunks = self.loader.chunk_documents(documents)
-        self.retriever.store_documents(chunks)
+        manifest = build_manifest(documents, self.loader.chunk_size, self.loader.chunk_overlap)
+        changed, removed = diff_manifest(indexed_manifest, manifest)
+        vectorstore.delete_sources(changed + removed)
+        if self.answer_index:
+            self.answer_index.invalidate_sources(changed + removed)
+
+        changed_sources = set(changed)
+        chunks = []
+        if changed_sources:
+            chunks = self.loader.chunk_documents(
+                [doc for doc in documents if doc['metadata']['source'] in changed_sources]
+            )
+        if chunks:
+            self.retriever.store_documents(chunks)
+        vectorstore.save_manifest(manifest)
+        # New index content invalidates cached responses
+        self.model.set_index_version(vectorstore.index_version())
         self._current_model = self.model.active_model
-        logger.info(f"Loaded {len(documents)} documents and stored {len(chunks)} chunks")
+        logger.info(
+            f"Loaded {len(documents)} documents: re-indexed {len(changed)} files "
+            f"({len(chunks)} chunks), removed {len(removed)} files"
+        )
         
-    def process_query(self, query: str) -> Dict:
+    def process_query(self, query: str, scope: Optional[Dict] = None, profile: bool = False) -> Dict:
         """
         Process user query through full RAG pipeline.
         
         Args:
             query: User's input question/message
+            scope: Optional retrieval filters on `source`, `file_name`,
+                `section` or `tags`
+            profile: Capture a profile of this request regardless of the
+                profiler settings
             
         Returns:
             Dictionary containing:
             - response: Generated answer
             - sources: List of source documents used
             - tokens: Token usage information
+            - compression: Context compression statistics (if enabled)
+            - precomputed: Matched stored question (if served from the
+              answer index)
         """
+        with self.profiler.capture(query, force=profile):
+            return self._run_query(query, scope)
+
+    def _run_query(self, query: str, scope: Optional[Dict]) -> Dict:
+        """Run retrieval, prompt building and generation for process_query()."""
         logger.info(f"Processing query: {query}")
         
         # Handle empty query
@@ -58,32 +373,77 @@ class ChatHandler:
                 'tokens': 0
             }
             
-        # Retrieve relevant context (no document reloading occurs here)
-        context_chunks = self.retriever.retrieve_relevant_chunks(query)
-        logger.info(f"Found {len(context_chunks)} relevant chunks from vector store")
-        
-        # Format prompt with context
-        prompt = self._format_prompt(query, context_chunks)
+        # Gate queries until background warm-up has finished
+        if self._warmup_thread is not None:
+            self.wait_until_ready()
+
+        # Reason: the model and index must not change while answering
+        with self._state_lock.read():
+            # Anticipated questions are answered without retrieval or generation
+            if self.answer_index and not scope:
+                precomputed = self.answer_index.lookup(query)
+                if precomputed:
+                    return {
+                        'response': precomputed['response'],
+                        'sources': precomputed['sources'],
+                        'tokens': 0,
+                        'compression': None,
+                        'precomputed': {
+                            'question': precomputed['question'],
+                            'distance': precomputed['distance']
+                        }
+                    }
+            
+            # Retrieve relevant context (no document reloading occurs here)
+            scope_kwargs = {'scope': scope} if scope else {}
+            context_chunks = self.retriever.retrieve_relevant_chunks(query, **scope_kwargs)
+            logger.info(f"Found {len(context_chunks)} relevant chunks from vector store")
+
+            # Compress context and format prompt
+            prompt, context_chunks, compression_stats = self.prepare_prompt(query, context_chunks)
         
-        # Ensure model is loaded and get response
-        if not hasattr(self.model, 'llm') or self.model.llm is None:
-            logger.info("Loading LLM model")
-            self.model.load_model()
-        logger.info("Generating response from LLM")
-        response = self.model.generate_response(prompt)
-        logger.info(f"Generated response with {len(response.split())} tokens")
+            # Ensure model is loaded and get response
+            if not hasattr(self.model, 'llm') or self.model.llm is None:
+                logger.info("Loading LLM model")
+                self.model.load_model()
+            logger.info("Generating response from LLM")
+            response = self.model.generate_response(prompt)
+            logger.info(f"Generated response with {len(response.split())} tokens")
         
-        return {
-            'response': self.format_response(response, context_chunks),
-            'sources': [chunk['metadata'] for chunk in context_chunks],
-            'tokens': len(prompt.split()) + len(response.split())
-        }
+            return {
+                'response': self.format_response(response, context_chunks),
+                'sources': [chunk['metadata'] for chunk in context_chunks],
+                'tokens': len(prompt.split()) + len(response.split()),
+                'compression': compression_stats
+            }
         
+    def prepare_prompt(self, query: str, context_chunks: List[Dict]) -> Tuple[str, List[Dict], Optional[Dict]]:
+        """
+        Compress retrieved context (if enabled) and build the LLM prompt.
+
+        Args:
+            query: User's question
+            context_chunks: Retrieved chunks
+
+        Returns:
+            Tuple of (prompt, chunks used in the prompt, compression stats or None)
+        """
+        # Keep only the sentences that matter to shorten LLM prefill
+        compression_stats = None
+        if self.compressor and context_chunks:
+            context_chunks, compression_stats = self.compressor.compress(query, context_chunks)
+        return self._format_prompt(query, context_chunks), context_chunks, compression_stats
+
     def _format_prompt(self, query: str, context: List[Dict]) -> str:
         """Format prompt with context and query."""
+        # Reason: ordering by position instead of distance keeps the token
+        # prefix identical for queries that retrieve the same chunks, so
+        # llama.cpp can reuse the prefill (see models/prefix_cache.py)
+        ordered = sorted(context, key=lambda c: (c['metadata'].get('source', ''),
+                                                 c['metadata'].get('chunk_start', 0)))
         context_str = "\n".join(
             f"Source: {c['metadata']['source']}\nContent: {c['content']}"
-            for c in context
+            for c in ordered
         )
         return f"""Answer the question using only the provided context.
         
@@ -121,37 +481,5 @@ Answer:"""
         return f"{cited_response}\n\n### Sources\n{formatted_sources}"
 
     def _format_sources(self, sources: List[Dict]) -> str:
-        """
-        Format source references into clean bullet points.
-        
-        Args:
-            sources: List of source metadata dictionaries
-            
-        Returns:
-            Formatted markdown string with clean source references
-        """
-        formatted = []
-        for i, source in enumerate(sources, 1):
-            # Clean source name (remove path and extension)
-            source_name = source.get('source', '')
-            if not source_name and 'metadata' in source:
-                source_name = source['metadata'].get('source', '')
-            
-            if not source_name:
-                logger.warning(f"Missing source name in document metadata: {source}")
-                source_name = "Document"
-            else:
-                if '/' in source_name:
-                    source_name = source_name.split('/')[-1]
-                if '.' in source_name:
-                    source_name = source_name.split('.')[0]
-                source_name = source_name.replace('_', ' ').title()
-
-            # Get excerpt
-            excerpt = source.get('content', '')[:100] + ('...' if len(source.get('content', '')) > 100 else '')
-            
-            formatted.append(
-                f"- [^{i}] **{source_name}**\n  {excerpt}"
-            )
-            
-        return "\n".join(formatted)
+        """Format source references into clean bullet points, see utils.citations."""
+        return format_sources(sources)
@@ -0,0 +1,143 @@
+"""Module for extractive compression of retrieved context."""
+import logging
+import re
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+class ContextCompressor:
+    """Keeps only the retrieved sentences that best match the query."""
+
+    def __init__(self, embedding_model, token_budget: int = 256,
+                 min_sentence_chars: int = 20,
+                 prefill_tokens_per_second: float = 50.0):
+        """Initialize with an embedding model and compression settings.
+
+        Args:
+            embedding_model: Loaded SentenceTransformer used by the vector store
+            token_budget: Maximum number of context tokens to keep
+            min_sentence_chars: Sentences shorter than this are ignored
+            prefill_tokens_per_second: Measured prompt-eval speed of the LLM,
+                used to estimate the prefill time saved
+        """
+        self.embedding_model = embedding_model
+        self.token_budget = token_budget
+        self.min_sentence_chars = min_sentence_chars
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Approximate token count, consistent with ChatHandler token usage."""
+        return len(text.split())
+
+    def split_sentences(self, text: str) -> List[str]:
+        """Split chunk text into sentences on line breaks and end punctuation.
+
+        Args:
+            text: Chunk content
+
+        Returns:
+            List of sentences long enough to be worth scoring
+        """
+        sentences = []
+        for line in text.splitlines():
+            for sentence in SENTENCE_BOUNDARY.split(line.strip()):
+                sentence = sentence.strip()
+                if len(sentence) >= self.min_sentence_chars:
+                    sentences.append(sentence)
+        return sentences
+
+    def compress(self, query: str, chunks: List[Dict]) -> Tuple[List[Dict], Dict]:
+        """Reduce retrieved chunks to the sentences most similar to the query.
+
+        Args:
+            query: User's question
+            chunks: Retrieved chunks with content and metadata
+
+        Returns:
+            Tuple of (compressed chunks, compression statistics). Chunks
+            without any selected sentence are dropped.
+        """
+        start = time.perf_counter()
+        original_tokens = sum(self.count_tokens(c['content']) for c in chunks)
+
+        candidates = []  # (chunk index, sentence index, sentence)
+        for chunk_idx, chunk in enumerate(chunks):
+            for sent_idx, sentence in enumerate(self.split_sentences(chunk['content'])):
+                candidates.append((chunk_idx, sent_idx, sentence))
+
+        if not candidates or original_tokens <= self.token_budget:
+            return chunks, self._build_stats(original_tokens, original_tokens,
+                                             len(candidates), len(candidates), start)
+
+        # Reason: one encode call for query and sentences keeps the batch on
+        # the already-loaded model instead of paying per-sentence overhead.
+        embeddings = self.embedding_model.encode(
+            [query] + [c[2] for c in candidates],
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        embeddings = np.asarray(embeddings)
+        scores = embeddings[1:] @ embeddings[0]
+
+        selected = set()
+        used_tokens = 0
+        for idx in np.argsort(-scores):
+            tokens = self.count_tokens(candidates[idx][2])
+            if used_tokens + tokens > self.token_budget and selected:
+                continue
+            selected.add(int(idx))
+            used_tokens += tokens
+            if used_tokens >= self.token_budget:
+                break
+
+        # Rebuild chunks keeping original sentence order for readability
+        kept_by_chunk: Dict[int, List[str]] = {}
+        for idx in sorted(selected, key=lambda i: candidates[i][:2]):
+            chunk_idx, _, sentence = candidates[idx]
+            kept_by_chunk.setdefault(chunk_idx, []).append(sentence)
+
+        compressed = [
+            {**chunks[chunk_idx], 'content': " ".join(sentences)}
+            for chunk_idx, sentences in sorted(kept_by_chunk.items())
+        ]
+        stats = self._build_stats(original_tokens, used_tokens,
+                                  len(candidates), len(selected), start)
+        logger.info(
+            f"Compressed context from {original_tokens} to {used_tokens} tokens "
+            f"(ratio {stats['ratio']:.2f}, est. prefill saved "
+            f"{stats['prefill_seconds_saved']:.2f}s)"
+        )
+        return compressed, stats
+
+    def _build_stats(self, original_tokens: int, compressed_tokens: int,
+                     total_sentences: int, kept_sentences: int, start: float) -> Dict:
+        """Assemble compression statistics for reporting.
+
+        Args:
+            original_tokens: Context tokens before compression
+            compressed_tokens: Context tokens after compression
+            total_sentences: Number of candidate sentences scored
+            kept_sentences: Number of sentences kept
+            start: perf_counter value when compression started
+
+        Returns:
+            Dictionary with token counts, ratio and estimated prefill savings
+        """
+        tokens_saved = max(original_tokens - compressed_tokens, 0)
+        return {
+            'original_tokens': original_tokens,
+            'compressed_tokens': compressed_tokens,
+            'ratio': compressed_tokens / original_tokens if original_tokens else 1.0,
+            'sentences_total': total_sentences,
+            'sentences_kept': kept_sentences,
+            'tokens_saved': tokens_saved,
+            'prefill_seconds_saved': tokens_saved / self.prefill_tokens_per_second,
+            'compression_seconds': time.perf_counter() - start
+        }
@@ -1,11 +1,18 @@
 """Module for loading and processing markdown documents."""
 import logging
+import re
 import time
 from pathlib import Path
 from typing import List, Dict, Optional, Callable
 
 logger = logging.getLogger(__name__)
 
+# Bumped whenever chunk boundaries change so existing indexes are rebuilt
+CHUNKER_VERSION = 2
+
+HEADING_PATTERN = re.compile(r'^#{1,6}\s+(.+?)\s*#*$', re.MULTILINE)
+FRONT_MATTER_PATTERN = re.compile(r'\A---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+
 WATCHDOG_AVAILABLE = False
 try:
     from watchdog.observers import Observer
@@ -29,6 +36,10 @@ if WATCHDOG_AVAILABLE:
             if not event.is_directory and event.src_path.endswith('.md'):
                 self.callback(Path(event.src_path))
 
+def tag_key(tag: str) -> str:
+    """Return the metadata key marking a chunk with a tag."""
+    return "tag_" + re.sub(r'\W+', '_', tag.strip().lower())
+
 class DocumentLoader:
     """Handles loading and preprocessing of markdown documents."""
     
@@ -57,7 +68,8 @@ class DocumentLoader:
         logger.info(f"Loading markdown documents from {self.docs_dir}")
         documents = []
         try:
-            md_files = list(self.docs_dir.glob('*.md'))
+            # Include subdirectories, e.g. one directory per product manual
+            md_files = sorted(self.docs_dir.rglob('*.md'))
             if not md_files:
                 logger.warning(f"No markdown files found in {self.docs_dir}")
                 return documents
@@ -76,7 +88,8 @@ class DocumentLoader:
                             'content': content,
                             'metadata': {
                                 'source': str(md_file),
-                                'file_name': md_file.name
+                                'file_name': md_file.name,
+                                **self._tag_metadata(content)
                             }
                         })
                 except Exception as e:
@@ -89,6 +102,38 @@ class DocumentLoader:
             logger.error(f"Document loading failed: {e}")
             raise
         
+    @staticmethod
+    def _tag_metadata(content: str) -> Dict:
+        """Extract `tags` from YAML front matter as flat metadata.
+
+        Args:
+            content: Markdown file content
+
+        Returns:
+            Dict with a comma-separated `tags` string and one boolean
+            `tag_<name>` key per tag (vector store metadata must be scalar),
+            or an empty dict if the file has no tags
+        """
+        match = FRONT_MATTER_PATTERN.match(content)
+        if not match:
+            return {}
+        try:
+            import yaml
+            front_matter = yaml.safe_load(match.group(1)) or {}
+        except Exception as e:
+            logger.warning(f"Ignoring invalid front matter: {e}")
+            return {}
+        tags = front_matter.get('tags') if isinstance(front_matter, dict) else None
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.split(',')]
+        if not tags:
+            return {}
+        tags = [str(t) for t in tags if str(t).strip()]
+        return {
+            'tags': ",".join(tags),
+            **{tag_key(t): True for t in tags}
+        }
+
     def watch_documents(self, callback: Callable[[Path], None]):
         """Start watching the docs directory for new/changed markdown files.
         
@@ -146,9 +191,12 @@ class DocumentLoader:
                 
                 content = doc['content']
                 metadata = doc['metadata']
+                headings = [(m.start(), m.group(1)) for m in HEADING_PATTERN.finditer(content)]
                 
                 start = 0
                 prev_start = -1
+                # Byte offsets let chunk text be sliced from the file (chunk_storage: offsets)
+                byte_start, byte_pos = 0, 0
                 while start < len(content):
                     if start <= prev_start:
                         logger.error(f"Infinite loop detected at position {start} in document {metadata['file_name']}")
@@ -157,7 +205,17 @@ class DocumentLoader:
                     
                     end = min(start + self.chunk_size, len(content))
                     chunk = content[start:end]
-                    chunks.append(self._create_chunk(chunk, metadata, start, end))
+                    section = self._section_at(headings, start, end)
+                    byte_start += len(content[byte_pos:start].encode('utf-8'))
+                    byte_pos = start
+                    chunks.append(self._create_chunk(chunk, {
+                        **metadata,
+                        'section': section,
+                        'byte_start': byte_start,
+                        'byte_end': byte_start + len(chunk.encode('utf-8'))
+                    }, start, end))
+                    if end == len(content):
+                        break  # Reason: further chunks would only repeat the tail
                     
                     # Ensure we make forward progress
                     new_start = end - self.chunk_overlap
@@ -172,6 +230,29 @@ class DocumentLoader:
             logger.error(f"Chunking failed for document with metadata {doc.get('metadata', {})}: {e}")
             raise
 
+    @staticmethod
+    def _section_at(headings: List, start: int, end: int) -> str:
+        """Return the heading a chunk belongs to.
+
+        Args:
+            headings: (position, title) of every heading in the document
+            start: Start index of the chunk
+            end: End index of the chunk
+
+        Returns:
+            Last heading before the chunk start, else the first heading inside
+            the chunk, else an empty string
+        """
+        section = ''
+        for position, title in headings:
+            if position <= start:
+                section = title
+            elif not section and position < end:
+                return title
+            else:
+                break
+        return section
+
     def _create_chunk(self, content: str, metadata: Dict, start: int, end: int) -> Dict:
         """Helper method to create a chunk dictionary.
         
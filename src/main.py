@@ -3,6 +3,7 @@ import asyncio
 import logging
 import sys
 import os
+import time
 from pathlib import Path
 from datetime import datetime
 import nest_asyncio
@@ -20,6 +21,9 @@ os.environ['STREAMLIT_SERVER_ENABLE_FILE_WATCHER'] = 'false'
 # Add project root to path
 sys.path.append(str(Path(__file__).parent.parent))
 from chat_handler import ChatHandler
+from src.utils.config_loader import load_config as load_validated_config
+from src.utils.config_watcher import ConfigWatcher
+from src.utils.chat_history import ChatHistory
 import yaml
 
 def load_config():
@@ -27,10 +31,20 @@ def load_config():
     with open("config.yaml") as f:
         return yaml.safe_load(f)
 
+@st.cache_resource
 def init_chat_handler():
-    """Initialize and cache the ChatHandler."""
-    config = load_config()
-    return ChatHandler(config)
+    """Initialize and cache the ChatHandler, reloading config.yaml on changes."""
+    config = load_validated_config("config.yaml")
+    handler = ChatHandler(config)
+    hot_reload = config.get('hot_reload', {})
+    if hot_reload.get('enabled', False):
+        ConfigWatcher(
+            "config.yaml",
+            handler.apply_config,
+            interval=hot_reload.get('interval_seconds', 2.0),
+            current=config
+        ).start()
+    return handler
 
 def cleanup_resources():
     """Clean up multiprocessing resources."""
@@ -63,19 +77,26 @@ def main():
     chat_handler = init_chat_handler()
     
     # Initialize session state
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    if "history" not in st.session_state:
+        st.session_state.history = ChatHistory.from_config(config.get('chat_history', {}))
         st.session_state.token_count = 0
         st.session_state.current_model = chat_handler.model.active_model
         st.session_state.startup = True
+        st.session_state.prefill_seconds_saved = 0.0
         
     
     if st.session_state.startup:
-        chat_handler.process_documents()
+        # Load the model in the background while documents are indexed
+        chat_handler.start_warmup()
+        with st.spinner("Indexing documents while the model loads..."):
+            chat_handler.process_documents()
+        st.session_state.scope_options = chat_handler.retriever.vectorstore.list_scope_options()
         st.session_state.startup = False
 
-    # Model selection dropdown
+    # Model selection dropdown (the active model may change on config reload)
     available_models = chat_handler.model.get_available_models()
+    if st.session_state.current_model not in available_models:
+        st.session_state.current_model = chat_handler.model.active_model
     selected_model = st.sidebar.selectbox(
         "Select Model",
         options=list(available_models.keys()),
@@ -91,34 +112,80 @@ def main():
         except Exception as e:
             st.sidebar.error(f"Failed to switch models: {str(e)}")
     
-    # Display chat messages
-    for msg in st.session_state.messages:
+    # Retrieval scope selection
+    scope_options = st.session_state.get("scope_options", {})
+    with st.sidebar.expander("Search Scope"):
+        scope = {
+            "file_name": st.multiselect("Documents", scope_options.get("file_name", [])),
+            "section": st.selectbox("Section", [""] + scope_options.get("section", []),
+                                    format_func=lambda s: s or "All sections"),
+            "tags": st.multiselect("Tags", scope_options.get("tags", []))
+        }
+    scope = {key: value for key, value in scope.items() if value}
+
+    # Runtime profiling controls (take effect without a restart)
+    profiler = chat_handler.profiler
+    with st.sidebar.expander("Profiling"):
+        profile_all = st.checkbox("Profile every request", value=profiler.always)
+        profile_slow = st.checkbox("Profile slow requests", value=profiler.threshold_seconds is not None)
+        threshold = st.number_input("Slow request threshold (s)", min_value=0.1,
+                                    value=float(profiler.threshold_seconds or 10.0),
+                                    disabled=not profile_slow)
+        mode = st.radio("Profiler", ["sampling", "cprofile"], index=["sampling", "cprofile"].index(profiler.mode),
+                        horizontal=True)
+        profile_next = st.checkbox("Profile next request only", key="profile_next")
+        st.caption(f"Profiles are written to `{profiler.output_dir}/`")
+    settings = {'always': profile_all, 'threshold_seconds': threshold if profile_slow else None, 'mode': mode}
+    if any(profiler.settings()[name] != value for name, value in settings.items()):
+        profiler.configure(**settings)
+
+    # Display the most recent page of the chat history
+    history = st.session_state.history
+    render_start = time.perf_counter()
+    if history.dropped:
+        st.caption(f"{history.dropped} older messages were removed to limit memory use")
+    if history.hidden_count and st.button(f"Load earlier messages ({history.hidden_count} hidden)"):
+        history.load_earlier()
+        st.rerun()
+    for msg in history.window():
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
             if msg.get("timestamp"):
                 st.caption(msg["timestamp"])
+            if msg.get("precomputed"):
+                st.caption(f"⚡ Precomputed answer to: {msg['precomputed']['question']}")
+            if msg.get("compression"):
+                stats = msg["compression"]
+                st.caption(
+                    f"Context: {stats['original_tokens']} → {stats['compressed_tokens']} tokens "
+                    f"({stats['ratio']:.0%}), ~{stats['prefill_seconds_saved']:.1f}s prefill saved"
+                )
+    history.record_render(time.perf_counter() - render_start)
     
-    # Chat input
-    if prompt := st.chat_input("Ask a question about your documents"):
+    # Chat input (gated until warm-up and indexing have finished)
+    readiness = chat_handler.readiness()
+    ready = readiness["model"] and readiness["documents"]
+    if prompt := st.chat_input("Ask a question about your documents", disabled=not ready):
         # Add user message to chat history
-        st.session_state.messages.append({
-            "role": "user",
-            "content": prompt,
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
+        history.add("user", prompt, timestamp=datetime.now().strftime("%H:%M:%S"))
         
         # Process query and get response
-        result = chat_handler.process_query(prompt)
+        result = chat_handler.process_query(prompt, scope=scope or None, profile=profile_next)
+        if profile_next:
+            del st.session_state["profile_next"]
         
         # Add assistant response to chat history
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": result["response"],
-            "sources": result["sources"],
-            "tokens": result["tokens"],
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
+        history.add(
+            "assistant",
+            result["response"],
+            timestamp=datetime.now().strftime("%H:%M:%S"),
+            sources=result["sources"],
+            compression=result.get("compression"),
+            precomputed=result.get("precomputed")
+        )
         st.session_state.token_count += result["tokens"]
+        if result.get("compression"):
+            st.session_state.prefill_seconds_saved += result["compression"]["prefill_seconds_saved"]
         
         # Rerun to display new messages
         st.rerun()
@@ -127,6 +194,25 @@ def main():
     with st.sidebar:
         st.header("Session Info")
         st.metric("Total Tokens Used", st.session_state.token_count)
+        st.metric("Est. Prefill Time Saved", f"{st.session_state.prefill_seconds_saved:.1f}s")
+        render = history.render_stats()
+        st.metric("History Render Time", f"{render['last_ms']:.1f} ms",
+                  help=f"Median {render['median_ms']:.1f} ms, p95 {render['p95_ms']:.1f} ms "
+                       f"over the last {render['reruns']} reruns")
+        st.caption(f"History: {len(history)} messages, ~{history.memory_bytes / 1024:.0f} KB")
+
+        st.subheader("Status")
+        st.write(f"Model: {'✅ ready' if readiness['model'] else '⏳ loading'}")
+        st.write(f"Documents: {'✅ indexed' if readiness['documents'] else '⏳ indexing'}")
+        if readiness["error"]:
+            st.warning(f"Model warm-up failed, it will load on first query: {readiness['error']}")
+        reindex = chat_handler.reindex_progress()
+        if reindex and reindex['state'] in ('loading', 'embedding', 'switching'):
+            eta = f", ETA {reindex['eta_seconds']:.0f}s" if reindex['eta_seconds'] is not None else ""
+            st.progress(reindex['percent'] / 100,
+                        text=f"Re-indexing in background: {reindex['done']}/{reindex['total']} chunks{eta}")
+        elif reindex and reindex['state'] == 'failed':
+            st.warning(f"Background re-index failed, still serving the previous index: {reindex['error']}")
         
         # Hardware information
         hw_info = chat_handler.model.get_hardware_info()
@@ -140,12 +226,40 @@ def main():
                                   help="Use GPU acceleration if available")
         else:
             st.write("GPU: Not available")
+
+        prefix_stats = chat_handler.model.get_prefix_cache_stats()
+        if prefix_stats and prefix_stats['lookups']:
+            st.metric("Prompt Prefix Reused", f"{prefix_stats['saved_fraction']:.0%}",
+                      help=f"{prefix_stats['tokens_saved']} of {prefix_stats['prompt_tokens']} prompt tokens "
+                           f"skipped prefill; {prefix_stats['hits']} of {prefix_stats['lookups']} prompts "
+                           f"restored a prefix from disk")
+
+        # Per-worker load, throughput and memory when serving from a worker pool
+        worker_stats = chat_handler.model.get_worker_stats()
+        if worker_stats:
+            st.subheader("Model Workers")
+            for worker in worker_stats:
+                memory = worker['memory'] or {}
+                st.write(
+                    f"Worker {worker['worker']}: {worker['in_flight']} in flight, "
+                    f"{worker['completed']} done, {worker['tokens_per_second']:.1f} tok/s"
+                )
+                if memory:
+                    st.caption(f"RSS {memory['rss'] / 2**20:.0f} MB, PSS {memory['pss'] / 2**20:.0f} MB, "
+                               f"shared {memory['shared'] / 2**20:.0f} MB")
             
         if st.button("Clear Chat"):
-            st.session_state.messages = []
+            history.clear()
             st.session_state.token_count = 0
+            st.session_state.prefill_seconds_saved = 0.0
             st.rerun()
 
+    # Poll until background warm-up finishes so the chat input gets enabled
+    if not ready:
+        with st.spinner("Warming up model..."):
+            chat_handler.wait_until_ready(timeout=1.0)
+        st.rerun()
+
 if __name__ == "__main__":
     # Isolate PyTorch from Streamlit
     import os
@@ -1,13 +1,18 @@
 """Module to manage local LLM models."""
 import logging
 import os
+import time
 import torch
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import yaml
 
 logger = logging.getLogger(__name__)
 from llama_cpp import Llama
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from src.models.transformers_backend import TransformersBackend
+from src.models.response_cache import ResponseCache
+from src.models.speculative import SmallModelDraft, create_draft_model, vocabularies_match
+from src.models.worker_pool import GGUFWorkerPool
+from src.models.prefix_cache import PrefixDiskCache, cache_dir_for
 
 class ModelManager:
     """Handles loading and querying of local LLM models."""
@@ -25,7 +30,23 @@ class ModelManager:
         })
         self.active_model = config.get('active_model', 'default')
         self.llm = None
+        self.draft_llms: Dict[str, Llama] = {}  # Resident draft models by name
+        self.draft_model = None  # AcceptanceTracker of the active model, if any
+        self.prefix_cache = None  # Disk-backed prompt prefix cache of the loaded GGUF model
+        self.decode_stats = {
+            mode: {'requests': 0, 'tokens': 0, 'seconds': 0.0}
+            for mode in ('plain', 'speculative')
+        }
         self.hardware_info = self._get_hardware_info()
+        self.index_version = None  # Version of the vector index prompts are built from
+        cache_config = config.get('response_cache', {})
+        self.response_cache = ResponseCache(
+            cache_config.get('path', 'cache/responses.sqlite'),
+            max_entries=cache_config.get('max_entries', 1000),
+            max_bytes=cache_config.get('max_bytes', 50 * 1024 * 1024),
+            ttl_seconds=cache_config.get('ttl_seconds', 7 * 24 * 3600),
+            bypass_temperature_above=cache_config.get('bypass_temperature_above', 0.8)
+        ) if cache_config.get('enabled', False) else None
         
     def _get_hardware_info(self) -> Dict:
         """Get information about available hardware."""
@@ -51,30 +72,134 @@ class ModelManager:
         # Determine model type based on file extension
         hardware_config = self.config.get('hardware', {})
         use_gpu = hardware_config.get('enable_gpu', False) and self.hardware_info['gpu_available']
+        serving_config = self.config.get('serving', {})
+        self._close_worker_pool()
+        self.prefix_cache = None
         
-        if model_path.endswith('.gguf'):
+        if model_path.endswith('.gguf') and serving_config.get('workers', 1) > 1:
+            # Workers load the model themselves; nothing is loaded in this process
+            self.draft_model = None
+            # Reason: self.models may be newer than self.config['models']
+            # while apply_model_config() reloads the model
+            self.llm = GGUFWorkerPool(
+                {**self.config, 'models': self.models},
+                model_name,
+                num_workers=serving_config['workers'],
+                threads_per_worker=serving_config.get('threads_per_worker')
+            )
+        elif model_path.endswith('.gguf'):
+            spec_config = model_config.get('speculative', {})
+            # Reason: the drafter must be passed at construction so llama.cpp
+            # keeps logits for every position, which verification needs.
+            self.draft_model = self._create_draft_model(model_name, spec_config)
             self.llm = Llama(
                 model_path=model_path,
                 n_ctx=2048,
-                n_threads=4
+                n_threads=hardware_config.get('n_threads', 4),
+                use_mmap=True,  # Weights stay in the page cache, shared between processes
+                draft_model=self.draft_model
             )
+            self._verify_draft_vocabulary(model_name, spec_config)
+            prefix_config = self.config.get('prefix_cache', {})
+            if prefix_config.get('enabled', False):
+                self.prefix_cache = PrefixDiskCache(
+                    cache_dir_for(prefix_config.get('path', 'cache/llama_prefix'), model_path),
+                    capacity_bytes=prefix_config.get('capacity_mb', 2048) * 1024 * 1024,
+                    min_prefix_tokens=prefix_config.get('min_prefix_tokens', 64)
+                )
+                self.prefix_cache.bind(self.llm)
         elif model_path.endswith('.safetensors'):
-            device = 'cuda' if use_gpu else 'cpu'
-            logger.info(f"Loading model on {device.upper()}")
-            self.llm = {
-                'model': AutoModelForCausalLM.from_pretrained(
-                    model_path,
-                    device_map='auto' if use_gpu else None,
-                    torch_dtype=torch.float16 if use_gpu else torch.float32
-                ),
-                'tokenizer': AutoTokenizer.from_pretrained(model_path)
-            }
+            self.draft_model = None
+            self.llm = TransformersBackend(
+                model_path,
+                use_gpu=use_gpu,
+                options=model_config.get('transformers', {})
+            )
         else:
             raise ValueError(f"Unsupported model format: {model_path}")
             
         self.active_model = model_name
         logger.info(f"Model {model_name} loaded successfully")
         
+    def _close_worker_pool(self):
+        """Stop the worker processes of a previously loaded model, if any."""
+        if isinstance(self.llm, GGUFWorkerPool):
+            self.llm.close()
+            self.llm = None
+
+    def _load_draft_llm(self, draft_name: str) -> Llama:
+        """Load a small draft model once and keep it resident."""
+        if draft_name not in self.draft_llms:
+            draft_config = self.models.get(draft_name)
+            if not draft_config or not draft_config['path'].endswith('.gguf'):
+                raise ValueError(f"Draft model {draft_name} must be a GGUF model from config")
+            logger.info(f"Loading draft model {draft_name} from {draft_config['path']}")
+            self.draft_llms[draft_name] = Llama(
+                model_path=draft_config['path'],
+                n_ctx=2048,
+                n_threads=4,
+                verbose=False
+            )
+        return self.draft_llms[draft_name]
+
+    def _create_draft_model(self, model_name: str, spec_config: Dict):
+        """
+        Create the speculative drafter configured for a model pair.
+
+        Falls back to prompt-lookup drafting when the draft model cannot be
+        loaded.
+
+        Args:
+            model_name: Name of the target model
+            spec_config: The model's `speculative` config section
+
+        Returns:
+            AcceptanceTracker or None when speculative decoding is off
+        """
+        if spec_config.get('mode') != 'draft_model':
+            return create_draft_model(spec_config)
+
+        draft_name = spec_config.get('draft_model')
+        try:
+            draft_llm = self._load_draft_llm(draft_name)
+        except Exception as e:
+            logger.warning(f"Cannot load draft model {draft_name} for {model_name}: {e}")
+            return create_draft_model({**spec_config, 'mode': 'prompt_lookup'})
+        return create_draft_model(spec_config, draft_llm)
+
+    def _verify_draft_vocabulary(self, model_name: str, spec_config: Dict):
+        """Switch to prompt-lookup drafting if the draft model's tokenizer differs."""
+        drafter = getattr(self.draft_model, 'drafter', None)
+        if not isinstance(drafter, SmallModelDraft) or vocabularies_match(self.llm, drafter.llm):
+            return
+        logger.warning(
+            f"Draft model {spec_config.get('draft_model')} does not share the vocabulary "
+            f"of {model_name}, falling back to prompt-lookup drafting"
+        )
+        fallback = create_draft_model({**spec_config, 'mode': 'prompt_lookup'})
+        self.draft_model.drafter = fallback.drafter
+        self.draft_model.mode = fallback.mode
+
+    def warm_up(self, model_name: Optional[str] = None):
+        """
+        Load a model and run a tiny priming generation.
+
+        The priming run pages the weights in and initializes the runtime so
+        the first real query does not pay for it.
+
+        Args:
+            model_name: Model to warm up (defaults to the active model)
+        """
+        start = time.perf_counter()
+        self.load_model(model_name)
+        if isinstance(self.llm, TransformersBackend):
+            self.llm.generate(["Hello"], max_new_tokens=1, temperature=0)
+        elif isinstance(self.llm, GGUFWorkerPool):
+            pass  # Workers are loaded once the pool has started
+        else:
+            self.llm.create_completion("Hello", max_tokens=1)
+        logger.info(f"Warmed up {self.active_model} in {time.perf_counter() - start:.1f}s")
+
     def switch_model(self, model_name: str):
         """Switch to a different model."""
         if model_name not in self.models:
@@ -82,35 +207,259 @@ class ModelManager:
         if model_name != self.active_model:
             self.load_model(model_name)
             
+    def apply_model_config(self, models: Dict, active_model: str) -> List[str]:
+        """
+        Apply a changed `models` section without reloading unaffected models.
+
+        Resident draft models whose settings changed or that were removed are
+        unloaded. The active model is reloaded only if its own settings (or
+        the choice of active model) changed; it is loaded lazily if it was
+        not loaded before. Cached responses of unchanged models stay valid
+        because the cache key includes the model settings.
+
+        Args:
+            models: New `models` config section
+            active_model: New active model name
+
+        Returns:
+            Names of models whose settings changed, were added or removed
+        """
+        changed = sorted(
+            name for name in set(models) | set(self.models)
+            if models.get(name) != self.models.get(name)
+        )
+        for name in changed:
+            if self.draft_llms.pop(name, None) is not None:
+                logger.info(f"Unloaded draft model {name}")
+
+        draft_name = models.get(active_model, {}).get('speculative', {}).get('draft_model')
+        reload = self.llm is not None and (
+            active_model != self.active_model or active_model in changed or draft_name in changed
+        )
+        self.models = models
+        if reload:
+            logger.info(f"Reloading model {active_model} after config change")
+            self.load_model(active_model)
+        else:
+            self.active_model = active_model
+        return changed
+
+    def set_index_version(self, index_version: str):
+        """
+        Record the current vector index version for response caching.
+
+        Cached responses generated against other versions are discarded.
+
+        Args:
+            index_version: Version identifier from VectorStore.index_version()
+        """
+        self.index_version = index_version
+        if self.response_cache:
+            self.response_cache.invalidate(index_version)
+
+    def _cache_key(self, prompt: str, model_config: Dict) -> Optional[str]:
+        """Return the response cache key, or None if caching does not apply."""
+        if not self.response_cache or self.response_cache.should_bypass(model_config.get('temperature', 0.7)):
+            return None
+        params = {key: model_config.get(key) for key in ('path', 'max_tokens', 'temperature', 'top_p')}
+        return self.response_cache.make_key(self.active_model, params, prompt, self.index_version)
+
     def generate_response(self, prompt: str) -> str:
         """Generate response from the active model."""
+        model_config = self.models[self.active_model]
+        cache_key = self._cache_key(prompt, model_config)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Serving cached response for {self.active_model}")
+                return cached
+
         if not self.llm:
             raise RuntimeError("Model not loaded - call load_model() first")
             
-        model_config = self.models[self.active_model]
         logger.info(f"Generating response using {self.active_model} model")
         
-        if isinstance(self.llm, dict):  # Transformers model
-            inputs = self.llm['tokenizer'](prompt, return_tensors="pt")
-            outputs = self.llm['model'].generate(
-                **inputs,
+        if isinstance(self.llm, TransformersBackend):
+            response = self.llm.generate(
+                [prompt],
                 max_new_tokens=model_config.get('max_tokens', 512),
                 temperature=model_config.get('temperature', 0.7),
                 top_p=model_config.get('top_p', 0.9)
-            )
-            response = self.llm['tokenizer'].decode(outputs[0], skip_special_tokens=True)
+            )[0]
+        elif isinstance(self.llm, GGUFWorkerPool):
+            response = self.llm.generate(prompt)
         else:  # GGUF model
-            output = self.llm.create_chat_completion(
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=model_config.get('max_tokens', 512),
-                temperature=model_config.get('temperature', 0.7),
-                top_p=model_config.get('top_p', 0.9)
-            )
-            response = output['choices'][0]['message']['content']
+            response, _ = self._generate_gguf(prompt, model_config)
             
         logger.info(f"Generated response (length: {len(response)} chars)")
+        if cache_key:
+            self.response_cache.put(cache_key, response, self.index_version)
         return response
+
+    def supports_batching(self) -> bool:
+        """Return True if the loaded model generates several prompts at once."""
+        return isinstance(self.llm, (TransformersBackend, GGUFWorkerPool))
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """
+        Generate responses for several pending prompts.
+
+        Transformers models run the prompts as one padded batch, a GGUF
+        worker pool spreads them over its workers, and a single GGUF model
+        processes them one after the other.
+
+        Args:
+            prompts: Prompt texts
+
+        Returns:
+            Responses in the same order as the prompts
+        """
+        if not self.llm:
+            raise RuntimeError("Model not loaded - call load_model() first")
+        if not self.supports_batching():
+            return [self.generate_response(prompt) for prompt in prompts]
+
+        model_config = self.models[self.active_model]
+        keys = [self._cache_key(prompt, model_config) for prompt in prompts]
+        responses = [self.response_cache.get(key) if key else None for key in keys]
+        pending = [i for i, response in enumerate(responses) if response is None]
+        if not pending:
+            return responses
+
+        logger.info(f"Generating {len(pending)} responses in one batch using {self.active_model}")
+        if isinstance(self.llm, GGUFWorkerPool):
+            generated = self.llm.generate_many([prompts[i] for i in pending])
+        else:
+            generated = self.llm.generate(
+                [prompts[i] for i in pending],
+                max_new_tokens=model_config.get('max_tokens', 512),
+                temperature=model_config.get('temperature', 0.7),
+                top_p=model_config.get('top_p', 0.9)
+            )
+        for i, response in zip(pending, generated):
+            responses[i] = response
+            if keys[i]:
+                self.response_cache.put(keys[i], response, self.index_version)
+        return responses
+
+    def _generate_gguf(self, prompt: str, model_config: Dict) -> Tuple[str, Dict]:
+        """
+        Run a streamed chat completion and time prefill and decode separately.
+
+        Args:
+            prompt: Prompt text
+            model_config: Sampling settings of the active model
+
+        Returns:
+            Tuple of (response text, timing dictionary)
+        """
+        mode = 'speculative' if self.llm.draft_model is not None else 'plain'
+        if self.draft_model is not None:
+            self.draft_model.reset()
+
+        start = time.perf_counter()
+        first_token_at = None
+        pieces = []
+        completion_tokens = 0
+        # Reason: streaming lets us separate time-to-first-token (prefill)
+        # from decode time, which is what speculative decoding speeds up.
+        for chunk in self.llm.create_chat_completion(
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=model_config.get('max_tokens', 512),
+            temperature=model_config.get('temperature', 0.7),
+            top_p=model_config.get('top_p', 0.9),
+            stream=True
+        ):
+            content = chunk['choices'][0]['delta'].get('content')
+            if not content:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            pieces.append(content)
+            completion_tokens += 1
+        end = time.perf_counter()
+
+        timing = {
+            'mode': mode,
+            'prefill_seconds': (first_token_at or end) - start,
+            'decode_seconds': end - (first_token_at or end),
+            'completion_tokens': completion_tokens
+        }
+        stats = self.decode_stats[mode]
+        stats['requests'] += 1
+        stats['tokens'] += completion_tokens
+        stats['seconds'] += timing['decode_seconds']
+        return "".join(pieces), timing
+
+    def get_speculative_stats(self) -> Dict:
+        """
+        Report draft acceptance and decode speed of speculative vs plain runs.
+
+        Returns:
+            Dictionary with acceptance statistics and decode tokens/sec per path
+        """
+        report = {
+            mode: {
+                **stats,
+                'tokens_per_second': stats['tokens'] / stats['seconds'] if stats['seconds'] else 0.0
+            }
+            for mode, stats in self.decode_stats.items()
+        }
+        report['acceptance'] = self.draft_model.get_stats() if self.draft_model else None
+        return report
+
+    def benchmark_speculative(self, prompt: str) -> Dict:
+        """
+        Generate the same prompt with and without the draft model.
+
+        Args:
+            prompt: Prompt to benchmark, ideally a real RAG prompt
+
+        Returns:
+            Dictionary with plain and speculative timings, speedup and acceptance
+        """
+        if not self.llm or isinstance(self.llm, (TransformersBackend, GGUFWorkerPool)):
+            raise RuntimeError("Speculative benchmark requires a GGUF model loaded in this process")
+        if self.draft_model is None:
+            raise RuntimeError(f"Speculative decoding is not configured for {self.active_model}")
+
+        model_config = self.models[self.active_model]
+        self.llm.draft_model = None
+        try:
+            _, plain = self._generate_gguf(prompt, model_config)
+        finally:
+            self.llm.draft_model = self.draft_model
+        accepted_before = self.draft_model.get_stats()
+        _, speculative = self._generate_gguf(prompt, model_config)
+        accepted_after = self.draft_model.get_stats()
+
+        def tokens_per_second(timing: Dict) -> float:
+            """Return the decode speed of one timed generation."""
+            return timing['completion_tokens'] / timing['decode_seconds'] if timing['decode_seconds'] else 0.0
+
+        proposed = accepted_after['proposed_tokens'] - accepted_before['proposed_tokens']
+        accepted = accepted_after['accepted_tokens'] - accepted_before['accepted_tokens']
+        result = {
+            'plain_tokens_per_second': tokens_per_second(plain),
+            'speculative_tokens_per_second': tokens_per_second(speculative),
+            'acceptance_rate': accepted / proposed if proposed else 0.0,
+            'mode': self.draft_model.mode
+        }
+        result['speedup'] = (
+            result['speculative_tokens_per_second'] / result['plain_tokens_per_second']
+            if result['plain_tokens_per_second'] else 0.0
+        )
+        logger.info(f"Speculative benchmark for {self.active_model}: {result}")
+        return result
         
+    def get_prefix_cache_stats(self) -> Optional[Dict]:
+        """Return prompt prefix reuse statistics, or None without a prefix cache."""
+        return self.prefix_cache.get_stats() if self.prefix_cache else None
+
+    def get_worker_stats(self) -> Optional[List[Dict]]:
+        """Return per-worker load, throughput and memory, or None without workers."""
+        return self.llm.get_stats() if isinstance(self.llm, GGUFWorkerPool) else None
+
     def get_available_models(self) -> Dict:
         """Return dictionary of available models."""
         return {name: cfg['path'] for name, cfg in self.models.items()}
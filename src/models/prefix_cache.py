@@ -0,0 +1,137 @@
+"""Module for a disk-backed llama.cpp prompt prefix cache shared across sessions.
+
+llama.cpp only re-evaluates the part of a prompt that differs from what is
+already in its KV cache. Within one process that helps consecutive prompts;
+this cache also keeps the model state after earlier prompts on disk, so a
+prompt starting with the same instruction header and context chunks as any
+earlier one (in another session, worker process or before a restart)
+restores that state and skips prefill for the shared prefix. Prompts are
+built with a stable context order (see ChatHandler._format_prompt) so that
+queries retrieving the same chunks produce the same token prefix.
+"""
+import hashlib
+import logging
+import os
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from llama_cpp import Llama
+from llama_cpp.llama_cache import LlamaDiskCache
+
+logger = logging.getLogger(__name__)
+
+
+def cache_dir_for(base_dir: str, model_path: str) -> str:
+    """Return the cache directory of a model file; states of other models or versions never mix."""
+    stat = os.stat(model_path)
+    identity = f"{os.path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(base_dir, f"{name}-{hashlib.sha1(identity.encode('utf-8')).hexdigest()[:12]}")
+
+
+class PrefixDiskCache(LlamaDiskCache):
+    """LlamaDiskCache that keeps entries for reuse and reports prefix hits.
+
+    Unlike the base class, a lookup does not remove the entry it returns,
+    states whose shared prefix is shorter than `min_prefix_tokens` or not
+    longer than what the model already holds in memory are not loaded from
+    disk, and hit rate and skipped prefill tokens are counted.
+    """
+
+    def __init__(self, cache_dir: str, capacity_bytes: int = 2 << 30, min_prefix_tokens: int = 64):
+        """Open (or create) the cache directory.
+
+        Args:
+            cache_dir: Directory of the cache, see cache_dir_for()
+            capacity_bytes: Oldest states are evicted beyond this size
+            min_prefix_tokens: Shorter shared prefixes are not worth restoring
+        """
+        super().__init__(cache_dir=cache_dir, capacity_bytes=capacity_bytes)
+        self.min_prefix_tokens = min_prefix_tokens
+        self.llm: Optional[Llama] = None
+        self.lookups = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.memory_tokens = 0
+        self.restored_tokens = 0
+        self.saves = 0
+        self.save_seconds = 0.0
+
+    def bind(self, llm: Llama):
+        """Attach the cache to a model, whose in-memory state lookups compare against."""
+        self.llm = llm
+        llm.set_cache(self)
+
+    def _find_longest_prefix(self, key: Tuple[int, ...]) -> Tuple[Optional[Tuple[int, ...]], int]:
+        """Return the stored key sharing the longest prefix with key, and that length."""
+        best_key, best_len = None, 0
+        for stored in self.cache.iterkeys():
+            prefix_len = Llama.longest_token_prefix(stored, key)
+            if prefix_len > best_len:
+                best_key, best_len = stored, prefix_len
+        return best_key, best_len
+
+    def __getitem__(self, key: Sequence[int]):
+        """Return the stored state to restore before evaluating a prompt.
+
+        Args:
+            key: Prompt tokens
+
+        Raises:
+            KeyError: If no stored state saves prefill over the model's
+                current state
+        """
+        key = tuple(key)
+        in_memory = Llama.longest_token_prefix(self.llm._input_ids.tolist(), key) if self.llm else 0
+        stored_key, prefix_len = self._find_longest_prefix(key)
+        self.lookups += 1
+        self.prompt_tokens += len(key)
+        if stored_key is None or prefix_len < self.min_prefix_tokens or prefix_len <= in_memory:
+            self.memory_tokens += in_memory
+            raise KeyError("No stored prefix beyond the model's current state")
+        state = self.cache.get(stored_key)
+        if state is None:  # Reason: evicted by another process since the scan
+            self.memory_tokens += in_memory
+            raise KeyError("Stored prefix was evicted")
+        self.hits += 1
+        self.restored_tokens += prefix_len
+        return state
+
+    def __contains__(self, key: Sequence[int]) -> bool:
+        """Check whether a stored state shares at least `min_prefix_tokens` tokens with key."""
+        return self._find_longest_prefix(tuple(key))[1] >= self.min_prefix_tokens
+
+    def __setitem__(self, key: Sequence[int], value):
+        """Store the state after a completion, evicting the oldest states beyond capacity."""
+        start = time.perf_counter()
+        key = tuple(key)
+        self.cache.set(key, value)
+        while self.cache_size > self.capacity_bytes and len(self.cache) > 1:
+            oldest = next(iter(self.cache))
+            del self.cache[oldest]
+        self.saves += 1
+        self.save_seconds += time.perf_counter() - start
+
+    def get_stats(self) -> Dict:
+        """Report prefix reuse.
+
+        Returns:
+            Dictionary with `lookups`, `hits` (states restored from disk),
+            `hit_rate`, `prompt_tokens`, `tokens_saved` (prompt tokens not
+            prefilled, restored from disk or still in memory),
+            `restored_tokens`, `saved_fraction`, `entries`, `size_bytes` and
+            average `save_ms`
+        """
+        tokens_saved = self.restored_tokens + self.memory_tokens
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'prompt_tokens': self.prompt_tokens,
+            'tokens_saved': tokens_saved,
+            'restored_tokens': self.restored_tokens,
+            'saved_fraction': tokens_saved / self.prompt_tokens if self.prompt_tokens else 0.0,
+            'entries': len(self.cache),
+            'size_bytes': self.cache_size,
+            'save_ms': self.save_seconds * 1000 / self.saves if self.saves else 0.0
+        }
@@ -0,0 +1,176 @@
+"""Module for a persistent cache of LLM responses."""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Disk-backed LRU cache of generated responses with TTL expiry.
+
+    Entries are keyed by model, sampling parameters, prompt and index
+    version, so a changed corpus never serves answers built on old context.
+    """
+
+    def __init__(self, path: str = "cache/responses.sqlite", max_entries: int = 1000,
+                 max_bytes: int = 50 * 1024 * 1024, ttl_seconds: float = 7 * 24 * 3600,
+                 bypass_temperature_above: float = 0.8):
+        """Open (or create) the cache database.
+
+        Args:
+            path: SQLite file holding the cache
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached responses in bytes
+            ttl_seconds: Age after which an entry expires
+            bypass_temperature_above: Sampling temperatures above this are
+                considered too random to cache
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.bypass_temperature_above = bypass_temperature_above
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Reason: Streamlit and warm-up run on different threads; all access
+        # is serialized through self._lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                index_version TEXT,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, params: Dict, prompt: str, index_version: Optional[str]) -> str:
+        """Build the cache key for a generation request.
+
+        Args:
+            model_name: Name of the model
+            params: Parameters that influence the output (path, sampling settings)
+            prompt: Exact prompt text
+            index_version: Version of the vector index the prompt was built from
+
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = json.dumps({
+            'model': model_name,
+            'params': params,
+            'prompt_sha256': hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+            'index_version': index_version
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def should_bypass(self, temperature: float) -> bool:
+        """Return True if responses at this temperature should not be cached."""
+        return temperature > self.bypass_temperature_above
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None if missing or expired.
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Cached response text or None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str, index_version: Optional[str] = None):
+        """Store a response and evict least recently used entries if needed.
+
+        Args:
+            key: Key from make_key()
+            response: Generated response text
+            index_version: Index version the response was generated against
+        """
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, index_version, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones over the bounds."""
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        removed = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            removed += 1
+        logger.debug(f"Evicted {removed} cached responses")
+
+    def invalidate(self, current_index_version: Optional[str] = None):
+        """Remove entries generated against another index version.
+
+        Args:
+            current_index_version: Version to keep; None clears the cache
+        """
+        with self._lock:
+            if current_index_version is None:
+                cursor = self._conn.execute("DELETE FROM responses")
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE index_version IS NOT ?", (current_index_version,)
+                )
+            self._conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Invalidated {cursor.rowcount} cached responses after index change")
+
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters and current cache size."""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': count,
+            'bytes': total
+        }
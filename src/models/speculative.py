@@ -0,0 +1,155 @@
+"""Module for speculative decoding with llama.cpp draft models."""
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+logger = logging.getLogger(__name__)
+
+PROBE_TEXT = b"Answer the question using only the provided context."
+
+
+class SmallModelDraft(LlamaDraftModel):
+    """Drafts tokens by greedily decoding with a small resident GGUF model."""
+
+    def __init__(self, llm: Llama, num_pred_tokens: int = 4):
+        """Initialize with an already loaded draft model.
+
+        Args:
+            llm: Small llama.cpp model sharing the target model's vocabulary
+            num_pred_tokens: Number of tokens proposed per verification step
+        """
+        self.llm = llm
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        """Propose the next tokens for the given context.
+
+        Args:
+            input_ids: Full token history of the target model
+
+        Returns:
+            Array of proposed token ids
+        """
+        draft: List[int] = []
+        # Reason: Llama.generate reuses the longest matching prefix of its own
+        # KV cache, so only the tokens accepted since the last call are evaluated.
+        for token in self.llm.generate(input_ids.tolist(), top_k=1, temp=0.0):
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+
+class AcceptanceTracker(LlamaDraftModel):
+    """Wraps a draft model and records how many proposed tokens are accepted."""
+
+    def __init__(self, drafter: LlamaDraftModel, mode: str):
+        """Initialize with the drafter to observe.
+
+        Args:
+            drafter: Underlying draft model
+            mode: Name of the drafting mode, used for reporting
+        """
+        self.drafter = drafter
+        self.mode = mode
+        self.proposed = 0
+        self.accepted = 0
+        self._last_draft: Optional[np.ndarray] = None
+        self._last_length = 0
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        """Record acceptance of the previous draft and produce a new one.
+
+        Args:
+            input_ids: Full token history of the target model
+
+        Returns:
+            Array of proposed token ids
+        """
+        # Reason: llama.cpp does not expose acceptance directly. The tokens
+        # appended since the previous call are the accepted draft prefix plus
+        # one token sampled by the target model, so compare them to the draft.
+        if self._last_draft is not None and len(input_ids) > self._last_length:
+            appended = input_ids[self._last_length:]
+            matched = 0
+            for drafted, actual in zip(self._last_draft, appended):
+                if drafted != actual:
+                    break
+                matched += 1
+            self.proposed += len(self._last_draft)
+            self.accepted += matched
+
+        draft = self.drafter(input_ids, **kwargs)
+        self._last_draft = draft
+        self._last_length = len(input_ids)
+        return draft
+
+    def reset(self):
+        """Forget the pending draft, e.g. between two independent requests."""
+        self._last_draft = None
+        self._last_length = 0
+
+    def get_stats(self) -> Dict:
+        """Return acceptance statistics.
+
+        Returns:
+            Dictionary with mode, proposed and accepted token counts and rate
+        """
+        return {
+            'mode': self.mode,
+            'proposed_tokens': self.proposed,
+            'accepted_tokens': self.accepted,
+            'acceptance_rate': self.accepted / self.proposed if self.proposed else 0.0
+        }
+
+
+def vocabularies_match(target: Llama, draft: Llama) -> bool:
+    """Check that two models tokenize identically, as drafting requires.
+
+    Args:
+        target: Large model that verifies tokens
+        draft: Small model that proposes tokens
+
+    Returns:
+        True if vocab size and a probe tokenization agree
+    """
+    if target.n_vocab() != draft.n_vocab():
+        return False
+    return target.tokenize(PROBE_TEXT) == draft.tokenize(PROBE_TEXT)
+
+
+def create_draft_model(spec_config: Dict, draft_llm: Optional[Llama] = None) -> Optional[AcceptanceTracker]:
+    """Build the draft model configured for a model pair.
+
+    Args:
+        spec_config: The `speculative` section of a model's config
+        draft_llm: Loaded small model when mode is `draft_model`
+
+    Returns:
+        AcceptanceTracker wrapping the drafter, or None when disabled
+    """
+    mode = spec_config.get('mode', 'off')
+    num_pred_tokens = spec_config.get('num_pred_tokens', 10 if mode == 'prompt_lookup' else 4)
+
+    if mode == 'prompt_lookup':
+        # Drafts by copying n-gram continuations from the prompt, which works
+        # well for RAG because answers often quote the retrieved context.
+        drafter = LlamaPromptLookupDecoding(
+            max_ngram_size=spec_config.get('max_ngram_size', 2),
+            num_pred_tokens=num_pred_tokens
+        )
+    elif mode == 'draft_model':
+        if draft_llm is None:
+            logger.warning("Speculative mode 'draft_model' without a loaded draft model - disabled")
+            return None
+        drafter = SmallModelDraft(draft_llm, num_pred_tokens=num_pred_tokens)
+    elif mode == 'off':
+        return None
+    else:
+        raise ValueError(f"Unknown speculative decoding mode: {mode}")
+
+    logger.info(f"Speculative decoding enabled ({mode}, {num_pred_tokens} tokens per draft)")
+    return AcceptanceTracker(drafter, mode)
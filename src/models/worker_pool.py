@@ -0,0 +1,289 @@
+"""Module for serving a GGUF model from several pre-forked worker processes.
+
+Every worker loads the same GGUF file with `use_mmap`, so the weights are
+mapped from the page cache once and shared by all workers instead of being
+copied into each process. CPU threads are split between the workers, and
+each prompt goes to the worker with the fewest requests in flight. The
+serving process keeps retrieval, caching and the UI, so its Python work
+never stalls token generation.
+"""
+import copy
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_READY = "ready"  # Request id a worker reports once its model is loaded
+
+
+def memory_usage(pid: int) -> Optional[Dict[str, int]]:
+    """Read a process's memory usage from /proc (Linux only).
+
+    Args:
+        pid: Process id
+
+    Returns:
+        Bytes of `rss`, `pss` (RSS with shared pages divided among the
+        processes mapping them) and `shared` (clean pages shared with other
+        processes, e.g. mmap'd weights), or None if unavailable
+    """
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared'}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            usage = {}
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    usage[fields[name]] = int(value.split()[0]) * 1024
+            return usage
+    except OSError:
+        return None
+
+
+def _worker_main(worker_id: int, config: Dict, model_name: str, requests, results):
+    """Worker process: load the model once, then answer prompts until told to stop."""
+    # Reason: imported here so the pool module stays importable from
+    # model_manager without a circular import
+    from src.models.model_manager import ModelManager
+
+    try:
+        manager = ModelManager(config)
+        manager.load_model(model_name)
+    except Exception as e:
+        results.put((worker_id, _READY, None, f"{type(e).__name__}: {e}"))
+        return
+    results.put((worker_id, _READY, None, None))
+
+    while (request := requests.get()) is not None:
+        request_id, prompt = request
+        tokens_before = sum(stats['tokens'] for stats in manager.decode_stats.values())
+        start = time.perf_counter()
+        try:
+            response = manager.generate_response(prompt)
+        except Exception as e:
+            results.put((worker_id, request_id, None, f"{type(e).__name__}: {e}"))
+            continue
+        results.put((worker_id, request_id, {
+            'response': response,
+            'seconds': time.perf_counter() - start,
+            'tokens': sum(stats['tokens'] for stats in manager.decode_stats.values()) - tokens_before
+        }, None))
+
+
+class _Worker:
+    """Front-side bookkeeping for one worker process."""
+
+    def __init__(self, worker_id: int):
+        """Initialize the bookkeeping of a worker that has not been started yet."""
+        self.worker_id = worker_id
+        self.process = None
+        self.requests = None
+        self.ready = threading.Event()
+        self.error: Optional[str] = None
+        self.pending: Dict[int, Future] = {}
+        self.completed = 0
+        self.failed = 0
+        self.tokens = 0
+        self.busy_seconds = 0.0
+        self.started_at = time.time()
+
+
+class GGUFWorkerPool:
+    """Dispatches generation requests to pre-forked GGUF worker processes."""
+
+    def __init__(self, config: Dict, model_name: str, num_workers: int = 2,
+                 threads_per_worker: Optional[int] = None, start_timeout: float = 300.0):
+        """Start the workers and wait until each has loaded the model.
+
+        Args:
+            config: Application config; workers build their own ModelManager
+            model_name: GGUF model to serve
+            num_workers: Number of worker processes
+            threads_per_worker: llama.cpp threads per worker (defaults to
+                the CPU cores divided among the workers)
+            start_timeout: Seconds to wait for the workers to load the model
+
+        Raises:
+            RuntimeError: If a worker fails to load the model
+        """
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        # Reason: forkserver forks workers from a clean helper process that
+        # has imported llama_cpp once, never from this multi-threaded process
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            self._context.set_forkserver_preload(['src.models.model_manager'])
+        self._worker_config = self._make_worker_config(config)
+        self._results = self._context.Queue()
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._closed = False
+        self.workers = [_Worker(worker_id) for worker_id in range(num_workers)]
+        for worker in self.workers:
+            self._start(worker)
+        threading.Thread(target=self._collect, name="gguf-pool-results", daemon=True).start()
+
+        deadline = time.time() + start_timeout
+        for worker in self.workers:
+            if not worker.ready.wait(max(0.0, deadline - time.time())) or worker.error:
+                self.close()
+                raise RuntimeError(f"GGUF worker {worker.worker_id} failed to start: {worker.error or 'timeout'}")
+        logger.info(f"Serving {model_name} from {num_workers} workers "
+                    f"with {self.threads_per_worker} threads each ({method})")
+
+    def _make_worker_config(self, config: Dict) -> Dict:
+        """Return the config a worker process runs with."""
+        worker_config = copy.deepcopy(config)
+        worker_config['serving'] = {**worker_config.get('serving', {}), 'workers': 1}
+        worker_config['hardware'] = {**worker_config.get('hardware', {}), 'n_threads': self.threads_per_worker}
+        # Reason: the serving process checks the response cache before dispatching
+        worker_config['response_cache'] = {'enabled': False}
+        return worker_config
+
+    def _start(self, worker: _Worker):
+        """Start (or restart) a worker process."""
+        worker.ready.clear()
+        worker.error = None
+        worker.requests = self._context.Queue()
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.worker_id, self._worker_config, self.model_name, worker.requests, self._results),
+            name=f"gguf-worker-{worker.worker_id}",
+            daemon=True
+        )
+        worker.process.start()
+        worker.started_at = time.time()
+
+    def _collect(self):
+        """Result thread: resolve futures and restart workers that died."""
+        last_check = time.monotonic()
+        while not self._closed:
+            if time.monotonic() - last_check >= 1.0:
+                self._check_workers()
+                last_check = time.monotonic()
+            try:
+                worker_id, request_id, result, error = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            worker = self.workers[worker_id]
+            if request_id == _READY:
+                worker.error = error
+                worker.ready.set()
+                continue
+            with self._lock:
+                future = worker.pending.pop(request_id, None)
+                if error is None:
+                    worker.completed += 1
+                    worker.tokens += result['tokens']
+                    worker.busy_seconds += result['seconds']
+                else:
+                    worker.failed += 1
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(result['response'])
+            else:
+                future.set_exception(RuntimeError(f"GGUF worker {worker_id}: {error}"))
+
+    def _check_workers(self):
+        """Fail the requests of crashed workers and start replacements."""
+        for worker in self.workers:
+            if self._closed or worker.process.is_alive() or worker.error:
+                continue
+            if not worker.ready.is_set():
+                # Died while loading the model; a restart would fail the same way
+                worker.error = f"exited with code {worker.process.exitcode} while loading the model"
+                worker.ready.set()
+                continue
+            with self._lock:
+                lost, worker.pending = worker.pending, {}
+            logger.error(f"GGUF worker {worker.worker_id} exited with code "
+                         f"{worker.process.exitcode}, restarting it")
+            for future in lost.values():
+                future.set_exception(RuntimeError(f"GGUF worker {worker.worker_id} crashed"))
+            self._start(worker)
+
+    def submit(self, prompt: str) -> Future:
+        """Queue a prompt on the least-loaded worker.
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            Future resolving to the response text
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("GGUF worker pool is closed")
+            usable = [w for w in self.workers if not w.error]
+            if not usable:
+                raise RuntimeError("No GGUF worker is available")
+            # Prefer workers that have finished loading over restarting ones
+            worker = min(usable, key=lambda w: (not w.ready.is_set(), len(w.pending), w.completed))
+            request_id = next(self._request_ids)
+            worker.pending[request_id] = future
+        worker.requests.put((request_id, prompt))
+        return future
+
+    def generate(self, prompt: str) -> str:
+        """Generate a response on the least-loaded worker."""
+        return self.submit(prompt).result()
+
+    def generate_many(self, prompts: List[str]) -> List[str]:
+        """Generate several responses in parallel across the workers."""
+        futures = [self.submit(prompt) for prompt in prompts]
+        return [future.result() for future in futures]
+
+    def get_stats(self) -> List[Dict]:
+        """Report load, throughput and memory per worker.
+
+        Returns:
+            One dictionary per worker with `pid`, `in_flight`, `completed`,
+            `failed`, `tokens_per_second` (while generating),
+            `requests_per_minute` (since start) and `memory` (see memory_usage())
+        """
+        stats = []
+        with self._lock:
+            for worker in self.workers:
+                uptime = max(time.time() - worker.started_at, 1e-9)
+                stats.append({
+                    'worker': worker.worker_id,
+                    'pid': worker.process.pid,
+                    'alive': worker.process.is_alive(),
+                    'in_flight': len(worker.pending),
+                    'completed': worker.completed,
+                    'failed': worker.failed,
+                    'tokens_per_second': worker.tokens / worker.busy_seconds if worker.busy_seconds else 0.0,
+                    'requests_per_minute': worker.completed * 60 / uptime,
+                    'memory': memory_usage(worker.process.pid)
+                })
+        return stats
+
+    def close(self):
+        """Stop all workers."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self.workers:
+            if worker.process.is_alive():
+                worker.requests.put(None)
+        for worker in self.workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            for future in worker.pending.values():
+                future.set_exception(RuntimeError("GGUF worker pool closed"))
+            worker.pending.clear()
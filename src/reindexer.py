@@ -0,0 +1,276 @@
+"""Module for re-embedding documents in the background without downtime.
+
+When the embedding model or the chunking settings change, a new index
+generation is built next to the live one (see
+src/vectorstore/generations.py) while queries keep being answered from the
+old one. Embedding runs in batches with pauses, so it takes at most
+`max_busy_fraction` of the time, and it backs off further while a probe
+query on the live index is slower than `latency_budget_ms`. Once every
+chunk is embedded, the active-index pointer is replaced atomically, the
+chat handler switches to the new generation and the old one is deleted
+after a grace period.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from src.document_loader import DocumentLoader
+from src.retriever import Retriever
+from src.vectorstore.embeddings import EmbeddingModelMismatchError, fingerprint_settings
+from src.vectorstore.generations import (
+    drop_generations,
+    index_settings,
+    list_generations,
+    load_active_index,
+    new_generation,
+    save_active_index,
+    with_index_settings
+)
+from src.vectorstore.manifest import build_manifest
+
+logger = logging.getLogger(__name__)
+
+PROBE_QUERY = "index rebuild latency probe"
+MAX_BACKOFF_SECONDS = 10.0
+
+
+def open_live_index(config: Dict) -> Tuple[Retriever, Dict]:
+    """Open the index generation queries are served from (with `reindex.background`).
+
+    An index built with other embedding or chunk settings than configured
+    stays live, opened with the settings it was built with, until its
+    replacement has been built in the background. An index from before
+    generations existed is adopted as the active generation.
+
+    Args:
+        config: Application config
+
+    Returns:
+        Tuple of (retriever, config matching the live index)
+    """
+    path = config['vectorstore_path']
+    active = load_active_index(path)
+    live_config = with_index_settings(config, active['settings']) if active else config
+    try:
+        retriever = Retriever(path, config=live_config)
+    except EmbeddingModelMismatchError as e:
+        if active:
+            raise
+        # Reason: keep serving an unversioned index with the model it was built with
+        live_config = with_index_settings(config, {'embedding': fingerprint_settings(e.stored)})
+        retriever = Retriever(path, config=live_config)
+    if not active:
+        manifest = retriever.vectorstore.load_manifest()
+        if manifest:
+            live_config = with_index_settings(live_config, {
+                'chunk_size': manifest['chunk_size'], 'chunk_overlap': manifest['chunk_overlap']
+            })
+        save_active_index(path, retriever.vectorstore.generation, index_settings(live_config))
+    if index_settings(live_config) != index_settings(config):
+        logger.info("Index was built with other embedding or chunk settings, "
+                    "it will be rebuilt in the background")
+    return retriever, live_config
+
+
+class BackgroundReindexer:
+    """Builds a new index generation in a background thread, then switches to it."""
+
+    def __init__(self, handler, config: Dict, reindex_config: Optional[Dict] = None):
+        """Prepare a rebuild.
+
+        Args:
+            handler: ChatHandler serving queries from the live index
+            config: Application config with the new embedding and chunk settings
+            reindex_config: The `reindex` config section
+        """
+        reindex_config = reindex_config or {}
+        self.handler = handler
+        self.config = config
+        self.settings = index_settings(config)
+        self.batch_size = reindex_config.get('batch_size', 64)
+        self.max_busy_fraction = min(1.0, max(0.05, reindex_config.get('max_busy_fraction', 0.5)))
+        self.latency_budget_ms = reindex_config.get('latency_budget_ms', 100)
+        self.gc_delay_seconds = reindex_config.get('gc_delay_seconds', 30)
+        self.generation = new_generation()
+        self.state = 'pending'
+        self.error: Optional[str] = None
+        self.total = 0
+        self.done = 0
+        self.started_at: Optional[float] = None
+        self.embedding_started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.throttled_seconds = 0.0
+        self.last_probe_ms: Optional[float] = None
+        self._backoff = 0.0
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the rebuild thread."""
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="index-rebuild", daemon=True)
+        self._thread.start()
+
+    def is_running(self) -> bool:
+        """Check whether the rebuild has not finished, failed or been cancelled yet."""
+        return self.state in ('pending', 'loading', 'embedding', 'switching')
+
+    def cancel(self):
+        """Stop the rebuild; its partial generation is deleted."""
+        self._cancel.set()
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for the rebuild thread (including the delayed clean-up) to exit."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def progress(self) -> Dict:
+        """Report rebuild progress.
+
+        Returns:
+            Dictionary with `state` (pending, loading, embedding, switching,
+            done, cancelled or failed), `generation`, `done` and `total`
+            chunks, `percent`, `chunks_per_second`, `eta_seconds` (None until
+            measurable), `elapsed_seconds`, `throttled_seconds`,
+            `last_probe_ms` and `error`
+        """
+        now = self.finished_at or time.time()
+        rate = 0.0
+        if self.embedding_started_at and self.done:
+            rate = self.done / max(now - self.embedding_started_at, 1e-9)
+        eta = (self.total - self.done) / rate if rate and self.state == 'embedding' else None
+        return {
+            'state': self.state,
+            'generation': self.generation,
+            'done': self.done,
+            'total': self.total,
+            'percent': 100.0 * self.done / self.total if self.total else 0.0,
+            'chunks_per_second': rate,
+            'eta_seconds': eta,
+            'elapsed_seconds': now - self.started_at if self.started_at else 0.0,
+            'throttled_seconds': self.throttled_seconds,
+            'last_probe_ms': self.last_probe_ms,
+            'error': self.error
+        }
+
+    def _run(self):
+        """Thread target: build, switch, then delete the old generation."""
+        retriever = None
+        try:
+            retriever = self._build()
+        except Exception as e:
+            logger.error(f"Background re-index to generation {self.generation} failed: {e}")
+            self.state, self.error = 'failed', str(e)
+        if retriever is None:
+            self.finished_at = time.time()
+            self._drop_partial()
+            return
+
+        self.state = 'switching'
+        old_store = self.handler.retriever.vectorstore
+        try:
+            switched = self.handler.switch_index(retriever, self.config)
+        except Exception as e:
+            logger.error(f"Switching to index generation {self.generation} failed: {e}")
+            self.state, self.error = 'failed', str(e)
+            self.finished_at = time.time()
+            return
+        if not switched:
+            logger.info(f"Config changed during the rebuild, discarding index generation {self.generation}")
+            self.state = 'cancelled'
+            self.finished_at = time.time()
+            self._drop_partial()
+            return
+        self.state = 'done'
+        self.finished_at = time.time()
+        logger.info(f"Switched to index generation {self.generation} after "
+                    f"{self.finished_at - self.started_at:.0f}s ({self.total} chunks)")
+
+        # Reason: queries that picked up the old store before the switch
+        # finish on it; it is deleted once they are surely done
+        time.sleep(self.gc_delay_seconds)
+        if old_store.generation != self.generation:
+            drop_generations(old_store.client, old_store.persist_dir, {old_store.generation})
+            old_store._cleanup()
+
+    def _build(self) -> Optional[Retriever]:
+        """Embed every chunk into the new generation.
+
+        Returns:
+            Retriever over the complete new generation, or None if cancelled
+        """
+        self.state = 'loading'
+        live_store = self.handler.retriever.vectorstore
+        persist_dir = self.config['vectorstore_path']
+        # Reason: a rebuild interrupted by a restart leaves collections that
+        # are neither live nor being built
+        leftovers = list_generations(live_store.client) - {
+            live_store.generation, load_active_index(persist_dir).get('generation')
+        }
+        drop_generations(live_store.client, persist_dir, leftovers)
+
+        retriever = Retriever(persist_dir, config=self.config, generation=self.generation)
+        store = retriever.vectorstore
+        expected = self.settings['embedding']['model']
+        if store.fingerprint['embedding_model'] != expected:
+            # Happens when vectors come from an embedding service running another model
+            raise RuntimeError(f"New index would be embedded with {store.fingerprint['embedding_model']}, "
+                               f"not {expected}; restart the embedding service with the new model")
+
+        loader = DocumentLoader(
+            self.config['docs_dir'],
+            chunk_size=self.config['chunk_size'],
+            chunk_overlap=self.config['chunk_overlap']
+        )
+        documents = loader.load_documents()
+        chunks = loader.chunk_documents(documents)
+        self.total = len(chunks)
+        probe = live_store.encode_queries([PROBE_QUERY])[0]
+        logger.info(f"Re-indexing {len(documents)} documents ({self.total} chunks) "
+                    f"into generation {self.generation}")
+
+        self.state = 'embedding'
+        self.embedding_started_at = time.time()
+        for i in range(0, len(chunks), self.batch_size):
+            if self._cancel.is_set():
+                self.state = 'cancelled'
+                return None
+            start = time.perf_counter()
+            store.store_documents(chunks[i:i + self.batch_size])
+            self.done += len(chunks[i:i + self.batch_size])
+            self._throttle(live_store, probe, time.perf_counter() - start)
+
+        store.save_manifest(build_manifest(documents, loader.chunk_size, loader.chunk_overlap))
+        if self._cancel.is_set():
+            self.state = 'cancelled'
+            return None
+        return retriever
+
+    def _throttle(self, live_store, probe, busy_seconds: float):
+        """Pause after a batch to cap CPU use and protect live query latency.
+
+        Args:
+            live_store: Vector store serving queries
+            probe: Encoded probe query for the live store
+            busy_seconds: Time the last batch took to embed and store
+        """
+        pause = busy_seconds * (1 - self.max_busy_fraction) / self.max_busy_fraction
+        start = time.perf_counter()
+        live_store.query_by_embedding(probe, n_results=1)
+        self.last_probe_ms = (time.perf_counter() - start) * 1000
+        if self.last_probe_ms > self.latency_budget_ms:
+            self._backoff = min(max(2 * self._backoff, 0.5), MAX_BACKOFF_SECONDS)
+            pause += self._backoff
+        else:
+            self._backoff = 0.0
+        self.throttled_seconds += pause
+        self._cancel.wait(pause)
+
+    def _drop_partial(self):
+        """Delete the collections of a rebuild that did not complete."""
+        try:
+            store = self.handler.retriever.vectorstore
+            drop_generations(store.client, self.config['vectorstore_path'], {self.generation})
+        except Exception as e:
+            logger.warning(f"Could not delete partial index generation {self.generation}: {e}")
@@ -0,0 +1,149 @@
+"""Module for removing redundant chunks from retrieval results."""
+import logging
+from typing import Dict, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def mmr_select(query_embedding: List[float], embeddings: List[List[float]],
+               k: int, lambda_mult: float = 0.5) -> List[int]:
+    """Pick k candidates by maximal marginal relevance.
+
+    Each step takes the candidate with the best trade-off between similarity
+    to the query and dissimilarity to the candidates already picked.
+
+    Args:
+        query_embedding: Query vector
+        embeddings: Candidate vectors
+        k: Number of candidates to pick
+        lambda_mult: 1.0 ranks by relevance only, 0.0 by diversity only
+
+    Returns:
+        Indices of the picked candidates in selection order
+    """
+    if not embeddings:
+        return []
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query /= max(np.linalg.norm(query), 1e-12)
+
+    relevance = vectors @ query
+    redundancy = np.zeros(len(vectors), dtype=np.float32)
+    selected: List[int] = []
+    for _ in range(min(k, len(vectors))):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return selected
+
+
+def merge_adjacent_chunks(chunks: List[Dict]) -> List[Dict]:
+    """Merge chunks of the same file whose character spans overlap or touch.
+
+    Overlapping text is kept once. Chunks without `chunk_start`/`chunk_end`
+    metadata are passed through unchanged.
+
+    Args:
+        chunks: Retrieved chunks with `content`, `metadata` and `distance`
+
+    Returns:
+        Merged chunks ordered by their best distance. Merged chunks carry the
+        combined span and a `merged_chunks` count in their metadata.
+    """
+    by_source: Dict[str, List[Dict]] = {}
+    passthrough = []
+    for chunk in chunks:
+        metadata = chunk['metadata']
+        if 'chunk_start' in metadata and 'chunk_end' in metadata:
+            by_source.setdefault(metadata.get('source', ''), []).append(chunk)
+        else:
+            passthrough.append(chunk)
+
+    merged = passthrough
+    for group in by_source.values():
+        group.sort(key=lambda c: c['metadata']['chunk_start'])
+        current = None
+        for chunk in group:
+            if current is not None and chunk['metadata']['chunk_start'] <= current['metadata']['chunk_end']:
+                current = _join(current, chunk)
+                continue
+            if current is not None:
+                merged.append(current)
+            current = {**chunk, 'metadata': dict(chunk['metadata'])}
+        merged.append(current)
+    return sorted(merged, key=lambda c: c.get('distance', 0.0))
+
+
+def _join(first: Dict, second: Dict) -> Dict:
+    """Append the part of `second` that extends past the end of `first`."""
+    first_meta, second_meta = first['metadata'], second['metadata']
+    overlap = first_meta['chunk_end'] - second_meta['chunk_start']
+    content = first['content']
+    if second_meta['chunk_end'] > first_meta['chunk_end']:
+        content += second['content'][overlap:]
+    return {
+        **first,
+        'content': content,
+        'distance': min(first.get('distance', 0.0), second.get('distance', 0.0)),
+        'metadata': {
+            **first_meta,
+            'chunk_end': max(first_meta['chunk_end'], second_meta['chunk_end']),
+            'merged_chunks': first_meta.get('merged_chunks', 1) + 1
+        }
+    }
+
+
+class ResultDiversifier:
+    """Selects non-redundant context from an over-fetched candidate set.
+
+    Candidates are picked by maximal marginal relevance, then overlapping
+    neighbours from the same file are merged, so the prompt carries more
+    distinct information per token.
+    """
+
+    def __init__(self, fetch_k: int = 12, lambda_mult: float = 0.5,
+                 mmr: bool = True, merge_adjacent: bool = True):
+        """Initialize the diversifier.
+
+        Args:
+            fetch_k: Number of candidates to retrieve before selection
+            lambda_mult: MMR trade-off, see mmr_select()
+            mmr: Apply maximal marginal relevance selection
+            merge_adjacent: Merge overlapping chunks of the same file
+        """
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+        self.mmr = mmr
+        self.merge_adjacent = merge_adjacent
+
+    def candidates_for(self, k: int) -> int:
+        """Return how many candidates to retrieve for k results."""
+        return max(k, self.fetch_k) if self.mmr else k
+
+    def select(self, query_embedding: List[float], candidates: List[Dict], k: int) -> List[Dict]:
+        """Reduce candidates to at most k distinct chunks.
+
+        Args:
+            query_embedding: Encoded query
+            candidates: Retrieved chunks ordered by distance; MMR needs each
+                chunk's stored vector as `embedding`
+            k: Maximum number of chunks to return
+
+        Returns:
+            Selected chunks without their embeddings
+        """
+        selected = candidates[:k]
+        if self.mmr and len(candidates) > k and all('embedding' in c for c in candidates):
+            indices = mmr_select(query_embedding, [c['embedding'] for c in candidates],
+                                 k, self.lambda_mult)
+            selected = [candidates[i] for i in indices]
+        selected = [{key: value for key, value in c.items() if key != 'embedding'} for c in selected]
+        if self.merge_adjacent:
+            selected = merge_adjacent_chunks(selected)
+        logger.debug(f"Selected {len(selected)} chunks from {len(candidates)} candidates")
+        return selected
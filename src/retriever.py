@@ -1,16 +1,35 @@
 """Module for retrieving relevant document chunks."""
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 logger = logging.getLogger(__name__)
 from src.vectorstore.vector_store import VectorStore
+from src.vectorstore.sharded_store import ShardedVectorStore
+from src.result_diversifier import ResultDiversifier
 
 class Retriever:
     """Handles retrieval of relevant document chunks."""
     
-    def __init__(self, vectorstore_path: str = "vectorstore"):
-        """Initialize with vector store instance."""
-        self.vectorstore = VectorStore(vectorstore_path)
+    def __init__(self, vectorstore_path: str = "vectorstore", config: Optional[Dict] = None,
+                 generation: Optional[str] = None):
+        """Initialize with vector store instance.
+
+        Args:
+            vectorstore_path: Directory of the persistent vector store
+            config: Application config passed on to the vector store
+            generation: Index generation to open (defaults to the active one)
+        """
+        if (config or {}).get('sharding', {}).get('enabled', False):
+            self.vectorstore = ShardedVectorStore(vectorstore_path, config=config, generation=generation)
+        else:
+            self.vectorstore = VectorStore(vectorstore_path, config=config, generation=generation)
+        retrieval = (config or {}).get('retrieval', {})
+        self.diversifier = ResultDiversifier(
+            fetch_k=retrieval.get('fetch_k', 12),
+            lambda_mult=retrieval.get('lambda_mult', 0.5),
+            mmr=retrieval.get('mmr', True),
+            merge_adjacent=retrieval.get('merge_adjacent', True)
+        ) if retrieval.get('diversify', False) else None
 
     def store_documents(self, chunks: List[Dict]) -> bool:
         """
@@ -25,22 +44,58 @@ class Retriever:
         logger.info(f"Storing {len(chunks)} document chunks")
         return self.vectorstore.store_documents(chunks)
         
-    def retrieve_relevant_chunks(self, query: str, k: int = 3) -> List[Dict]:
+    def retrieve_relevant_chunks(self, query: str, k: int = 3, scope: Optional[Dict] = None) -> List[Dict]:
         """
         Retrieve k most relevant document chunks for query.
         
         Args:
             query: The search query
             k: Number of results to return
+            scope: Optional filters on `source`, `file_name`, `section` or `tags`
             
         Returns:
             List of relevant chunks with content and metadata
         """
-        logger.info(f"Retrieving {k} chunks for query: {query}")
-        results = self.vectorstore.query(query, n_results=k)
+        logger.info(f"Retrieving {k} chunks for query: {query}" + (f" (scope: {scope})" if scope else ""))
+        if self.diversifier:
+            return self.retrieve_batch([query], k=k, scope=scope)[0]
+        scope_kwargs = {'scope': scope} if scope else {}
+        results = self.vectorstore.query(query, n_results=k, **scope_kwargs)
         logger.info(f"Retrieved {len(results)} chunks before filtering")
         return self.filter_results(results)
         
+    def retrieve_batch(self, queries: List[str], k: int = 3, scope: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        Retrieve relevant chunks for many queries with batched embedding.
+        
+        Args:
+            queries: Search queries
+            k: Number of results per query
+            scope: Optional filters applied to every query
+            
+        Returns:
+            Filtered chunk lists, one per query
+        """
+        logger.info(f"Retrieving {k} chunks for {len(queries)} queries")
+        if not self.diversifier:
+            results = self.vectorstore.query_batch(queries, n_results=k, scope=scope)
+            return [self.filter_results(r) for r in results]
+
+        # Over-fetch candidates, then drop redundant ones
+        if not queries:
+            return []
+        query_embeddings = self.vectorstore.encode_queries(queries)
+        candidates = self.vectorstore.query_batch_by_embedding(
+            query_embeddings,
+            n_results=self.diversifier.candidates_for(k),
+            scope=scope,
+            include_embeddings=self.diversifier.mmr
+        )
+        return [
+            self.diversifier.select(embedding, self.filter_results(results), k)
+            for embedding, results in zip(query_embeddings, candidates)
+        ]
+        
     def filter_results(self, results: List[Dict]) -> List[Dict]:
         """
         Filter retrieved results for relevance.
@@ -0,0 +1,181 @@
+"""Module for compact per-session chat history with windowed rendering."""
+import hashlib
+import json
+import logging
+import sys
+import zlib
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """One stored message; slots keep per-message overhead small."""
+    __slots__ = ('role', 'content', 'timestamp', 'source_keys', 'details', 'size')
+
+    def __init__(self, role: str, content, timestamp: str, source_keys: tuple,
+                 details: Optional[Dict], size: int):
+        """Initialize a stored message; `size` is its estimated memory footprint in bytes."""
+        self.role = role
+        self.content = content  # str, or zlib-compressed bytes for long messages
+        self.timestamp = timestamp
+        self.source_keys = source_keys
+        self.details = details
+        self.size = size
+
+
+class ChatHistory:
+    """Chat messages of one session, bounded in memory and rendered in pages.
+
+    Source metadata is interned once per chunk and referenced by key from
+    every message that cites it, long message texts are compressed, and the
+    oldest messages are dropped beyond the count or size cap. Only the most
+    recent page is rendered until older pages are requested.
+    """
+
+    def __init__(self, max_messages: int = 200, max_bytes: int = 2 * 1024 * 1024,
+                 page_size: int = 20, compress_above_bytes: int = 1024):
+        """Initialize an empty history.
+
+        Args:
+            max_messages: Oldest messages are dropped beyond this count
+            max_bytes: Oldest messages are dropped beyond this estimated size
+            page_size: Messages rendered initially and per "load earlier"
+            compress_above_bytes: Messages longer than this are stored compressed
+        """
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.page_size = page_size
+        self.compress_above_bytes = compress_above_bytes
+        self.visible = page_size
+        self.dropped = 0
+        self._entries: deque = deque()
+        self._sources: Dict[str, Dict] = {}
+        self._source_refs: Dict[str, int] = {}
+        self._bytes = 0
+        self._render_ms: deque = deque(maxlen=50)
+
+    @classmethod
+    def from_config(cls, history_config: Dict) -> "ChatHistory":
+        """Create a history from the `chat_history` config section."""
+        return cls(
+            max_messages=history_config.get('max_messages', 200),
+            max_bytes=history_config.get('max_bytes', 2 * 1024 * 1024),
+            page_size=history_config.get('page_size', 20),
+            compress_above_bytes=history_config.get('compress_above_bytes', 1024)
+        )
+
+    def __len__(self) -> int:
+        """Return the number of stored messages."""
+        return len(self._entries)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Estimated size of the stored messages and source metadata."""
+        return self._bytes
+
+    @property
+    def hidden_count(self) -> int:
+        """Number of stored messages above the rendered window."""
+        return max(0, len(self._entries) - self.visible)
+
+    def add(self, role: str, content: str, timestamp: str = "",
+            sources: Optional[List[Dict]] = None, **details) -> None:
+        """Append a message.
+
+        Rendering goes back to the most recent page, so the number of
+        rendered messages stays bounded as the conversation grows.
+
+        Args:
+            role: "user" or "assistant"
+            content: Message text
+            timestamp: Display time
+            sources: Metadata of cited chunks
+            **details: Extra display data such as `compression` stats or the
+                `precomputed` match; None values are not stored
+        """
+        keys = tuple(self._intern(source) for source in sources or ())
+        encoded = content.encode('utf-8')
+        stored = zlib.compress(encoded) if len(encoded) > self.compress_above_bytes else content
+        details = {key: value for key, value in details.items() if value is not None} or None
+        size = (sys.getsizeof(stored) + sys.getsizeof(timestamp) + 8 * len(keys)
+                + (sys.getsizeof(str(details)) if details else 0))
+        self._entries.append(_Entry(role, stored, timestamp, keys, details, size))
+        self._bytes += size
+        self.visible = self.page_size
+        self._enforce_limits()
+
+    def _intern(self, metadata: Dict) -> str:
+        """Store source metadata once and return its key."""
+        # Reason: merged chunks share source and chunk_start with unmerged
+        # ones but differ in span and text, so the key covers all metadata
+        digest = hashlib.sha1(json.dumps(metadata, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+        key = f"{metadata.get('source', '')}-{metadata.get('chunk_start', '')}-{digest}"
+        if key not in self._sources:
+            self._sources[key] = metadata
+            self._bytes += sys.getsizeof(str(metadata))
+        self._source_refs[key] = self._source_refs.get(key, 0) + 1
+        return key
+
+    def _enforce_limits(self):
+        """Drop the oldest messages until count and size are within the caps."""
+        while self._entries and (len(self._entries) > self.max_messages or self._bytes > self.max_bytes):
+            entry = self._entries.popleft()
+            self._bytes -= entry.size
+            self.dropped += 1
+            for key in entry.source_keys:
+                self._source_refs[key] -= 1
+                if not self._source_refs[key]:
+                    del self._source_refs[key]
+                    self._bytes -= sys.getsizeof(str(self._sources.pop(key)))
+
+    def load_earlier(self) -> None:
+        """Extend the rendered window by one page."""
+        self.visible += self.page_size
+
+    def window(self) -> Iterator[Dict]:
+        """Yield the messages to render, oldest first.
+
+        Yields:
+            Dictionaries with `role`, `content`, `timestamp` and any details
+        """
+        start = max(0, len(self._entries) - self.visible)
+        for i in range(start, len(self._entries)):
+            yield self._message(self._entries[i])
+
+    def messages(self) -> List[Dict]:
+        """Return every stored message including its sources."""
+        return [{**self._message(entry), 'sources': self.sources_of(entry)} for entry in self._entries]
+
+    def _message(self, entry: _Entry) -> Dict:
+        """Expand a stored entry for display."""
+        content = entry.content if isinstance(entry.content, str) else zlib.decompress(entry.content).decode('utf-8')
+        return {'role': entry.role, 'content': content, 'timestamp': entry.timestamp, **(entry.details or {})}
+
+    def sources_of(self, entry: _Entry) -> List[Dict]:
+        """Resolve the source metadata a message refers to."""
+        return [self._sources[key] for key in entry.source_keys]
+
+    def clear(self) -> None:
+        """Remove all messages."""
+        self._entries.clear()
+        self._sources.clear()
+        self._source_refs.clear()
+        self._bytes = 0
+        self.dropped = 0
+        self.visible = self.page_size
+
+    def record_render(self, seconds: float) -> None:
+        """Record how long rendering the history took in one rerun."""
+        self._render_ms.append(seconds * 1000)
+
+    def render_stats(self) -> Dict:
+        """Return last, median and p95 render time in milliseconds over recent reruns."""
+        if not self._render_ms:
+            return {'last_ms': 0.0, 'median_ms': 0.0, 'p95_ms': 0.0, 'reruns': 0}
+        median, p95 = np.percentile(list(self._render_ms), [50, 95])
+        return {'last_ms': self._render_ms[-1], 'median_ms': float(median),
+                'p95_ms': float(p95), 'reruns': len(self._render_ms)}
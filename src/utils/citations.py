@@ -0,0 +1,42 @@
+"""Module for formatting source citations of chat responses."""
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def format_sources(sources: List[Dict]) -> str:
+    """
+    Format source references into clean bullet points.
+
+    Args:
+        sources: List of source metadata dictionaries
+
+    Returns:
+        Formatted markdown string with clean source references
+    """
+    formatted = []
+    for i, source in enumerate(sources, 1):
+        # Clean source name (remove path and extension)
+        source_name = source.get('source', '')
+        if not source_name and 'metadata' in source:
+            source_name = source['metadata'].get('source', '')
+
+        if not source_name:
+            logger.warning(f"Missing source name in document metadata: {source}")
+            source_name = "Document"
+        else:
+            if '/' in source_name:
+                source_name = source_name.split('/')[-1]
+            if '.' in source_name:
+                source_name = source_name.split('.')[0]
+            source_name = source_name.replace('_', ' ').title()
+
+        # Get excerpt
+        excerpt = source.get('content', '')[:100] + ('...' if len(source.get('content', '')) > 100 else '')
+
+        formatted.append(
+            f"- [^{i}] **{source_name}**\n  {excerpt}"
+        )
+
+    return "\n".join(formatted)
@@ -2,18 +2,78 @@
 from pathlib import Path
 import yaml
 from typing import Any, Dict
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, ConfigDict, ValidationError, ValidationInfo, field_validator
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+class ModelEntry(BaseModel):
+    """Settings of one entry in the `models` section."""
+    path: str
+    max_tokens: int = 512
+    temperature: float = 0.7
+    top_p: float = 0.9
+
+    model_config = ConfigDict(extra="allow")  # speculative, transformers and future options
+
+class LoggingConfig(BaseModel):
+    """The `logging` section."""
+    level: str = "INFO"
+
+    @field_validator('level')
+    @classmethod
+    def known_level(cls, value):
+        """Normalize the level to upper case and reject unknown levels."""
+        if value.upper() not in LOG_LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LOG_LEVELS)}")
+        return value.upper()
 
 class ConfigModel(BaseModel):
-    """Pydantic model for configuration validation."""
-    model_path: str
+    """Pydantic model for configuration validation.
+
+    Only the settings every component depends on are typed here; feature
+    sections (embedding, sharding, response_cache, ...) pass through as-is.
+    """
     docs_dir: str
     vectorstore_path: str
-    max_tokens: int
-    temperature: float
-    top_p: float
+    models: Dict[str, ModelEntry]
+    active_model: str
     chunk_size: int
     chunk_overlap: int
+    logging: LoggingConfig = LoggingConfig()
+
+    model_config = ConfigDict(extra="allow")
+
+    @field_validator('models')
+    @classmethod
+    def has_models(cls, value):
+        """Require at least one configured model."""
+        if not value:
+            raise ValueError("at least one model must be configured")
+        return value
+
+    @field_validator('active_model')
+    @classmethod
+    def active_model_exists(cls, value, info: ValidationInfo):
+        """Require the active model to be one of the configured models."""
+        if 'models' in info.data and value not in info.data['models']:
+            raise ValueError(f"active_model '{value}' is not defined in models")
+        return value
+
+    @field_validator('chunk_size')
+    @classmethod
+    def positive_chunk_size(cls, value):
+        """Require a positive chunk size."""
+        if value <= 0:
+            raise ValueError("chunk_size must be positive")
+        return value
+
+    @field_validator('chunk_overlap')
+    @classmethod
+    def overlap_below_size(cls, value, info: ValidationInfo):
+        """Require a non-negative overlap smaller than the chunk size."""
+        if value < 0 or ('chunk_size' in info.data and value >= info.data['chunk_size']):
+            raise ValueError("chunk_overlap must be >= 0 and smaller than chunk_size")
+        return value
 
 def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
     """
@@ -36,7 +96,7 @@ def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
         config = yaml.safe_load(f)
     
     try:
-        validated = ConfigModel(**config).dict()
+        validated = ConfigModel(**config).model_dump()
         return validated
     except ValidationError as e:
         raise ValueError(f"Invalid configuration: {e}")
@@ -52,14 +112,20 @@ def get_config_with_fallback(config_path: str = "config.yaml") -> Dict[str, Any]
         Configuration dictionary (validated or fallback defaults)
     """
     fallback_config = {
-        "model_path": "models/default.gguf",
-        "docs_dir": "documents",
+        "docs_dir": "docs",
         "vectorstore_path": "vectorstore",
-        "max_tokens": 512,
-        "temperature": 0.7,
-        "top_p": 0.9,
+        "models": {
+            "default": {
+                "path": "models/default.gguf",
+                "max_tokens": 512,
+                "temperature": 0.7,
+                "top_p": 0.9
+            }
+        },
+        "active_model": "default",
         "chunk_size": 1000,
-        "chunk_overlap": 200
+        "chunk_overlap": 200,
+        "logging": {"level": "INFO"}
     }
     
     try:
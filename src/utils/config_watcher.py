@@ -0,0 +1,134 @@
+"""Module for reloading config.yaml while the app is running."""
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+import yaml
+
+from src.utils.config_loader import load_config
+
+logger = logging.getLogger(__name__)
+
+# Sections that can be applied to a running app; changes to any other
+# top-level setting (vectorstore_path, sharding, embedding unless
+# reindex.background is enabled, hot_reload itself, ...) are only picked
+# up on restart.
+LIVE_SECTIONS = (
+    'models', 'active_model', 'chunk_size', 'chunk_overlap', 'docs_dir',
+    'logging', 'context_compression', 'profiling', 'answer_index', 'reindex'
+)
+
+
+def diff_config(old: Dict, new: Dict) -> Dict:
+    """Describe what changed between two configurations.
+
+    Args:
+        old: Configuration currently applied
+        new: Newly loaded configuration
+
+    Returns:
+        Dictionary with the changed model names (`models`), whether the
+        active model, chunking, documents directory or log level changed,
+        the other changed `sections` and the changes needing a restart
+    """
+    old_models, new_models = old.get('models', {}), new.get('models', {})
+    changed_keys = {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+    live = set(LIVE_SECTIONS)
+    if new.get('reindex', {}).get('background', False):
+        # Reason: a new embedding model is then applied by a background rebuild
+        live.add('embedding')
+    return {
+        'models': sorted(
+            name for name in set(old_models) | set(new_models)
+            if old_models.get(name) != new_models.get(name)
+        ),
+        'active_model': old.get('active_model') != new.get('active_model'),
+        'chunking': bool(changed_keys & {'chunk_size', 'chunk_overlap'}),
+        'docs_dir': 'docs_dir' in changed_keys,
+        'logging': old.get('logging', {}).get('level') != new.get('logging', {}).get('level'),
+        'sections': sorted(changed_keys & {'context_compression', 'profiling', 'answer_index',
+                                           'embedding', 'reindex'}),
+        'restart_required': sorted(changed_keys - live)
+    }
+
+
+class ConfigWatcher:
+    """Polls a config file and hands validated changes to a callback.
+
+    Polling the modification time works on every platform and on bind
+    mounts in Docker, where file system events are often not delivered.
+    Invalid files are logged and ignored, so a typo never takes down a
+    running app.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[Dict], None],
+                 interval: float = 2.0, current: Optional[Dict] = None):
+        """Initialize the watcher.
+
+        Args:
+            path: Config file to watch
+            on_change: Called with the validated new config after each change
+            interval: Seconds between checks
+            current: Config currently applied (loaded from path if omitted)
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self._mtime = self._stat()
+        self._current = current if current is not None else load_config(path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[int]:
+        """Return the file's modification time, or None if it is missing."""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def start(self):
+        """Start watching in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+            logger.info(f"Watching {self.path} for changes every {self.interval}s")
+
+    def stop(self):
+        """Stop the watcher thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """Thread target polling the file until stopped."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Failed to apply config change: {e}")
+
+    def check(self) -> bool:
+        """Reload the config if the file changed since the last check.
+
+        Returns:
+            True if a changed, valid config was passed to the callback
+        """
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            new_config = load_config(self.path)
+        except (ValueError, OSError, yaml.YAMLError) as e:
+            self.last_error = str(e)
+            logger.error(f"Ignoring invalid config change in {self.path}: {e}")
+            return False
+        self.last_error = None
+        if new_config == self._current:
+            return False
+        self.on_change(new_config)
+        self._current = new_config
+        return True
@@ -0,0 +1,231 @@
+"""Module for on-demand profiling of individual requests."""
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('sampling', 'cprofile')
+
+
+class StackSampler:
+    """Samples the Python stack of one thread at a fixed interval.
+
+    Produces collapsed stacks (`outer;inner;leaf count` per line), the input
+    format of flamegraph.pl and speedscope. Overhead stays low because the
+    profiled thread is never instrumented, only inspected from outside.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """Prepare sampling of a thread.
+
+        Args:
+            thread_id: Ident of the thread to sample
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        """Start sampling in a background thread."""
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        """Sampler thread: record the target thread's stack until stopped."""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, path: str):
+        """Write the collected samples as collapsed stacks."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """Captures profiles of single requests, on demand or when they are slow.
+
+    Capturing is controlled at runtime through configure(): profile every
+    request (`always`), or only keep the profiles of requests slower than
+    `threshold_seconds`. Threshold capture has to profile every request and
+    discard the fast ones, so it should use the low-overhead sampling mode.
+    """
+
+    def __init__(self, output_dir: str = "profiles", mode: str = "sampling",
+                 always: bool = False, threshold_seconds: Optional[float] = None,
+                 sample_interval: float = 0.005, max_files: int = 20):
+        """Initialize the profiler.
+
+        Args:
+            output_dir: Directory profiles are written to
+            mode: "sampling" (collapsed stacks) or "cprofile" (.pstats)
+            always: Profile every request
+            threshold_seconds: Keep profiles of requests slower than this
+            sample_interval: Seconds between stack samples in sampling mode
+            max_files: Number of most recent profiles to keep
+        """
+        self._lock = threading.Lock()
+        # Reason: only one cProfile profiler can be active per process
+        self._cprofile_busy = threading.Lock()
+        self.output_dir = output_dir
+        self.mode = mode
+        self.always = always
+        self.threshold_seconds = threshold_seconds
+        self.sample_interval = sample_interval
+        self.max_files = max_files
+        self.configure(mode=mode)
+
+    @classmethod
+    def from_config(cls, profiling_config: Dict) -> 'RequestProfiler':
+        """Create a profiler from the `profiling` config section."""
+        return cls(
+            output_dir=profiling_config.get('output_dir', 'profiles'),
+            mode=profiling_config.get('mode', 'sampling'),
+            always=profiling_config.get('always', False),
+            threshold_seconds=profiling_config.get('threshold_seconds'),
+            sample_interval=profiling_config.get('sample_interval', 0.005),
+            max_files=profiling_config.get('max_files', 20)
+        )
+
+    def configure(self, **settings):
+        """Change profiling settings at runtime.
+
+        Args:
+            **settings: Any of mode, always, threshold_seconds,
+                sample_interval, max_files and output_dir
+
+        Raises:
+            ValueError: If the mode or a setting name is unknown
+        """
+        unknown = set(settings) - {'mode', 'always', 'threshold_seconds',
+                                   'sample_interval', 'max_files', 'output_dir'}
+        if unknown:
+            raise ValueError(f"Unknown profiling settings: {sorted(unknown)}")
+        if settings.get('mode', self.mode) not in PROFILE_MODES:
+            raise ValueError(f"Unsupported profiling mode: {settings['mode']}")
+        with self._lock:
+            for name, value in settings.items():
+                setattr(self, name, value)
+        logger.debug(f"Profiling settings: {self.settings()}")
+
+    def settings(self) -> Dict:
+        """Return the current profiling settings."""
+        return {
+            'mode': self.mode,
+            'always': self.always,
+            'threshold_seconds': self.threshold_seconds,
+            'sample_interval': self.sample_interval,
+            'max_files': self.max_files,
+            'output_dir': self.output_dir
+        }
+
+    @property
+    def active(self) -> bool:
+        """True if requests are currently profiled."""
+        return self.always or self.threshold_seconds is not None
+
+    @contextmanager
+    def capture(self, label: str = "request", force: bool = False):
+        """Profile the enclosed block if profiling is active or forced.
+
+        Args:
+            label: Short description used in the file name
+            force: Profile this request regardless of the settings
+        """
+        with self._lock:
+            mode, keep_all = self.mode, self.always or force
+            threshold = self.threshold_seconds
+        if not (keep_all or threshold is not None):
+            yield
+            return
+
+        profiler = self._start(mode)
+        if profiler is None:
+            logger.debug("Another cProfile capture is running, skipping this request")
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stop(mode, profiler)
+            if keep_all or elapsed >= threshold:
+                self._save(mode, profiler, label, elapsed)
+
+    def _start(self, mode: str):
+        """Start a profiler of the given mode for the current thread."""
+        if mode == 'cprofile':
+            if not self._cprofile_busy.acquire(blocking=False):
+                return None
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        return sampler
+
+    def _stop(self, mode: str, profiler):
+        """Stop a profiler started by _start()."""
+        if mode == 'cprofile':
+            profiler.disable()
+            self._cprofile_busy.release()
+        else:
+            profiler.stop()
+
+    def _save(self, mode: str, profiler, label: str, elapsed: float) -> Optional[str]:
+        """Write a profile to disk and apply the retention limit."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        slug = re.sub(r'[^a-zA-Z0-9]+', '-', label).strip('-')[:40] or 'request'
+        extension = 'pstats' if mode == 'cprofile' else 'collapsed'
+        path = os.path.join(
+            self.output_dir,
+            f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms-{slug}.{extension}"
+        )
+        try:
+            if mode == 'cprofile':
+                profiler.dump_stats(path)
+            else:
+                profiler.write(path)
+        except OSError as e:
+            logger.error(f"Failed to write profile {path}: {e}")
+            return None
+        logger.info(f"Wrote profile of {elapsed:.2f}s request to {path}")
+        self._enforce_retention()
+        return path
+
+    def _enforce_retention(self):
+        """Delete the oldest profiles beyond max_files."""
+        profiles = sorted(
+            (entry for entry in os.scandir(self.output_dir)
+             if entry.name.startswith('profile-') and entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in profiles[:max(len(profiles) - self.max_files, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass  # Already removed by a concurrent request
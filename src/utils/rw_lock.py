@@ -0,0 +1,58 @@
+"""Module for a readers-writer lock guarding the live model and index."""
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Lets any number of readers or one writer in at a time.
+
+    Queries hold the lock as readers, so they run concurrently with each
+    other. Changes to the model or the index (config apply, sync, index
+    switch) hold it as writers and wait until running queries have
+    finished. Waiting writers keep new readers out, so a steady stream of
+    queries cannot starve them. A writer may re-enter the lock.
+    """
+
+    def __init__(self):
+        """Initialize an unlocked lock."""
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = None  # Thread holding the write lock
+        self._writes = 0  # Re-entrant write depth of that thread
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock as a reader for the duration of the block."""
+        with self._cond:
+            while self._writer is not None or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock as the only writer for the duration of the block."""
+        me = threading.current_thread()
+        with self._cond:
+            if self._writer is not me:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._waiting_writers -= 1
+                self._writer = me
+            self._writes += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writes -= 1
+                if not self._writes:
+                    self._writer = None
+                    self._cond.notify_all()
@@ -0,0 +1,166 @@
+"""Module for storing chunks as source file offsets instead of duplicated text.
+
+With `chunk_storage.mode: offsets`, the index keeps only each chunk's
+source path, character and byte range and a hash of its text. Overlapping
+chunks would otherwise store most of the corpus more than once. The text is
+read back on demand by slicing the memory-mapped source file. If the slice
+does not match the hash, the file is decoded the way DocumentLoader reads
+it and sliced by character offsets; this covers files with CRLF line
+endings. Chunks of files that changed since indexing cannot be resolved
+and are left out until the next sync re-indexes the file.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STORAGE_MODES = ('text', 'offsets')
+
+
+def chunk_hash(text: str) -> str:
+    """Return a short digest identifying a chunk's text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def storable_documents(mode: str, documents: List[str], metadatas: List[Dict]) -> List[Optional[str]]:
+    """Return the chunk texts to write to the index.
+
+    In `offsets` mode, chunks with byte offsets get a `content_hash` added to
+    their metadata (in place) and are stored without text. Chunks without
+    offsets, e.g. from snapshots of older indexes, keep their text.
+
+    Args:
+        mode: 'text' or 'offsets'
+        documents: Chunk texts
+        metadatas: Chunk metadata
+
+    Returns:
+        Texts to store, None where the text is resolved from the source file
+    """
+    if mode != 'offsets':
+        return documents
+    stored = []
+    for document, metadata in zip(documents, metadatas):
+        if document is None or 'byte_start' not in metadata:
+            stored.append(document)
+            continue
+        metadata['content_hash'] = chunk_hash(document)
+        stored.append(None)
+    return stored
+
+
+class ChunkTextResolver:
+    """Reads chunk texts from memory-mapped source files."""
+
+    def __init__(self, max_open_files: int = 64):
+        """Initialize with an empty map cache.
+
+        Args:
+            max_open_files: Source files kept mapped; least recently used
+                ones are unmapped beyond this
+        """
+        self.max_open_files = max_open_files
+        self._maps: OrderedDict = OrderedDict()  # path -> (mtime_ns, size, file, mmap)
+        self._lock = threading.Lock()
+        self.resolved = 0
+        self.fallbacks = 0
+        self.stale = 0
+
+    def fill(self, documents: List[Optional[str]], metadatas: List[Dict],
+             missing: Optional[str] = None) -> List[Optional[str]]:
+        """Resolve the texts a query or export returned without content.
+
+        Args:
+            documents: Stored texts, None for chunks stored as offsets
+            metadatas: Chunk metadata
+            missing: Value for chunks whose text cannot be resolved
+
+        Returns:
+            Texts in input order
+        """
+        texts = []
+        for document, metadata in zip(documents, metadatas):
+            if document is None:
+                document = self.resolve(metadata)
+                if document is None:
+                    document = missing
+            texts.append(document)
+        return texts
+
+    def resolve(self, metadata: Dict) -> Optional[str]:
+        """Return a chunk's text, or None if its source file changed.
+
+        Args:
+            metadata: Chunk metadata with `source`, `chunk_start`,
+                `chunk_end`, `byte_start`, `byte_end` and `content_hash`
+
+        Returns:
+            Chunk text verified against its hash
+        """
+        source, expected = metadata['source'], metadata.get('content_hash')
+        with self._lock:
+            data = self._map(source)
+            if data is not None:
+                text = data[metadata['byte_start']:metadata['byte_end']].decode('utf-8', errors='replace')
+                if chunk_hash(text) == expected:
+                    self.resolved += 1
+                    return text
+        # Reason: newline translation when reading text shifts byte offsets
+        # (CRLF files); character offsets into the decoded text still match
+        try:
+            with open(source, 'r', encoding='utf-8') as f:
+                text = f.read()[metadata['chunk_start']:metadata['chunk_end']]
+        except (OSError, UnicodeDecodeError):
+            text = None
+        if text is not None and chunk_hash(text) == expected:
+            self.fallbacks += 1
+            return text
+        self.stale += 1
+        logger.warning(f"Chunk {source}@{metadata['chunk_start']} changed on disk since indexing, skipping it")
+        return None
+
+    def _map(self, path: str) -> Optional[mmap.mmap]:
+        """Return the mapping of a file, remapping it if the file changed."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        cached = self._maps.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            self._maps.move_to_end(path)
+            return cached[3]
+        if cached:
+            self._unmap(path)
+        if not stat.st_size:
+            return None  # Reason: empty files cannot be mapped
+        f = open(path, 'rb')
+        self._maps[path] = (stat.st_mtime_ns, stat.st_size, f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        while len(self._maps) > self.max_open_files:
+            self._unmap(next(iter(self._maps)))
+        return self._maps[path][3]
+
+    def _unmap(self, path: str):
+        """Close the mapping and file of a path."""
+        _, _, f, data = self._maps.pop(path)
+        data.close()
+        f.close()
+
+    def get_stats(self) -> Dict:
+        """Return counts of chunks resolved by byte slice, by fallback and skipped as stale."""
+        return {
+            'resolved': self.resolved,
+            'fallbacks': self.fallbacks,
+            'stale': self.stale,
+            'open_files': len(self._maps)
+        }
+
+    def close(self):
+        """Unmap all source files."""
+        with self._lock:
+            for path in list(self._maps):
+                self._unmap(path)
@@ -0,0 +1,318 @@
+"""Module for a shared embedding and retrieval service over a Unix socket.
+
+Run one service per host so app workers share a single embedding model and
+Chroma client instead of loading their own::
+
+    python -m src.vectorstore.embedding_service --config config.yaml
+
+Each message is a 4-byte big-endian length followed by UTF-8 JSON. NumPy
+arrays are sent as base64-encoded raw buffers, so vectors cross the socket
+without float formatting and no pickle is ever loaded from a peer.
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import queue
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+
+import chromadb
+import numpy as np
+
+from src.vectorstore.embeddings import embedding_fingerprint, load_embedding_model
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/greggpt-embeddings.sock"
+LENGTH = struct.Struct(">I")
+
+# Collection methods workers may call; query is handled separately so it can be batched
+COLLECTION_METHODS = ('count', 'get', 'add', 'upsert', 'delete', 'modify')
+
+
+class EmbeddingServiceError(RuntimeError):
+    """Raised in a worker when the embedding service reports an error."""
+
+
+def _to_json(value: Any):
+    """JSON fallback for NumPy values."""
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return {
+            '__ndarray__': base64.b64encode(array.tobytes()).decode('ascii'),
+            'dtype': array.dtype.str,
+            'shape': list(array.shape)
+        }
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _from_json(obj: Dict):
+    """JSON object hook restoring NumPy arrays."""
+    if '__ndarray__' in obj:
+        # bytearray keeps the array writable for callers that modify it in place
+        return np.frombuffer(bytearray(base64.b64decode(obj['__ndarray__'])),
+                             dtype=obj['dtype']).reshape(obj['shape'])
+    return obj
+
+
+def send_message(sock, payload: Dict):
+    """Write one length-prefixed JSON message."""
+    data = json.dumps(payload, default=_to_json).encode('utf-8')
+    sock.sendall(LENGTH.pack(len(data)) + data)
+
+
+def recv_message(sock) -> Dict:
+    """Read one length-prefixed JSON message.
+
+    Raises:
+        ConnectionError: If the peer closed the connection
+    """
+    (length,) = LENGTH.unpack(_recv_exact(sock, LENGTH.size))
+    return json.loads(_recv_exact(sock, length), object_hook=_from_json)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    """Read exactly size bytes from a socket."""
+    buffer = bytearray()
+    while len(buffer) < size:
+        data = sock.recv(min(size - len(buffer), 1 << 20))
+        if not data:
+            raise ConnectionError("Embedding service connection closed")
+        buffer.extend(data)
+    return bytes(buffer)
+
+
+class RequestBatcher:
+    """Coalesces concurrent requests that share a key into one batched call.
+
+    The first pending request opens a batch window of `max_wait` seconds;
+    everything that arrives in the window (up to `max_items`) is executed
+    together by `run_batch(key, items)`, which returns one result per item.
+    """
+
+    def __init__(self, run_batch: Callable[[Tuple, List], List], max_wait: float = 0.002,
+                 max_items: int = 64, name: str = "batcher"):
+        """Start the batching thread.
+
+        Args:
+            run_batch: Executes a list of items with the same key
+            max_wait: Seconds to wait for more requests after the first one
+            max_items: Maximum requests per batch
+            name: Thread name
+        """
+        self.run_batch = run_batch
+        self.max_wait = max_wait
+        self.max_items = max_items
+        self.batches = 0
+        self.items = 0
+        self._queue: queue.Queue = queue.Queue()
+        threading.Thread(target=self._run, name=name, daemon=True).start()
+
+    def submit(self, key: Tuple, item) -> Any:
+        """Queue an item and block until its result is available."""
+        future: Future = Future()
+        self._queue.put((key, item, future))
+        return future.result()
+
+    def _run(self):
+        """Batching thread: collect a window of requests and execute them."""
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(pending) < self.max_items:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups: Dict[Tuple, List] = {}
+            for key, item, future in pending:
+                groups.setdefault(key, []).append((item, future))
+            for key, group in groups.items():
+                try:
+                    results = self.run_batch(key, [item for item, _ in group])
+                except Exception as e:
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+                for (_, future), result in zip(group, results):
+                    future.set_result(result)
+                self.batches += 1
+                self.items += len(group)
+
+
+class EmbeddingService:
+    """Owns the embedding model and Chroma client shared by all workers."""
+
+    def __init__(self, config: Dict, max_wait: float = 0.002, max_batch: int = 64):
+        """Load the embedding model and open the vector store.
+
+        Args:
+            config: Application config (`embedding` and `vectorstore_path`)
+            max_wait: Batch window in seconds, see RequestBatcher
+            max_batch: Maximum requests coalesced into one call
+        """
+        embedding_config = config.get('embedding', {})
+        self.persist_dir = config.get('vectorstore_path', 'vectorstore')
+        self.batch_size = embedding_config.get('batch_size', 32)
+        self.model = load_embedding_model(embedding_config)
+        self.fingerprint = embedding_fingerprint(embedding_config, self.model)
+        self.client = chromadb.PersistentClient(path=self.persist_dir)
+        self.encoder = RequestBatcher(self._encode_batch, max_wait, max_batch, "encode-batcher")
+        self.searcher = RequestBatcher(self._query_batch, max_wait, max_batch, "query-batcher")
+
+    def handle(self, request: Dict) -> Any:
+        """Execute one worker request.
+
+        Args:
+            request: Message with an `op` and its arguments
+
+        Returns:
+            JSON-serializable result
+        """
+        op = request['op']
+        if op == 'info':
+            return {
+                'fingerprint': self.fingerprint,
+                'persist_dir': os.path.abspath(self.persist_dir),
+                'max_batch_size': self.client.get_max_batch_size()
+            }
+        if op == 'encode':
+            return self.encoder.submit((bool(request.get('normalize', False)),), request['texts'])
+        if op == 'query':
+            key = (request['collection'], request['n_results'],
+                   json.dumps(request.get('where'), sort_keys=True), tuple(request['include']))
+            return self.searcher.submit(key, request['query_embeddings'])
+        if op == 'get_or_create_collection':
+            collection = self.client.get_or_create_collection(request['name'], metadata=request.get('metadata'))
+            return {'name': collection.name}
+        if op == 'collection_metadata':
+            return self.client.get_collection(request['name']).metadata
+        if op == 'list_collections':
+            return [getattr(c, 'name', c) for c in self.client.list_collections()]
+        if op == 'delete_collection':
+            self.client.delete_collection(request['name'])
+            return None
+        if op == 'collection' and request['method'] in COLLECTION_METHODS:
+            collection = self.client.get_collection(request['name'])
+            return _plain(getattr(collection, request['method'])(**request.get('kwargs', {})))
+        if op == 'stats':
+            return self.get_stats()
+        raise ValueError(f"Unsupported embedding service request: {op}")
+
+    def _encode_batch(self, key: Tuple, text_lists: List[List[str]]) -> List[np.ndarray]:
+        """Encode the texts of several requests in one model call."""
+        (normalize,) = key
+        texts = [text for texts in text_lists for text in texts]
+        embeddings = np.asarray(self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=normalize,
+            show_progress_bar=False
+        ), dtype=np.float32)
+        return np.split(embeddings, np.cumsum([len(t) for t in text_lists])[:-1])
+
+    def _query_batch(self, key: Tuple, embedding_lists: List) -> List[Dict]:
+        """Search the queries of several requests in one Chroma call."""
+        name, n_results, where, include = key
+        counts = [len(embeddings) for embeddings in embedding_lists]
+        results = _plain(self.client.get_collection(name).query(
+            query_embeddings=[e for embeddings in embedding_lists for e in embeddings],
+            n_results=n_results,
+            where=json.loads(where),
+            include=list(include)
+        ))
+        split, offset = [], 0
+        for count in counts:
+            split.append({
+                field: values[offset:offset + count] if isinstance(values, list) else values
+                for field, values in results.items()
+            })
+            offset += count
+        return split
+
+    def get_stats(self) -> Dict:
+        """Return how many requests were coalesced into how many calls."""
+        return {
+            'encode_requests': self.encoder.items,
+            'encode_batches': self.encoder.batches,
+            'query_requests': self.searcher.items,
+            'query_batches': self.searcher.batches
+        }
+
+    def serve_forever(self, socket_path: str = DEFAULT_SOCKET_PATH):
+        """Listen on a Unix socket until interrupted.
+
+        Args:
+            socket_path: Socket file; access is limited to the current user
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # Stale socket from a previous run
+        service = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                """Answer requests on one worker connection until it closes."""
+                while True:
+                    try:
+                        request = recv_message(self.request)
+                    except ConnectionError:
+                        return
+                    try:
+                        response = {'result': service.handle(request)}
+                    except Exception as e:
+                        logger.error(f"Embedding service request {request.get('op')} failed: {e}")
+                        response = {'error': f"{type(e).__name__}: {e}"}
+                    send_message(self.request, response)
+
+        with _Server(socket_path, Handler) as server:
+            os.chmod(socket_path, 0o600)
+            logger.info(f"Embedding service listening on {socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                os.remove(socket_path)
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    """Threaded Unix socket server whose connection threads never block exit."""
+    daemon_threads = True
+
+
+def _plain(value):
+    """Convert Chroma result objects into JSON-friendly builtins."""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if hasattr(value, 'value') and not isinstance(value, (str, bytes, np.ndarray)):
+        return value.value  # Enum members such as Chroma's Include
+    return value
+
+
+if __name__ == "__main__":
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Shared embedding and retrieval service")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--socket", help="Unix socket path (defaults to embedding_service.socket_path)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    service_config = config.get('embedding_service', {})
+    EmbeddingService(
+        config,
+        max_wait=service_config.get('batch_window_ms', 2) / 1000,
+        max_batch=service_config.get('max_batch', 64)
+    ).serve_forever(args.socket or service_config.get('socket_path', DEFAULT_SOCKET_PATH))
@@ -0,0 +1,169 @@
+"""Module for loading the configured sentence embedding model."""
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+RUNTIME_KEYS = ('embedding_backend', 'embedding_quantization')  # Fingerprint keys added later
+
+ONNX_AVAILABLE = False
+try:
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+    import onnxruntime  # noqa: F401
+    import optimum  # noqa: F401
+    ONNX_AVAILABLE = True
+except ImportError:
+    logger.debug("ONNX runtime not available - embedding backend 'onnx' disabled")
+
+
+class EmbeddingModelMismatchError(ValueError):
+    """Raised when an index was built with a different embedding model."""
+
+    def __init__(self, message: str, stored: Optional[Dict] = None):
+        """Initialize with the error message and the fingerprint stored with the index."""
+        super().__init__(message)
+        self.stored = stored or {}  # Fingerprint the index was built with
+
+
+def load_embedding_model(embedding_config: Dict) -> SentenceTransformer:
+    """Load the embedding model with the configured runtime.
+
+    Args:
+        embedding_config: The `embedding` config section with keys `model`,
+            `backend` ('torch' or 'onnx'), `quantization`, `cache_dir` and
+            `local_files_only`
+
+    Returns:
+        SentenceTransformer ready for encoding on CPU
+    """
+    model_name = embedding_config.get('model', DEFAULT_EMBEDDING_MODEL)
+    backend = embedding_config.get('backend', 'torch')
+    cache_dir = embedding_config.get('cache_dir')
+    local_files_only = embedding_config.get('local_files_only', False)
+
+    if backend == 'onnx':
+        if ONNX_AVAILABLE:
+            return _load_quantized_onnx_model(
+                model_name, cache_dir, local_files_only,
+                embedding_config.get('quantization', 'avx2')
+            )
+        logger.warning("ONNX backend requested but onnxruntime/optimum are not installed, using torch")
+    elif backend != 'torch':
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+
+    logger.info(f"Loading embedding model {model_name} (torch)")
+    return SentenceTransformer(
+        model_name,
+        device='cpu',
+        cache_folder=cache_dir,
+        local_files_only=local_files_only
+    )
+
+
+def _load_quantized_onnx_model(model_name: str, cache_dir: str, local_files_only: bool,
+                               quantization: str) -> SentenceTransformer:
+    """Load an int8 ONNX export of the model, exporting it on first use.
+
+    Args:
+        model_name: Hugging Face name or local path of the model
+        cache_dir: Directory holding downloaded models and ONNX exports
+        local_files_only: Never download, only use locally cached files
+        quantization: onnxruntime quantization target ('avx2', 'avx512',
+            'avx512_vnni' or 'arm64')
+
+    Returns:
+        SentenceTransformer running on onnxruntime
+    """
+    export_dir = Path(cache_dir or 'models/embeddings') / 'onnx-int8' / model_name.replace('/', '--')
+    file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+    if not (export_dir / file_name).exists():
+        logger.info(f"Exporting {model_name} to int8 ONNX in {export_dir}")
+        # Reason: loading with backend='onnx' converts the locally cached
+        # PyTorch weights, so no pre-exported ONNX download is needed.
+        model = SentenceTransformer(
+            model_name,
+            device='cpu',
+            backend='onnx',
+            cache_folder=cache_dir,
+            local_files_only=local_files_only
+        )
+        model.save(str(export_dir))
+        export_dynamic_quantized_onnx_model(model, quantization, str(export_dir))
+
+    logger.info(f"Loading embedding model {model_name} (onnx int8, {quantization})")
+    return SentenceTransformer(
+        str(export_dir),
+        device='cpu',
+        backend='onnx',
+        local_files_only=True,
+        model_kwargs={'file_name': file_name}
+    )
+
+
+def embedding_fingerprint(embedding_config: Dict, model: SentenceTransformer) -> Dict:
+    """Describe the embedding space an index is built in.
+
+    Args:
+        embedding_config: The `embedding` config section
+        model: Loaded embedding model
+
+    Returns:
+        Metadata identifying the embedding model, dimension and runtime
+        (the backend actually loaded and its quantization), since int8 ONNX
+        and fp32 torch vectors of the same model are not interchangeable
+    """
+    # Reason: an unavailable ONNX runtime falls back to torch, so record
+    # what was loaded rather than what was configured
+    backend = getattr(model, 'backend', 'torch')
+    return {
+        'embedding_model': embedding_config.get('model', DEFAULT_EMBEDDING_MODEL),
+        'embedding_dim': model.get_sentence_embedding_dimension(),
+        'embedding_backend': backend,
+        'embedding_quantization': embedding_config.get('quantization', 'avx2') if backend == 'onnx' else 'none'
+    }
+
+
+def fingerprint_settings(fingerprint: Dict) -> Dict:
+    """Return the `embedding` config settings that reproduce a stored fingerprint."""
+    settings = {'model': fingerprint['embedding_model']}
+    if 'embedding_backend' in fingerprint:
+        settings['backend'] = fingerprint['embedding_backend']
+    if fingerprint.get('embedding_quantization', 'none') != 'none':
+        settings['quantization'] = fingerprint['embedding_quantization']
+    return settings
+
+
+def describe_fingerprint(fingerprint: Dict) -> str:
+    """Return a readable description of an embedding fingerprint."""
+    runtime = fingerprint.get('embedding_backend', 'unknown runtime')
+    if fingerprint.get('embedding_quantization', 'none') != 'none':
+        runtime += f" int8 {fingerprint['embedding_quantization']}"
+    return f"{fingerprint.get('embedding_model')} ({fingerprint.get('embedding_dim')} dims, {runtime})"
+
+
+def check_fingerprint(stored: Dict, expected: Dict):
+    """Raise if an index was built with a different embedding model or runtime.
+
+    Indexes recorded before the runtime was part of the fingerprint are
+    only checked for model name and dimension.
+
+    Args:
+        stored: Fingerprint recorded in the index metadata
+        expected: Fingerprint of the currently configured model
+
+    Raises:
+        EmbeddingModelMismatchError: If model name, dimension, backend or
+            quantization differ
+    """
+    keys = ['embedding_model', 'embedding_dim'] + [key for key in RUNTIME_KEYS if key in stored]
+    if any(stored.get(key) != expected.get(key) for key in keys):
+        raise EmbeddingModelMismatchError(
+            f"Index was built with {describe_fingerprint(stored)} but {describe_fingerprint(expected)} "
+            f"is configured - rebuild the vector store",
+            stored=stored
+        )
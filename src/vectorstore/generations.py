@@ -0,0 +1,157 @@
+"""Module for versioned index generations and the pointer to the live one.
+
+An index generation is a complete set of collections plus its manifest,
+built with one embedding model and one chunking setup. Collections of a
+generation carry its id as a name suffix (`documents.g1760000000`); indexes
+built before generations existed keep their plain names and have the
+generation None. `<vectorstore_path>/active_index.json` names the generation
+queries are served from, so switching to a rebuilt index is a single atomic
+file replace.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.vectorstore.embeddings import DEFAULT_EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_FILE = "active_index.json"
+INDEX_BASES = ("documents",)
+INDEX_PREFIXES = ("documents__",)
+
+
+def index_settings(config: Dict) -> Dict:
+    """Return the settings an index generation is built with.
+
+    Args:
+        config: Application config
+
+    Returns:
+        Dictionary with the embedding settings that change the vectors
+        (batch size or cache paths do not), `chunk_size` and `chunk_overlap`
+    """
+    embedding = config.get('embedding', {})
+    settings = {
+        'model': embedding.get('model', DEFAULT_EMBEDDING_MODEL),
+        'backend': embedding.get('backend', 'torch')
+    }
+    if settings['backend'] == 'onnx':
+        settings['quantization'] = embedding.get('quantization', 'avx2')
+    return {
+        'embedding': settings,
+        'chunk_size': config.get('chunk_size'),
+        'chunk_overlap': config.get('chunk_overlap')
+    }
+
+
+def with_index_settings(config: Dict, settings: Dict) -> Dict:
+    """Return a copy of config that builds or opens an index with the given settings."""
+    return {
+        **config,
+        'embedding': {**config.get('embedding', {}), **settings.get('embedding', {})},
+        'chunk_size': settings.get('chunk_size', config.get('chunk_size')),
+        'chunk_overlap': settings.get('chunk_overlap', config.get('chunk_overlap'))
+    }
+
+
+def new_generation() -> str:
+    """Return a fresh generation id, valid as a collection name suffix."""
+    return f"g{time.time_ns() // 1_000_000}"
+
+
+def collection_name(base: str, generation: Optional[str]) -> str:
+    """Return the name of a collection within a generation."""
+    return base if generation is None else f"{base}.{generation}"
+
+
+def parse_collection_name(name: str) -> Tuple[str, Optional[str]]:
+    """Split a collection name into its base name and generation.
+
+    Shard ids and base names never contain dots, so the suffix is unambiguous.
+    """
+    base, _, generation = name.partition('.')
+    return base, generation or None
+
+
+def is_index_collection(name: str) -> bool:
+    """Check whether a collection holds document chunks of some generation."""
+    base, _ = parse_collection_name(name)
+    return base in INDEX_BASES or base.startswith(INDEX_PREFIXES)
+
+
+def manifest_path(persist_dir: str, generation: Optional[str]) -> str:
+    """Return the manifest path of a generation."""
+    name = 'manifest.json' if generation is None else f'manifest.{generation}.json'
+    return os.path.join(persist_dir, name)
+
+
+def load_active_index(persist_dir: str) -> Dict:
+    """Return the active generation record, or an empty dict if none was written.
+
+    The record has the keys `generation` (None for an index without
+    suffix), `settings` (see index_settings()) and `activated_at`.
+    """
+    path = os.path.join(persist_dir, ACTIVE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_active_index(persist_dir: str, generation: Optional[str], settings: Dict) -> None:
+    """Point queries at a generation; readers see the old or the new file, never a mix."""
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, ACTIVE_FILE)
+    record = {
+        'generation': generation,
+        'settings': settings,
+        'activated_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(record, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    logger.info(f"Active index generation is now {generation or 'unversioned'}")
+
+
+def list_generations(client) -> Set[Optional[str]]:
+    """Return the generations that have collections in the client."""
+    generations = set()
+    for collection in client.list_collections():
+        # list_collections returns names in some Chroma versions
+        name = getattr(collection, 'name', collection)
+        if is_index_collection(name):
+            generations.add(parse_collection_name(name)[1])
+    return generations
+
+
+def drop_generations(client, persist_dir: str, generations: Set[Optional[str]]) -> List[str]:
+    """Delete the collections and manifests of index generations.
+
+    Removes the old generation after a switch and leftovers of rebuilds
+    that were interrupted by a restart.
+
+    Args:
+        client: Chroma client holding the index
+        persist_dir: Vector store directory with the manifests
+        generations: Generations to delete (None is the unversioned index)
+
+    Returns:
+        Names of the deleted collections
+    """
+    deleted = []
+    for collection in client.list_collections():
+        name = getattr(collection, 'name', collection)
+        if is_index_collection(name) and parse_collection_name(name)[1] in generations:
+            client.delete_collection(name)
+            deleted.append(name)
+    for generation in generations:
+        path = manifest_path(persist_dir, generation)
+        if os.path.exists(path):
+            os.remove(path)
+    if generations:
+        logger.info(f"Dropped index generations {sorted(g or 'unversioned' for g in generations)} "
+                    f"({len(deleted)} collections)")
+    return deleted
@@ -0,0 +1,241 @@
+"""Module for tuning the HNSW index parameters on the real embeddings.
+
+Usage:
+    python -m src.vectorstore.hnsw_tuning --config config.yaml [--rebuild]
+
+Every combination of M, construction ef and search ef is built in an
+in-memory Chroma collection from the vectors already in the index. Each one
+is measured for recall@k against exact brute-force search and for query
+latency percentiles. The fastest setting that reaches the target recall is
+written to `<vectorstore_path>/hnsw.json`, which VectorStore applies to every
+collection it creates.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import chromadb
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_FILE = "hnsw.json"
+HNSW_KEYS = ('hnsw:M', 'hnsw:construction_ef', 'hnsw:search_ef')
+
+
+def load_hnsw_settings(persist_dir: str) -> Dict:
+    """Return tuned `hnsw:*` collection metadata, or an empty dict if untuned."""
+    path = os.path.join(persist_dir, SETTINGS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        settings = json.load(f)
+    return {key: settings[key] for key in HNSW_KEYS if key in settings}
+
+
+def save_hnsw_settings(persist_dir: str, result: Dict) -> str:
+    """Persist a tuning result as the HNSW settings for new collections.
+
+    Args:
+        persist_dir: Vector store directory
+        result: Entry from tune() with parameters and measurements
+
+    Returns:
+        Path of the written settings file
+    """
+    os.makedirs(persist_dir, exist_ok=True)
+    path = os.path.join(persist_dir, SETTINGS_FILE)
+    settings = {
+        'hnsw:M': result['M'],
+        'hnsw:construction_ef': result['ef_construction'],
+        'hnsw:search_ef': result['ef_search'],
+        'measured': {key: result[key] for key in ('recall', 'p50_ms', 'p95_ms', 'p99_ms', 'build_seconds')},
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(settings, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def brute_force_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int,
+                          space: str = 'l2') -> np.ndarray:
+    """Exact k nearest neighbours, ranked like Chroma ranks the given space.
+
+    Args:
+        vectors: Indexed vectors (n x dim)
+        queries: Query vectors (q x dim)
+        k: Number of neighbours
+        space: Chroma distance space ('l2', 'cosine' or 'ip')
+
+    Returns:
+        Indices of the k nearest vectors per query (q x k)
+    """
+    if space == 'cosine':
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    if space in ('cosine', 'ip'):
+        distances = -(queries @ vectors.T)
+    else:
+        distances = (
+            (queries ** 2).sum(axis=1)[:, None] - 2 * queries @ vectors.T + (vectors ** 2).sum(axis=1)[None, :]
+        )
+    k = min(k, len(vectors))
+    nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1)
+
+
+def evaluate(client, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int,
+             space: str, M: int, ef_construction: int, ef_search: int) -> Dict:
+    """Build one index configuration and measure recall and latency.
+
+    Args:
+        client: Chroma client used for throwaway collections
+        vectors: Indexed vectors
+        queries: Query vectors
+        truth: Exact neighbours from brute_force_neighbors()
+        k: Neighbours per query
+        space: Distance space of the real index
+        M: HNSW graph degree
+        ef_construction: Candidate list size while building
+        ef_search: Candidate list size while searching
+
+    Returns:
+        Parameters with recall@k, latency percentiles and build time
+    """
+    name = f"hnsw-tuning-{uuid.uuid4().hex[:12]}"
+    collection = client.create_collection(name, metadata={
+        'hnsw:space': space, 'hnsw:M': M,
+        'hnsw:construction_ef': ef_construction, 'hnsw:search_ef': ef_search
+    })
+    try:
+        start = time.perf_counter()
+        batch_size = client.get_max_batch_size()
+        for i in range(0, len(vectors), batch_size):
+            collection.add(ids=[str(j) for j in range(i, min(i + batch_size, len(vectors)))],
+                           embeddings=vectors[i:i + batch_size])
+        build_seconds = time.perf_counter() - start
+
+        for query in queries[:5]:  # Warm up before timing
+            collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            found = collection.query(query_embeddings=[query], n_results=k, include=[])['ids'][0]
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(set(map(int, found)) & set(expected.tolist()))
+    finally:
+        client.delete_collection(name)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'M': M, 'ef_construction': ef_construction, 'ef_search': ef_search,
+        'recall': hits / truth.size,
+        'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+        'build_seconds': build_seconds
+    }
+
+
+def tune(vectors: np.ndarray, queries: np.ndarray, k: int = 5, space: str = 'l2',
+         m_values: List[int] = (8, 16, 32), ef_construction_values: List[int] = (100, 200),
+         ef_search_values: List[int] = (10, 40, 100)) -> List[Dict]:
+    """Measure every parameter combination of the grid.
+
+    Returns:
+        One result per combination, see evaluate()
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    truth = brute_force_neighbors(vectors, queries, k, space)
+    client = chromadb.EphemeralClient()
+    results = []
+    for M, ef_construction, ef_search in itertools.product(m_values, ef_construction_values, ef_search_values):
+        result = evaluate(client, vectors, queries, truth, k, space, M, ef_construction, ef_search)
+        logger.info(f"M={M} ef_construction={ef_construction} ef_search={ef_search}: "
+                    f"recall@{k}={result['recall']:.3f} p95={result['p95_ms']:.2f}ms")
+        results.append(result)
+    return results
+
+
+def choose(results: List[Dict], target_recall: float = 0.95) -> Dict:
+    """Pick the lowest-p95 setting reaching the target recall (else the best recall)."""
+    good = [r for r in results if r['recall'] >= target_recall]
+    if good:
+        return min(good, key=lambda r: (r['p95_ms'], r['build_seconds']))
+    logger.warning(f"No setting reached recall {target_recall}, choosing the most accurate one")
+    return max(results, key=lambda r: (r['recall'], -r['p95_ms']))
+
+
+def format_report(results: List[Dict], chosen: Optional[Dict], k: int) -> str:
+    """Render results as a plain text table."""
+    lines = [f"{'M':>4} {'ef_con':>7} {'ef_search':>9} {f'recall@{k}':>9} "
+             f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'build s':>8}"]
+    for r in results:
+        marker = "  <- chosen" if r is chosen else ""
+        lines.append(f"{r['M']:>4} {r['ef_construction']:>7} {r['ef_search']:>9} {r['recall']:>9.3f} "
+                     f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} "
+                     f"{r['build_seconds']:>8.2f}{marker}")
+    return "\n".join(lines)
+
+
+def main():
+    """Command line entry point."""
+    import yaml
+    from src.retriever import Retriever
+
+    parser = argparse.ArgumentParser(description="Tune HNSW parameters for recall and latency")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per query for recall@k")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--queries-file", help="Text file with one real query per line "
+                                               "(default: sample stored chunk vectors)")
+    parser.add_argument("--M", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 40, 100])
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--dry-run", action="store_true", help="Report only, do not save settings")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild the existing index with the chosen settings (no re-embedding)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    vectorstore = Retriever(config['vectorstore_path'], config=config).vectorstore
+    vectors = np.asarray(vectorstore.export_records()['embeddings'], dtype=np.float32)
+    if len(vectors) == 0:
+        raise SystemExit("The index is empty - index documents before tuning")
+
+    if args.queries_file:
+        with open(args.queries_file, encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()][:args.num_queries]
+        queries = np.asarray(vectorstore.encode_queries(texts), dtype=np.float32)
+    else:
+        rng = np.random.default_rng(0)
+        queries = vectors[rng.choice(len(vectors), min(args.num_queries, len(vectors)), replace=False)]
+
+    space = (vectorstore._collections()[0].metadata or {}).get('hnsw:space', 'l2')
+    results = tune(vectors, queries, args.k, space, args.M, args.ef_construction, args.ef_search)
+    chosen = choose(results, args.target_recall)
+    print(f"{len(vectors)} vectors, {len(queries)} queries, space={space}")
+    print(format_report(results, chosen, args.k))
+
+    if not args.dry_run:
+        path = save_hnsw_settings(vectorstore.persist_dir, chosen)
+        print(f"Saved settings to {path}")
+        if args.rebuild:
+            vectorstore.hnsw_settings = load_hnsw_settings(vectorstore.persist_dir)
+            vectorstore.rebuild_index()
+            print("Rebuilt the index with the new settings")
+        else:
+            print("Settings apply to newly created collections; use --rebuild to apply them now")
+
+
+if __name__ == "__main__":
+    main()
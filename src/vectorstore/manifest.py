@@ -0,0 +1,65 @@
+"""Module for tracking which document versions are in the index."""
+import hashlib
+import logging
+from typing import Dict, List, Tuple
+
+from src.document_loader import CHUNKER_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    """Return the SHA-256 hex digest of text encoded as UTF-8."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def build_manifest(documents: List[Dict], chunk_size: int, chunk_overlap: int) -> Dict:
+    """Describe the documents and chunking settings of an index.
+
+    Args:
+        documents: Documents from DocumentLoader.load_documents()
+        chunk_size: Chunk size used for the index
+        chunk_overlap: Chunk overlap used for the index
+
+    Returns:
+        Manifest with chunker version, chunking settings and a content hash
+        per source file
+    """
+    return {
+        'chunker_version': CHUNKER_VERSION,
+        'chunk_size': chunk_size,
+        'chunk_overlap': chunk_overlap,
+        'files': {
+            doc['metadata']['source']: content_hash(doc['content'])
+            for doc in documents
+        }
+    }
+
+
+def diff_manifest(indexed: Dict, current: Dict) -> Tuple[List[str], List[str]]:
+    """Find the sources that must be re-indexed or removed.
+
+    Args:
+        indexed: Manifest of the existing index (may be empty)
+        current: Manifest of the documents on disk
+
+    Returns:
+        Tuple of (sources to (re-)index, sources to remove from the index)
+    """
+    chunking_changed = (
+        indexed.get('chunker_version', 1) != current.get('chunker_version', 1)
+        or indexed.get('chunk_size') != current['chunk_size']
+        or indexed.get('chunk_overlap') != current['chunk_overlap']
+    )
+    indexed_files = indexed.get('files', {})
+    if chunking_changed:
+        if indexed_files:
+            logger.info("Chunking settings changed - all documents must be re-indexed")
+        return list(current['files']), list(indexed_files)
+
+    changed = [
+        source for source, digest in current['files'].items()
+        if indexed_files.get(source) != digest
+    ]
+    removed = [source for source in indexed_files if source not in current['files']]
+    return changed, removed
@@ -0,0 +1,224 @@
+"""Module for using the shared embedding service from an app worker.
+
+The proxies mirror the parts of the SentenceTransformer and Chroma APIs that
+VectorStore uses, so the store works the same whether the model and index
+live in-process or in the service.
+"""
+import logging
+import socket
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.vectorstore.embedding_service import (
+    DEFAULT_SOCKET_PATH,
+    EmbeddingServiceError,
+    recv_message,
+    send_message
+)
+
+logger = logging.getLogger(__name__)
+
+# Requests that change nothing in the service and can be repeated safely
+# after a broken connection; writes may already have been applied
+READ_OPS = ('info', 'encode', 'query', 'collection_metadata', 'list_collections', 'get_or_create_collection')
+READ_COLLECTION_METHODS = ('count', 'get')
+
+
+class ServiceConnection:
+    """Sends requests to the embedding service, one socket per thread."""
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        """Initialize the connection settings.
+
+        Args:
+            socket_path: Unix socket of the service
+            timeout: Seconds to wait for a response
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _socket(self) -> socket.socket:
+        """Return this thread's socket, connecting on first use."""
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def call(self, op: str, **arguments):
+        """Execute a request and return its result.
+
+        Read requests are sent once more on a new connection if the
+        connection broke (e.g. the service restarted); writes are not, since
+        the service may have applied them already.
+
+        Raises:
+            EmbeddingServiceError: If the service reports an error
+            OSError: If the service cannot be reached or does not answer
+                within the timeout
+        """
+        repeatable = op in READ_OPS or (op == 'collection' and arguments.get('method') in READ_COLLECTION_METHODS)
+        for attempt in range(2):
+            try:
+                sock = self._socket()
+                send_message(sock, {'op': op, **arguments})
+                response = recv_message(sock)
+                break
+            except OSError as e:
+                # Reason: after a timeout the reply may still arrive on this
+                # socket and would be read as the answer to the next request
+                self.close()
+                if attempt or not repeatable or not isinstance(e, ConnectionError):
+                    raise
+        if 'error' in response:
+            raise EmbeddingServiceError(response['error'])
+        return response['result']
+
+    def close(self):
+        """Close this thread's socket."""
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+class RemoteEmbeddingModel:
+    """Stand-in for SentenceTransformer that encodes in the service."""
+
+    def __init__(self, connection: ServiceConnection, embedding_dim: int):
+        """Initialize with the service connection and the model's embedding dimension."""
+        self.connection = connection
+        self.embedding_dim = embedding_dim
+        self.device = f"embedding service ({connection.socket_path})"
+
+    def encode(self, sentences, batch_size: Optional[int] = None, show_progress_bar: bool = False,
+               normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        """Encode one text or a list of texts.
+
+        batch_size and show_progress_bar are accepted for compatibility; the
+        service batches requests from all workers itself.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = self.connection.call('encode', texts=texts, normalize=normalize_embeddings)
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Return the dimension of the service's embedding model."""
+        return self.embedding_dim
+
+
+class RemoteCollection:
+    """Stand-in for a Chroma collection held by the service."""
+
+    def __init__(self, connection: ServiceConnection, name: str):
+        """Initialize with the service connection and the collection name."""
+        self.connection = connection
+        self.name = name
+
+    @property
+    def metadata(self) -> Optional[Dict]:
+        """Current collection metadata."""
+        return self.connection.call('collection_metadata', name=self.name)
+
+    def _call(self, method: str, **kwargs):
+        """Call a Chroma collection method in the service and return its result."""
+        return self.connection.call('collection', name=self.name, method=method, kwargs=kwargs)
+
+    def count(self) -> int:
+        """Return the number of records in the collection."""
+        return self._call('count')
+
+    def get(self, **kwargs) -> Dict:
+        """Fetch records, see chromadb Collection.get()."""
+        return self._call('get', **kwargs)
+
+    def add(self, **kwargs):
+        """Add records, see chromadb Collection.add()."""
+        return self._call('add', **kwargs)
+
+    def upsert(self, **kwargs):
+        """Add or update records, see chromadb Collection.upsert()."""
+        return self._call('upsert', **kwargs)
+
+    def delete(self, **kwargs):
+        """Delete records, see chromadb Collection.delete()."""
+        return self._call('delete', **kwargs)
+
+    def modify(self, **kwargs):
+        """Change the collection name or metadata, see chromadb Collection.modify()."""
+        return self._call('modify', **kwargs)
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None,
+              include: Optional[List[str]] = None) -> Dict:
+        """Search the collection; concurrent searches are batched by the service."""
+        return self.connection.call(
+            'query',
+            collection=self.name,
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=include or ['documents', 'metadatas', 'distances']
+        )
+
+
+class RemoteClient:
+    """Stand-in for a Chroma client whose collections live in the service."""
+
+    def __init__(self, connection: ServiceConnection, max_batch_size: int):
+        """Initialize with the service connection and the service's Chroma batch size limit."""
+        self.connection = connection
+        self.max_batch_size = max_batch_size
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict] = None) -> RemoteCollection:
+        """Open a collection in the service, creating it if needed."""
+        self.connection.call('get_or_create_collection', name=name, metadata=metadata)
+        return RemoteCollection(self.connection, name)
+
+    def list_collections(self) -> List[str]:
+        """Return the names of the service's collections."""
+        return self.connection.call('list_collections')
+
+    def delete_collection(self, name: str):
+        """Delete a collection in the service."""
+        self.connection.call('delete_collection', name=name)
+
+    def get_max_batch_size(self) -> int:
+        """Return the maximum number of records per Chroma write."""
+        return self.max_batch_size
+
+
+def connect(service_config: Dict) -> Dict:
+    """Connect to the embedding service.
+
+    Args:
+        service_config: The `embedding_service` config section
+
+    Returns:
+        Dictionary with the remote `embedding_model`, `client`, the service's
+        embedding `fingerprint` and its `persist_dir`
+
+    Raises:
+        OSError: If the service is not running
+    """
+    connection = ServiceConnection(
+        service_config.get('socket_path', DEFAULT_SOCKET_PATH),
+        timeout=service_config.get('timeout_seconds', 60.0)
+    )
+    info = connection.call('info')
+    logger.info(f"Connected to embedding service at {connection.socket_path}")
+    return {
+        'embedding_model': RemoteEmbeddingModel(connection, info['fingerprint']['embedding_dim']),
+        'client': RemoteClient(connection, info['max_batch_size']),
+        'fingerprint': info['fingerprint'],
+        'persist_dir': info['persist_dir']
+    }
@@ -0,0 +1,303 @@
+"""Module for a vector store sharded across several Chroma collections."""
+import hashlib
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.vectorstore.chunk_text import storable_documents
+from src.vectorstore.generations import collection_name, parse_collection_name
+from src.vectorstore.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+SHARD_PREFIX = "documents__"
+
+
+class ShardedVectorStore(VectorStore):
+    """Spreads chunks over one collection per shard and queries them in parallel.
+
+    Shards are assigned per source file, either by its directory
+    (`strategy: directory`), by a hash of its path (`strategy: hash`) or one
+    per file (`strategy: source`), so all chunks of a file live in the same
+    shard. Queries scoped to files only search the shards holding them; with
+    the `source` strategy that is exactly the vectors of the selected files,
+    at the cost of unscoped queries fanning out to one collection per file.
+    """
+
+    def __init__(self, persist_dir: str = "vectorstore", initial_docs: List[Dict] = None,
+                 config: Optional[Dict] = None, generation: Optional[str] = None):
+        """Initialize the sharded store.
+
+        Args:
+            persist_dir: Directory to store vector data
+            initial_docs: Optional documents to process on startup
+            config: Application config with a `sharding` section
+            generation: Index generation to open (defaults to the active one)
+        """
+        sharding = (config or {}).get('sharding', {})
+        self.strategy = sharding.get('strategy', 'directory')
+        self.num_shards = sharding.get('num_shards', 4)
+        if self.strategy not in ('directory', 'hash', 'source'):
+            raise ValueError(f"Unsupported sharding strategy: {self.strategy}")
+        self.executor = ThreadPoolExecutor(
+            max_workers=sharding.get('workers', 4),
+            thread_name_prefix="shard"
+        )
+        self._sources_by_name: Optional[Dict[str, List[str]]] = None  # file name -> sources, from the manifest
+        super().__init__(persist_dir, initial_docs=initial_docs, config=config, generation=generation)
+
+    def _open_collections(self):
+        """Open every existing shard collection."""
+        self.collection = None  # Reason: all access goes through self.shards
+        self.shards = {}
+        for collection in self.client.list_collections():
+            # list_collections returns names in some Chroma versions
+            name = getattr(collection, 'name', collection)
+            base, generation = parse_collection_name(name)
+            if base.startswith(SHARD_PREFIX) and generation == self.generation:
+                self.shards[base[len(SHARD_PREFIX):]] = self._get_or_create_collection(name)
+        logger.info(f"Opened {len(self.shards)} shards ({self.strategy} strategy)")
+
+    def shard_for_source(self, source: str) -> str:
+        """Return the shard id a source file belongs to.
+
+        Args:
+            source: Source path as stored in chunk metadata
+
+        Returns:
+            Shard id, valid as part of a Chroma collection name
+        """
+        if self.strategy == 'hash':
+            digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+            return f"hash-{int(digest, 16) % self.num_shards}"
+        prefix, key = ('src', source) if self.strategy == 'source' else ('dir', str(Path(source).parent))
+        slug = re.sub(r'[^a-zA-Z0-9]+', '-', key).strip('-')[:40] or 'root'
+        # Short digest keeps ids unique after the slug is sanitized and cut
+        return f"{prefix}-{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+
+    def _shard(self, shard_id: str):
+        """Return the collection of a shard, creating it if necessary."""
+        if shard_id not in self.shards:
+            self.shards[shard_id] = self._get_or_create_collection(
+                collection_name(f"{SHARD_PREFIX}{shard_id}", self.generation)
+            )
+        return self.shards[shard_id]
+
+    def _group_by_shard(self, items: List, source_of) -> Dict[str, List]:
+        """Group items by the shard of their source file."""
+        groups: Dict[str, List] = {}
+        for item in items:
+            groups.setdefault(self.shard_for_source(source_of(item)), []).append(item)
+        return groups
+
+    def _has_documents(self) -> bool:
+        """Check if any shard contains documents."""
+        return any(collection.count() > 0 for collection in self.shards.values())
+
+    def store_documents(self, chunks: List[Dict]) -> None:
+        """Embed and store chunks, building each shard in parallel.
+
+        Args:
+            chunks: Document chunks with content and metadata
+        """
+        groups = self._group_by_shard(chunks, lambda chunk: chunk['metadata']['source'])
+        collections = {shard_id: self._shard(shard_id) for shard_id in groups}
+        futures = [
+            self.executor.submit(self._add_chunks, collections[shard_id], shard_chunks)
+            for shard_id, shard_chunks in groups.items()
+        ]
+        for future in futures:
+            future.result()  # Propagate failures from worker threads
+        logger.info(f"Stored {len(chunks)} chunks across {len(groups)} shards")
+
+    def add_shard(self, shard_id: str, chunks: List[Dict]) -> None:
+        """Build one shard without touching the others.
+
+        Args:
+            shard_id: Shard to (re)build
+            chunks: Chunks belonging to the shard
+        """
+        misplaced = [c for c in chunks if self.shard_for_source(c['metadata']['source']) != shard_id]
+        if misplaced:
+            raise ValueError(f"{len(misplaced)} chunks do not belong to shard {shard_id}")
+        self.drop_shard(shard_id)
+        self._add_chunks(self._shard(shard_id), chunks)
+        self._sources_by_name = None
+
+    def drop_shard(self, shard_id: str) -> None:
+        """Delete a shard, e.g. the docs of a retired product.
+
+        Files of the shard are also removed from the manifest, so they are
+        re-indexed on the next sync if they still exist on disk.
+
+        Args:
+            shard_id: Shard to delete
+        """
+        if shard_id not in self.shards:
+            return
+        self.client.delete_collection(self.shards[shard_id].name)
+        del self.shards[shard_id]
+        self._sources_by_name = None
+        manifest = self.load_manifest()
+        if manifest.get('files'):
+            manifest['files'] = {
+                source: digest for source, digest in manifest['files'].items()
+                if self.shard_for_source(source) != shard_id
+            }
+            self.save_manifest(manifest)
+        logger.info(f"Dropped shard {shard_id}")
+
+    def save_manifest(self, manifest: Dict) -> None:
+        """Persist the manifest and forget the file name lookup built from the old one."""
+        super().save_manifest(manifest)
+        self._sources_by_name = None
+
+    def _sources_named(self, file_names) -> set:
+        """Return the indexed sources with the given file names, without re-reading the manifest."""
+        if self._sources_by_name is None:
+            lookup: Dict[str, List[str]] = {}
+            for source in self.load_manifest().get('files', {}):
+                lookup.setdefault(Path(source).name, []).append(source)
+            self._sources_by_name = lookup
+        return {source for name in file_names for source in self._sources_by_name.get(name, [])}
+
+    def _collections(self) -> List:
+        """Return every shard collection."""
+        return list(self.shards.values())
+
+    def list_shards(self) -> Dict[str, int]:
+        """Return the number of chunks stored per shard."""
+        return {shard_id: collection.count() for shard_id, collection in self.shards.items()}
+
+    def add_records(self, ids: List[str], embeddings, documents: List[str],
+                    metadatas: List[Dict]) -> None:
+        """Insert precomputed embeddings, routed to their shards.
+
+        Args:
+            ids: Chunk ids
+            embeddings: Array-like of shape (len(ids), dim)
+            documents: Chunk texts
+            metadatas: Chunk metadata
+        """
+        documents = storable_documents(self.chunk_storage, documents, metadatas)
+        groups = self._group_by_shard(range(len(ids)), lambda i: metadatas[i]['source'])
+        batch_size = self.client.get_max_batch_size()
+        for shard_id, indices in groups.items():
+            collection = self._shard(shard_id)
+            for i in range(0, len(indices), batch_size):
+                batch = indices[i:i + batch_size]
+                collection.upsert(
+                    ids=[ids[j] for j in batch],
+                    embeddings=[embeddings[j] for j in batch],
+                    documents=[documents[j] for j in batch],
+                    metadatas=[metadatas[j] for j in batch]
+                )
+
+    def export_records(self, page_size: int = 1000) -> Dict:
+        """Read every stored chunk with its embedding from all shards."""
+        records = {'ids': [], 'embeddings': [], 'documents': [], 'metadatas': []}
+        for collection in self.shards.values():
+            shard_records = self._export_collection(collection, page_size)
+            for key in records:
+                records[key].extend(shard_records[key])
+        return records
+
+    def delete_sources(self, sources: List[str]) -> None:
+        """Remove all chunks of the given source files from their shards."""
+        for shard_id, shard_sources in self._group_by_shard(sources, lambda s: s).items():
+            if shard_id in self.shards:
+                for source in shard_sources:
+                    self.shards[shard_id].delete(where={'source': source})
+
+    def query_by_embedding(self, query_embedding: List[float], n_results: int = 3,
+                           scope: Optional[Dict] = None,
+                           include_embeddings: bool = False) -> List[Dict]:
+        """Search the shards in parallel and merge the top results.
+
+        Args:
+            query_embedding: Query vector from encode_queries()
+            n_results: Number of results to return
+            scope: Optional filters, see VectorStore.query(). Only the shards
+                that can hold the scoped sources are searched.
+            include_embeddings: Add each result's stored vector as `embedding`
+
+        Returns:
+            List of dictionaries containing matched documents and metadata
+        """
+        return self._scatter_gather(self._shards_in_scope(scope), query_embedding, n_results,
+                                    where=self.build_where(scope),
+                                    include_embeddings=include_embeddings)
+
+    def query_batch_by_embedding(self, query_embeddings: List[List[float]], n_results: int = 3,
+                                 scope: Optional[Dict] = None,
+                                 include_embeddings: bool = False) -> List[List[Dict]]:
+        """Search many queries on all shards in parallel and merge per query.
+
+        Args:
+            query_embeddings: Query vectors from encode_queries()
+            n_results: Number of results per query
+            scope: Optional filters applied to every query
+            include_embeddings: Add each result's stored vector as `embedding`
+
+        Returns:
+            One result list per query, in input order
+        """
+        where = self.build_where(scope)
+        futures = [
+            self.executor.submit(self._query_collection_batch, collection, query_embeddings,
+                                 min(n_results, collection.count()), where, include_embeddings)
+            for collection in self._shards_in_scope(scope) if collection.count() > 0
+        ]
+        merged = [[] for _ in query_embeddings]
+        for future in futures:
+            for i, shard_results in enumerate(future.result()):
+                merged[i].extend(shard_results)
+        return [sorted(results, key=lambda r: r['distance'])[:n_results] for results in merged]
+
+    def _shards_in_scope(self, scope: Optional[Dict]) -> List:
+        """Select the shard collections that may contain scoped chunks.
+
+        Args:
+            scope: Scope filters with optional `source` and `file_name` lists
+
+        Returns:
+            Collections to search
+        """
+        if not scope or not (scope.get('source') or scope.get('file_name')):
+            return list(self.shards.values())
+        sources = set(scope.get('source') or [])
+        if scope.get('file_name'):
+            sources |= self._sources_named(scope['file_name'])
+        shard_ids = {self.shard_for_source(source) for source in sources}
+        return [self.shards[shard_id] for shard_id in shard_ids if shard_id in self.shards]
+
+    def _scatter_gather(self, collections: List, query_embedding: List[float],
+                        n_results: int, where: Optional[Dict] = None,
+                        include_embeddings: bool = False) -> List[Dict]:
+        """Query collections on the worker pool and keep the overall top-k.
+
+        Args:
+            collections: Shard collections to search
+            query_embedding: Encoded query
+            n_results: Number of results to return
+            where: Optional Chroma metadata filter applied in every shard
+            include_embeddings: Add each result's stored vector as `embedding`
+
+        Returns:
+            Merged results ordered by distance
+        """
+        futures = [
+            self.executor.submit(self._query_collection, collection, query_embedding,
+                                 min(n_results, collection.count()), where, include_embeddings)
+            for collection in collections if collection.count() > 0
+        ]
+        results = [result for future in futures for result in future.result()]
+        return sorted(results, key=lambda r: r['distance'])[:n_results]
+
+    def _cleanup(self):
+        """Clean up resources including the worker pool."""
+        if hasattr(self, 'executor'):
+            self.executor.shutdown(wait=False)
+        super()._cleanup()
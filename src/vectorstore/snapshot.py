@@ -0,0 +1,167 @@
+"""Module for exporting and importing portable vector index snapshots.
+
+Snapshot layout (all integers little-endian)::
+
+    magic       8 bytes   b"GGPTSNAP"
+    version     uint32
+    header_len  uint64
+    header      JSON (fingerprint, manifest, counts and section offsets)
+    padding     up to a 64-byte boundary
+    vectors     count x dim float32, memory-mappable
+    records     zlib-compressed JSON with ids, chunk texts and metadata
+"""
+import argparse
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from typing import Dict
+
+import numpy as np
+
+from src.vectorstore.embeddings import check_fingerprint
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GGPTSNAP"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sIQ")
+ALIGNMENT = 64
+
+
+def export_snapshot(vectorstore, path: str) -> Dict:
+    """Write the complete index of a vector store to a snapshot file.
+
+    Args:
+        vectorstore: VectorStore to export
+        path: Destination file path
+
+    Returns:
+        Header of the written snapshot
+    """
+    start = time.perf_counter()
+    records = vectorstore.export_records()
+    vectors = np.asarray(records['embeddings'], dtype='<f4')
+    count = len(records['ids'])
+    dim = vectors.shape[1] if count else vectorstore.fingerprint['embedding_dim']
+    payload = zlib.compress(json.dumps({
+        'ids': records['ids'],
+        'documents': records['documents'],
+        'metadatas': records['metadatas']
+    }).encode('utf-8'))
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created_at': time.time(),
+        'fingerprint': vectorstore.fingerprint,
+        'manifest': vectorstore.load_manifest(),
+        'count': count,
+        'dim': dim,
+        'dtype': 'float32',
+        'vectors_offset': 0,
+        'records_offset': 0,
+        'records_length': len(payload)
+    }
+    # Offsets depend on the header length, so settle them in two passes
+    for _ in range(2):
+        header_bytes = json.dumps(header).encode('utf-8')
+        vectors_offset = _align(PREAMBLE.size + len(header_bytes))
+        header['vectors_offset'] = vectors_offset
+        header['records_offset'] = vectors_offset + vectors.nbytes
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (header['vectors_offset'] - f.tell()))
+        f.write(vectors.tobytes())
+        f.write(payload)
+    os.replace(tmp_path, path)  # Never leave a half-written snapshot behind
+
+    logger.info(f"Exported {count} vectors to {path} in {time.perf_counter() - start:.2f}s")
+    return header
+
+
+def read_snapshot(path: str) -> Dict:
+    """Open a snapshot with its vectors memory-mapped.
+
+    Args:
+        path: Snapshot file path
+
+    Returns:
+        Dictionary with the header, a read-only memmap of the vectors and the
+        decoded records
+
+    Raises:
+        ValueError: If the file is not a snapshot or has an unsupported version
+    """
+    with open(path, 'rb') as f:
+        magic, version, header_len = PREAMBLE.unpack(f.read(PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a greggpt index snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} (expected {FORMAT_VERSION})")
+        header = json.loads(f.read(header_len))
+        f.seek(header['records_offset'])
+        records = json.loads(zlib.decompress(f.read(header['records_length'])))
+
+    vectors = np.memmap(path, dtype='<f4', mode='r', offset=header['vectors_offset'],
+                        shape=(header['count'], header['dim'])) if header['count'] else \
+        np.empty((0, header['dim']), dtype='<f4')
+    return {'header': header, 'vectors': vectors, 'records': records}
+
+
+def import_snapshot(vectorstore, path: str) -> Dict:
+    """Load a snapshot into an empty vector store without re-embedding.
+
+    Args:
+        vectorstore: VectorStore to fill
+        path: Snapshot file path
+
+    Returns:
+        Manifest of the imported index, used to re-index changed files
+
+    Raises:
+        EmbeddingModelMismatchError: If the snapshot used another embedding model
+    """
+    start = time.perf_counter()
+    snapshot = read_snapshot(path)
+    header = snapshot['header']
+    check_fingerprint(header['fingerprint'], vectorstore.fingerprint)
+
+    records = snapshot['records']
+    vectorstore.add_records(
+        records['ids'], snapshot['vectors'], records['documents'], records['metadatas']
+    )
+    vectorstore.save_manifest(header['manifest'])
+    logger.info(f"Imported {header['count']} vectors from {path} in {time.perf_counter() - start:.2f}s")
+    return header['manifest']
+
+
+def _align(offset: int) -> int:
+    """Round offset up to the next ALIGNMENT boundary."""
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+if __name__ == "__main__":
+    import yaml
+    from src.vectorstore.vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="Export or import a vector index snapshot")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="Snapshot file")
+    parser.add_argument("--config", default="config.yaml")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.config) as f:
+        config = yaml.safe_load(f)
+    store = VectorStore(config['vectorstore_path'], config=config)
+    if args.action == "export":
+        export_snapshot(store, args.path)
+    else:
+        import_snapshot(store, args.path)
@@ -1,15 +1,32 @@
 """Module for handling document embeddings and vector storage."""
+import hashlib
+import json
 import logging
+import os
 import time
 from functools import wraps
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional
 from tqdm import tqdm
 import chromadb
 from chromadb.config import Settings
+from src.document_loader import tag_key
+from src.vectorstore import service_client
+from src.vectorstore.chunk_text import STORAGE_MODES, ChunkTextResolver, storable_documents
+from src.vectorstore.generations import collection_name, load_active_index, manifest_path
+from src.vectorstore.embeddings import (
+    DEFAULT_EMBEDDING_MODEL,
+    check_fingerprint,
+    embedding_fingerprint,
+    load_embedding_model
+)
+from src.vectorstore.hnsw_tuning import load_hnsw_settings
 
 logger = logging.getLogger(__name__)
 
+def chunk_id(metadata: Dict) -> str:
+    """Return the id a chunk is stored under, derived from its metadata."""
+    return f"{metadata['source']}-{metadata['chunk_start']}"
+
 def timeout(seconds=30):
     def decorator(func):
         @wraps(func)
@@ -26,33 +43,122 @@ def timeout(seconds=30):
 class VectorStore:
     """Handles document embeddings and vector storage."""
     
-    def __init__(self, persist_dir: str = "vectorstore", initial_docs: List[Dict] = None):
+    def __init__(self, persist_dir: str = "vectorstore", initial_docs: List[Dict] = None,
+                 config: Optional[Dict] = None, generation: Optional[str] = None):
         """Initialize vector store with persistent storage.
         
         Args:
             persist_dir: Directory to store vector data
             initial_docs: Optional documents to process on startup
+            config: Application config; its `embedding` section selects the model
+            generation: Index generation to open (defaults to the active one,
+                see src/vectorstore/generations.py)
         """
         self.persist_dir = persist_dir
+        self.generation = generation or load_active_index(persist_dir).get('generation')
+        self.embedding_config = (config or {}).get('embedding', {})
+        self.service_config = (config or {}).get('embedding_service', {})
+        self.hnsw_settings = load_hnsw_settings(persist_dir)
+        storage = (config or {}).get('chunk_storage', {})
+        self.chunk_storage = storage.get('mode', 'text')
+        if self.chunk_storage not in STORAGE_MODES:
+            raise ValueError(f"Unsupported chunk storage mode: {self.chunk_storage}")
+        self.text_resolver = ChunkTextResolver(max_open_files=storage.get('max_open_files', 64))
         self._initialize_models()
         if initial_docs and not self._has_documents():
             self.store_documents(initial_docs)
 
     def _has_documents(self) -> bool:
         """Check if collection contains any documents."""
-        return len(self.collection.get()['ids']) > 0
+        return self.collection.count() > 0
         
     def _initialize_models(self):
         """Initialize models with proper cleanup handling."""
         try:
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+            if not (self.service_config.get('enabled', False) and self._connect_service()):
+                self.embedding_model = load_embedding_model(self.embedding_config)
+                self.fingerprint = embedding_fingerprint(self.embedding_config, self.embedding_model)
+                self.client = chromadb.PersistentClient(path=self.persist_dir)
             logger.info(f"Using device: {self.embedding_model.device}")
-            self.client = chromadb.PersistentClient(path=self.persist_dir)
-            self.collection = self.client.get_or_create_collection("documents")
+            self._open_collections()
         except Exception as e:
             logger.error(f"Initialization failed: {e}")
             self._cleanup()
             raise
+
+    def _connect_service(self) -> bool:
+        """Use the shared embedding service instead of loading a local model.
+
+        Returns:
+            True if connected; False if the service is unreachable and
+            `fallback_local` allows loading the model in this process
+
+        Raises:
+            OSError: If the service is unreachable and fallback is disabled
+        """
+        try:
+            service = service_client.connect(self.service_config)
+        except OSError as e:
+            if not self.service_config.get('fallback_local', True):
+                raise
+            logger.warning(f"Embedding service unavailable ({e}), loading the model in this process")
+            return False
+        self.embedding_model = service['embedding_model']
+        self.client = service['client']
+        # Reason: vectors come from the service's model, so its fingerprint
+        # is the one the index must match
+        self.fingerprint = service['fingerprint']
+        configured = self.embedding_config.get('model', DEFAULT_EMBEDDING_MODEL)
+        if configured != self.fingerprint['embedding_model']:
+            logger.warning(f"Embedding service runs {self.fingerprint['embedding_model']}, "
+                           f"not the configured {configured}")
+        if service['persist_dir'] != os.path.abspath(self.persist_dir):
+            logger.warning(f"Embedding service index is at {service['persist_dir']}, "
+                           f"manifest is read from {self.persist_dir}")
+        return True
+
+    def _open_collections(self):
+        """Open the collection(s) holding the index."""
+        self.collection = self._get_or_create_collection(collection_name("documents", self.generation))
+
+    def _get_or_create_collection(self, name: str):
+        """Open or create a collection tagged with the embedding fingerprint.
+
+        New collections use the HNSW parameters saved by the tuning tool
+        (see src/vectorstore/hnsw_tuning.py); existing ones keep theirs.
+
+        Args:
+            name: Collection name
+
+        Returns:
+            Chroma collection verified against the configured embedding model
+        """
+        collection = self.client.get_or_create_collection(
+            name, metadata={**self.hnsw_settings, **self.fingerprint}
+        )
+        self._verify_fingerprint(collection)
+        return collection
+
+    def _verify_fingerprint(self, collection):
+        """Ensure a collection was built with the configured embedding model.
+
+        Args:
+            collection: Chroma collection to check
+
+        Raises:
+            EmbeddingModelMismatchError: If the collection uses another model
+        """
+        stored = collection.metadata or {}
+        if 'embedding_model' not in stored and collection.count():
+            # Reason: indexes created before the model was configurable were
+            # always built with the default MiniLM model.
+            check_fingerprint({'embedding_model': DEFAULT_EMBEDDING_MODEL, 'embedding_dim': 384}, self.fingerprint)
+            return
+        if 'embedding_model' in stored:
+            check_fingerprint(stored, self.fingerprint)
+        # Reason: tag empty collections, and record the runtime of those tagged before it was fingerprinted
+        if any(stored.get(key) != value for key, value in self.fingerprint.items()):
+            collection.modify(metadata={**stored, **self.fingerprint})
             
     def _cleanup(self):
         """Clean up resources."""
@@ -62,6 +168,8 @@ class VectorStore:
             del self.client
         if hasattr(self, 'collection'):
             del self.collection
+        if hasattr(self, 'text_resolver'):
+            self.text_resolver.close()
             
     def __del__(self):
         """Destructor for cleanup."""
@@ -71,20 +179,24 @@ class VectorStore:
     def generate_embeddings(self, chunks: List[Dict]) -> List[List[float]]:
         """Generate embeddings with tqdm progress bar and timeout."""
         logger.info(f"Starting embedding generation for {len(chunks)} chunks")
+        batch_size = self.embedding_config.get('batch_size', 32)
         
         try:
-            # Process chunks with tqdm progress bar
+            # Encode in batches so the runtime can vectorize across chunks
             embeddings = []
-            for chunk in tqdm(chunks, desc="Generating embeddings", unit="chunk"):
-                try:
-                    embedding = self.embedding_model.encode(
-                        chunk['content'],
-                        show_progress_bar=False
-                    ).tolist()
-                    embeddings.append(embedding)
-                except Exception as e:
-                    logger.error(f"Failed to process chunk: {e}")
-                    raise
+            with tqdm(total=len(chunks), desc="Generating embeddings", unit="chunk") as progress:
+                for i in range(0, len(chunks), batch_size):
+                    batch = [chunk['content'] for chunk in chunks[i:i + batch_size]]
+                    try:
+                        embeddings.extend(self.embedding_model.encode(
+                            batch,
+                            batch_size=batch_size,
+                            show_progress_bar=False
+                        ).tolist())
+                    except Exception as e:
+                        logger.error(f"Failed to process chunk batch: {e}")
+                        raise
+                    progress.update(len(batch))
                     
             logger.info("Successfully generated all embeddings")
             return embeddings
@@ -98,45 +210,291 @@ class VectorStore:
         
     def store_documents(self, chunks: List[Dict]) -> None:
         """Store document chunks with embeddings in vector database."""
+        self._add_chunks(self.collection, chunks)
+
+    def _add_chunks(self, collection, chunks: List[Dict]) -> None:
+        """Embed chunks and add them to a collection.
+
+        Args:
+            collection: Target Chroma collection
+            chunks: Document chunks with content and metadata
+        """
         embeddings = self.generate_embeddings(chunks)
-        ids = [f"{chunk['metadata']['source']}-{chunk['metadata']['chunk_start']}" 
-               for chunk in chunks]
-        metadatas = [chunk['metadata'] for chunk in chunks]
-        contents = [chunk['content'] for chunk in chunks]
+        ids = [chunk_id(chunk['metadata']) for chunk in chunks]
+        metadatas = [dict(chunk['metadata']) for chunk in chunks]
+        contents = storable_documents(self.chunk_storage, [chunk['content'] for chunk in chunks], metadatas)
         
-        self.collection.add(
+        collection.add(
             embeddings=embeddings,
             documents=contents,
             metadatas=metadatas,
             ids=ids
         )
         
-    def query(self, query_text: str, n_results: int = 3) -> List[Dict]:
+    def add_records(self, ids: List[str], embeddings, documents: List[str],
+                    metadatas: List[Dict]) -> None:
+        """Insert precomputed embeddings without re-encoding the chunks.
+
+        Args:
+            ids: Chunk ids
+            embeddings: Array-like of shape (len(ids), dim)
+            documents: Chunk texts
+            metadatas: Chunk metadata
+        """
+        documents = storable_documents(self.chunk_storage, documents, metadatas)
+        batch_size = self.client.get_max_batch_size()
+        for i in range(0, len(ids), batch_size):
+            self.collection.upsert(
+                ids=ids[i:i + batch_size],
+                embeddings=embeddings[i:i + batch_size],
+                documents=documents[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size]
+            )
+
+    def rebuild_index(self) -> int:
+        """Recreate all collections from their stored vectors.
+
+        Applies changed HNSW settings to an existing index without
+        re-embedding. If interrupted, delete the manifest and re-index.
+
+        Returns:
+            Number of chunks re-inserted
+        """
+        records = self.export_records()
+        for collection in self._collections():
+            self.client.delete_collection(collection.name)
+        self._open_collections()
+        self.add_records(records['ids'], records['embeddings'], records['documents'], records['metadatas'])
+        logger.info(f"Rebuilt index with {len(records['ids'])} chunks, HNSW settings {self.hnsw_settings}")
+        return len(records['ids'])
+
+    def export_records(self, page_size: int = 1000) -> Dict:
+        """Read every stored chunk with its embedding.
+
+        Args:
+            page_size: Number of records fetched per request
+
+        Returns:
+            Dictionary with lists `ids`, `embeddings`, `documents`, `metadatas`
+        """
+        return self._export_collection(self.collection, page_size)
+
+    def _export_collection(self, collection, page_size: int) -> Dict:
+        """Page through one collection and return all of its records."""
+        records = {'ids': [], 'embeddings': [], 'documents': [], 'metadatas': []}
+        offset = 0
+        while True:
+            page = collection.get(
+                include=['embeddings', 'documents', 'metadatas'],
+                limit=page_size,
+                offset=offset
+            )
+            if not page['ids']:
+                break
+            records['ids'].extend(page['ids'])
+            records['embeddings'].extend(page['embeddings'])
+            # Reason: records carry text in every storage mode, e.g. for snapshots
+            records['documents'].extend(self.text_resolver.fill(page['documents'], page['metadatas'], missing=''))
+            records['metadatas'].extend(page['metadatas'])
+            offset += len(page['ids'])
+        return records
+
+    def delete_sources(self, sources: List[str]) -> None:
+        """Remove all chunks of the given source files.
+
+        Args:
+            sources: Source paths as stored in chunk metadata
+        """
+        for source in sources:
+            self.collection.delete(where={'source': source})
+
+    def load_manifest(self) -> Dict:
+        """Return the manifest of indexed files, or an empty dict if none."""
+        path = manifest_path(self.persist_dir, self.generation)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest: Dict) -> None:
+        """Persist the manifest of indexed files next to the index."""
+        os.makedirs(self.persist_dir, exist_ok=True)
+        path = manifest_path(self.persist_dir, self.generation)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def index_version(self) -> str:
+        """Return an identifier that changes whenever indexed content changes."""
+        state = json.dumps({'manifest': self.load_manifest(), 'fingerprint': self.fingerprint}, sort_keys=True)
+        return hashlib.sha256(state.encode('utf-8')).hexdigest()[:16]
+
+    def query(self, query_text: str, n_results: int = 3, scope: Optional[Dict] = None) -> List[Dict]:
         """
         Query the vector store for similar documents.
         
         Args:
             query_text: The query text to search for
             n_results: Number of results to return
+            scope: Optional filters with keys `source`, `file_name` (lists),
+                `section` (string) and `tags` (list, all must match)
             
         Returns:
             List of dictionaries containing matched documents and metadata
         """
-        query_embedding = self.embedding_model.encode(query_text).tolist()
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
+        return self.query_by_embedding(self.encode_queries([query_text])[0], n_results, scope)
+
+    def query_batch(self, query_texts: List[str], n_results: int = 3,
+                    scope: Optional[Dict] = None) -> List[List[Dict]]:
+        """
+        Query the vector store for many queries at once.
+
+        All queries are encoded in one batch and searched in one request.
+
+        Args:
+            query_texts: The query texts to search for
+            n_results: Number of results per query
+            scope: Optional filters applied to every query, see query()
+
+        Returns:
+            One result list per query, in input order
+        """
+        if not query_texts:
+            return []
+        return self.query_batch_by_embedding(self.encode_queries(query_texts), n_results, scope)
+
+    def encode_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """Encode query texts with the index's embedding model."""
+        return self.embedding_model.encode(
+            query_texts,
+            batch_size=self.embedding_config.get('batch_size', 32),
+            show_progress_bar=False
+        ).tolist()
+
+    def query_by_embedding(self, query_embedding: List[float], n_results: int = 3,
+                           scope: Optional[Dict] = None,
+                           include_embeddings: bool = False) -> List[Dict]:
+        """
+        Search with an already encoded query.
+
+        Args:
+            query_embedding: Query vector from encode_queries()
+            n_results: Number of results to return
+            scope: Optional filters, see query()
+            include_embeddings: Add each result's stored vector as `embedding`
+
+        Returns:
+            List of dictionaries containing matched documents and metadata
+        """
+        return self._query_collection(self.collection, query_embedding, n_results,
+                                      where=self.build_where(scope),
+                                      include_embeddings=include_embeddings)
+
+    def query_batch_by_embedding(self, query_embeddings: List[List[float]], n_results: int = 3,
+                                 scope: Optional[Dict] = None,
+                                 include_embeddings: bool = False) -> List[List[Dict]]:
+        """
+        Search with several already encoded queries in one request.
+
+        Args:
+            query_embeddings: Query vectors from encode_queries()
+            n_results: Number of results per query
+            scope: Optional filters applied to every query, see query()
+            include_embeddings: Add each result's stored vector as `embedding`
+
+        Returns:
+            One result list per query, in input order
+        """
+        return self._query_collection_batch(self.collection, query_embeddings, n_results,
+                                            where=self.build_where(scope),
+                                            include_embeddings=include_embeddings)
+
+    def _query_collection_batch(self, collection, query_embeddings: List[List[float]],
+                                n_results: int, where: Optional[Dict] = None,
+                                include_embeddings: bool = False) -> List[List[Dict]]:
+        """Run similarity searches for several encoded queries on one collection."""
+        include = ['documents', 'metadatas', 'distances']
+        if include_embeddings:
+            include.append('embeddings')
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            include=include
         )
-        
-        return [
-            {
-                'content': doc,
-                'metadata': meta,
-                'distance': dist
-            }
-            for doc, meta, dist in zip(
-                results['documents'][0],
-                results['metadatas'][0],
-                results['distances'][0]
-            )
-        ]
+        batch = []
+        for i, (docs, metas, dists) in enumerate(zip(
+            results['documents'], results['metadatas'], results['distances']
+        )):
+            matches = [
+                {'content': doc, 'metadata': meta, 'distance': dist}
+                for doc, meta, dist in zip(docs, metas, dists)
+            ]
+            if include_embeddings:
+                for match, embedding in zip(matches, results['embeddings'][i]):
+                    match['embedding'] = list(embedding)
+            for match, text in zip(matches, self.text_resolver.fill(docs, metas)):
+                match['content'] = text
+            batch.append([match for match in matches if match['content'] is not None])
+        return batch
+
+    @staticmethod
+    def build_where(scope: Optional[Dict]) -> Optional[Dict]:
+        """Translate a retrieval scope into a Chroma metadata filter.
+
+        Args:
+            scope: Scope filters, see query()
+
+        Returns:
+            Chroma `where` clause, or None if the scope is empty
+        """
+        if not scope:
+            return None
+        conditions = []
+        for key in ('source', 'file_name'):
+            if scope.get(key):
+                conditions.append({key: {'$in': list(scope[key])}})
+        if scope.get('section'):
+            conditions.append({'section': scope['section']})
+        for tag in scope.get('tags') or []:
+            conditions.append({tag_key(tag): True})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+    def _collections(self) -> List:
+        """Return every collection holding part of the index."""
+        return [self.collection]
+
+    def list_scope_options(self) -> Dict[str, List[str]]:
+        """Collect the values users can scope retrieval to.
+
+        Returns:
+            Dictionary with sorted `source`, `file_name`, `section` and `tags` values
+        """
+        options = {'source': set(), 'file_name': set(), 'section': set(), 'tags': set()}
+        for collection in self._collections():
+            for metadata in collection.get(include=['metadatas'])['metadatas']:
+                for key in ('source', 'file_name', 'section'):
+                    if metadata.get(key):
+                        options[key].add(metadata[key])
+                if metadata.get('tags'):
+                    options['tags'].update(metadata['tags'].split(','))
+        return {key: sorted(values) for key, values in options.items()}
+
+    def _query_collection(self, collection, query_embedding: List[float], n_results: int,
+                          where: Optional[Dict] = None, include_embeddings: bool = False) -> List[Dict]:
+        """Run a similarity search on one collection.
+
+        Args:
+            collection: Chroma collection to search
+            query_embedding: Encoded query
+            n_results: Number of results to return
+            where: Optional Chroma metadata filter
+            include_embeddings: Add each result's stored vector as `embedding`
+
+        Returns:
+            List of dictionaries containing matched documents and metadata
+        """
+        return self._query_collection_batch(collection, [query_embedding], n_results,
+                                            where=where, include_embeddings=include_embeddings)[0]
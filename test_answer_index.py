@@ -0,0 +1,135 @@
+"""Unit tests for the precomputed answer index."""
+import hashlib
+import re
+from unittest.mock import MagicMock, patch
+
+import chromadb
+import numpy as np
+import pytest
+
+from src.answer_index import AnswerIndex, build_answer_index, content_hash, parse_questions
+from src.chat_handler import ChatHandler
+
+
+def encode(texts):
+    """Bag-of-words embedding, so questions sharing words are close."""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in re.findall(r'\w+', text.lower()):
+            vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+    return vectors.tolist()
+
+
+@pytest.fixture
+def vectorstore():
+    """Fake vector store backed by an in-memory Chroma client."""
+    store = MagicMock()
+    store.client = chromadb.EphemeralClient()
+    store.fingerprint = {'embedding_model': 'bag-of-words', 'embedding_dim': 64}
+    store.encode_queries.side_effect = encode
+    AnswerIndex(store).clear()  # Reason: in-memory clients share state within a process
+    return store
+
+
+def entry(question, response, origin='install.md-0', sources=('install.md',), hashes=None):
+    """Create an answer index entry."""
+    return {
+        'question': question,
+        'response': response,
+        'sources': [{'source': source, 'chunk_start': 0} for source in sources],
+        'chunk_hashes': hashes or {f"{source}-0": content_hash(source) for source in sources},
+        'origin_chunk': origin,
+        'origin_hash': content_hash(origin.split('-')[0]),
+        'origin_source': origin.split('-')[0]
+    }
+
+
+def test_parse_questions_strips_numbering_and_duplicates():
+    """Test that only distinct questions are kept."""
+    output = "1. How do I install the app?\n- How do I install the app?\nSure, here you go\n2) What is the default port?"
+    assert parse_questions(output, 5) == ["How do I install the app?", "What is the default port?"]
+    assert parse_questions(output, 1) == ["How do I install the app?"]
+
+
+def test_lookup_serves_close_questions_only(vectorstore):
+    """Test that a near-identical question hits and an unrelated one misses."""
+    index = AnswerIndex(vectorstore, max_distance=0.1)
+    assert index.lookup("How do I install the app?") is None
+    index.add([entry("How do I install the app?", "Run the installer.")])
+
+    hit = index.lookup("how do I install the app")
+    assert hit['response'] == "Run the installer."
+    assert hit['sources'] == [{'source': 'install.md', 'chunk_start': 0}]
+    assert index.lookup("Which port does the server listen on?") is None
+    assert index.get_stats()['hits'] == 1 and index.get_stats()['misses'] == 1
+
+
+def test_invalidate_sources_drops_dependent_entries(vectorstore):
+    """Test that changing a file drops answers built from it."""
+    index = AnswerIndex(vectorstore)
+    index.add([
+        entry("How do I install the app?", "Run the installer."),
+        entry("Which port does the server use?", "Port 8501.", origin='server.md-0',
+              sources=('server.md', 'install.md'))
+    ])
+    index.invalidate_sources(['server.md'])
+    assert index.get_stats()['entries'] == 1
+    index.invalidate_sources(['install.md'])
+    assert index.get_stats()['entries'] == 0
+
+
+def test_prune_drops_entries_with_changed_chunks(vectorstore):
+    """Test chunk-level invalidation by content hash."""
+    index = AnswerIndex(vectorstore)
+    index.add([
+        entry("How do I install the app?", "Run the installer."),
+        entry("Which port does the server use?", "Port 8501.", origin='server.md-0', sources=('server.md',))
+    ])
+    current = {'install.md-0': content_hash('install.md'), 'server.md-0': 'changed'}
+
+    assert index.prune(current) == 1
+    assert index.covered_chunks() == {'install.md-0': content_hash('install.md')}
+
+
+def test_build_answer_index_skips_covered_chunks(vectorstore):
+    """Test that the offline pass only generates questions for new chunks."""
+    vectorstore.export_records.return_value = {
+        'ids': ['install.md-0'], 'documents': ['Run the installer.'], 'metadatas': [{'source': 'install.md'}]
+    }
+    handler = MagicMock()
+    handler.retriever.vectorstore = vectorstore
+    handler.model.supports_batching.return_value = False
+    handler.model.generate_response.side_effect = ["1. How do I install the app?", "Run the installer."]
+    handler.retriever.retrieve_batch.return_value = [[{'content': 'Run the installer.',
+                                                       'metadata': {'source': 'install.md', 'chunk_start': 0}}]]
+    handler.prepare_prompt.side_effect = lambda q, chunks: (f"prompt {q}", chunks, None)
+    handler.format_response.side_effect = lambda response, chunks: response
+    index = AnswerIndex(vectorstore)
+
+    assert build_answer_index(handler, index) == {'pruned': 0, 'chunks': 1, 'answers': 1}
+    assert index.lookup("How do I install the app?")['response'] == "Run the installer."
+    assert build_answer_index(handler, index) == {'pruned': 0, 'chunks': 0, 'answers': 0}
+
+
+def test_process_query_serves_precomputed_answer():
+    """Test that a stored answer skips retrieval and generation."""
+    config = {'docs_dir': 'docs', 'vectorstore_path': 'vs', 'chunk_size': 1000,
+              'chunk_overlap': 200, 'answer_index': {'enabled': True}}
+    with patch('src.chat_handler.ModelManager') as model, \
+         patch('src.chat_handler.Retriever') as retriever, \
+         patch('src.chat_handler.DocumentLoader'), \
+         patch('src.chat_handler.AnswerIndex') as answer_index:
+        answer_index.return_value.lookup.return_value = {
+            'question': "How do I install the app?", 'response': "Run the installer.",
+            'sources': [{'source': 'install.md'}], 'distance': 0.02
+        }
+        handler = ChatHandler(config)
+        result = handler.process_query("how do I install the app")
+        assert result['response'] == "Run the installer."
+        assert result['precomputed']['question'] == "How do I install the app?"
+        retriever.return_value.retrieve_relevant_chunks.assert_not_called()
+        model.return_value.generate_response.assert_not_called()
+
+        # Scoped queries go through retrieval since answers were built unscoped
+        handler.process_query("how do I install the app", scope={'source': ['install.md']})
+        retriever.return_value.retrieve_relevant_chunks.assert_called_once()
@@ -0,0 +1,48 @@
+"""Unit tests for batch question answering."""
+import json
+from unittest.mock import MagicMock
+
+from src.batch_qa import BatchAnswerer, load_completed_ids, read_questions
+
+
+def make_handler(batching):
+    """Create a fake chat handler whose model batches prompts if `batching` is set."""
+    handler = MagicMock()
+    handler.model.llm = object()
+    handler.model.supports_batching.return_value = batching
+    handler.model.generate_batch.side_effect = lambda prompts: [f"answer {p}" for p in prompts]
+    handler.model.generate_response.side_effect = lambda prompt: f"answer {prompt}"
+    handler.retriever.retrieve_batch.side_effect = lambda queries, k: [
+        [{'content': 'ctx', 'metadata': {'source': f"{q}.md"}}] for q in queries
+    ]
+    handler.prepare_prompt.side_effect = lambda query, chunks: (query, chunks, None)
+    return handler
+
+
+def test_batch_answers_in_input_order(tmp_path):
+    """Test that batched and sequential generation both write every answer in order"""
+    for batching in (True, False):
+        output = tmp_path / f"out_{batching}.jsonl"
+        questions = [{'id': str(i), 'question': f"q{i}"} for i in range(5)]
+        summary = BatchAnswerer(make_handler(batching), batch_size=2).run(iter(questions), str(output))
+
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        assert summary['answered'] == 5
+        assert [r['id'] for r in records] == ['0', '1', '2', '3', '4']
+        assert records[3]['answer'] == "answer q3"
+        assert records[3]['sources'] == [{'source': 'q3.md'}]
+
+
+def test_resume_skips_completed_and_drops_torn_line(tmp_path):
+    """Test that a partially written output is repaired and its ids skipped"""
+    questions = tmp_path / "questions.jsonl"
+    questions.write_text('{"id": "a", "question": "first"}\n\n{"question": "second"}\n')
+    output = tmp_path / "answers.jsonl"
+    output.write_text('{"id": "a", "answer": "done"}\n{"id": "3", "ans')
+
+    completed = load_completed_ids(str(output))
+
+    assert completed == {'a'}
+    assert output.read_text() == '{"id": "a", "answer": "done"}\n'
+    pending = [q for q in read_questions(str(questions)) if q['id'] not in completed]
+    assert pending == [{'id': '3', 'question': 'second'}]
@@ -143,3 +143,55 @@ def test_empty_query(mock_config, mock_components):
         assert 'response' in result
         retriever.retrieve_relevant_chunks.assert_not_called()
         model.generate_response.assert_not_called()
+
+def test_background_warmup(mock_config, mock_components):
+    """Test that warm-up runs in the background and reports readiness."""
+    model, retriever = mock_components
+    with patch('src.chat_handler.ModelManager', return_value=model), \
+         patch('src.chat_handler.Retriever', return_value=retriever), \
+         patch('src.chat_handler.DocumentLoader'):
+        handler = ChatHandler(mock_config)
+        assert handler.readiness() == {'model': False, 'documents': False, 'error': None}
+
+        handler.start_warmup()
+        handler._warmup_thread.join(timeout=5)
+        model.warm_up.assert_called_once()
+        assert handler.readiness()['model'] is True
+        assert handler.wait_until_ready(timeout=0.01) is False
+
+        handler._documents_ready.set()
+        assert handler.wait_until_ready(timeout=0.01) is True
+
+def test_warmup_failure_releases_gate(mock_config, mock_components):
+    """Test that a failed warm-up does not block queries forever."""
+    model, retriever = mock_components
+    model.warm_up.side_effect = RuntimeError("model file missing")
+    with patch('src.chat_handler.ModelManager', return_value=model), \
+         patch('src.chat_handler.Retriever', return_value=retriever), \
+         patch('src.chat_handler.DocumentLoader'):
+        handler = ChatHandler(mock_config)
+        handler.start_warmup()
+        handler._warmup_thread.join(timeout=5)
+        readiness = handler.readiness()
+        assert readiness['model'] is True
+        assert readiness['error'] == "model file missing"
+
+def test_apply_config_touches_only_changed_components(mock_config, mock_components):
+    """Test that config reload re-indexes only when chunking changes"""
+    model, retriever = mock_components
+    model.active_model = 'small'
+    config = {**mock_config, 'models': {'small': {'path': 'small.gguf'}}, 'active_model': 'small'}
+    with patch('src.chat_handler.ModelManager', return_value=model), \
+         patch('src.chat_handler.Retriever', return_value=retriever), \
+         patch('src.chat_handler.DocumentLoader'):
+        handler = ChatHandler(config)
+        handler.process_documents = MagicMock()
+
+        changes = handler.apply_config({**config, 'models': {'small': {'path': 'small-q8.gguf'}}})
+        assert changes['models'] == ['small']
+        model.apply_model_config.assert_called_once_with({'small': {'path': 'small-q8.gguf'}}, 'small')
+        handler.process_documents.assert_not_called()
+
+        handler.apply_config({**handler.config, 'chunk_size': 500})
+        handler.process_documents.assert_called_once()
+        assert handler.loader.chunk_size == 500
@@ -0,0 +1,95 @@
+"""Unit tests for the compact chat history."""
+from src.utils.chat_history import ChatHistory
+
+
+def sources(*starts):
+    """Create source metadata for chunks of one file."""
+    return [{'source': 'docs/guide.md', 'chunk_start': start, 'section': 'Setup'} for start in starts]
+
+
+def test_window_renders_recent_page_and_loads_earlier():
+    """Test that only the latest page is rendered until more is requested."""
+    history = ChatHistory(page_size=3)
+    for i in range(7):
+        history.add("user", f"message {i}")
+
+    assert [m['content'] for m in history.window()] == ["message 4", "message 5", "message 6"]
+    assert history.hidden_count == 4
+    history.load_earlier()
+    assert [m['content'] for m in history.window()][0] == "message 1"
+    history.load_earlier()
+    assert history.hidden_count == 0 and len(list(history.window())) == 7
+
+    # A new message collapses the window back to the latest page
+    history.add("assistant", "message 7")
+    assert len(list(history.window())) == 3
+
+
+def test_sources_are_shared_by_reference():
+    """Test that repeated citations store chunk metadata once."""
+    history = ChatHistory()
+    first, second = sources(0, 800), sources(0)
+    history.add("assistant", "a", sources=first, compression={'ratio': 0.5})
+    history.add("assistant", "b", sources=second, precomputed=None)
+
+    messages = history.messages()
+    assert messages[1]['sources'][0] is messages[0]['sources'][0]
+    assert messages[0]['compression'] == {'ratio': 0.5}
+    assert 'precomputed' not in messages[1]
+    assert len(history._sources) == 2
+
+
+def test_sources_differing_only_in_span_are_kept_apart():
+    """Test that a merged chunk does not reuse the metadata of an unmerged one."""
+    history = ChatHistory()
+    unmerged = {'source': 'docs/guide.md', 'chunk_start': 0, 'chunk_end': 1000}
+    merged = {'source': 'docs/guide.md', 'chunk_start': 0, 'chunk_end': 1800, 'merged_chunks': 2}
+    history.add("assistant", "a", sources=[unmerged])
+    history.add("assistant", "b", sources=[merged])
+    history.add("assistant", "c", sources=[dict(unmerged)])
+
+    messages = history.messages()
+    assert messages[0]['sources'] == [unmerged]
+    assert messages[1]['sources'] == [merged]
+    assert messages[2]['sources'][0] is messages[0]['sources'][0]
+    assert len(history._sources) == 2
+
+
+def test_long_messages_are_compressed_transparently():
+    """Test that long content round-trips through compression."""
+    history = ChatHistory(compress_above_bytes=100)
+    text = "The installer sets up everything. " * 100
+    history.add("assistant", text)
+    assert isinstance(history._entries[0].content, bytes)
+    assert history.memory_bytes < len(text)
+    assert next(history.window())['content'] == text
+
+
+def test_limits_drop_oldest_messages_and_their_sources():
+    """Test the message count and memory caps."""
+    history = ChatHistory(max_messages=3)
+    history.add("assistant", "old", sources=sources(0))
+    for i in range(3):
+        history.add("user", f"question {i}")
+    assert len(history) == 3 and history.dropped == 1
+    assert history._sources == {}
+
+    small = ChatHistory(max_bytes=2000, compress_above_bytes=10_000)
+    for i in range(50):
+        small.add("user", f"{i} " + "x" * 200)
+    assert small.memory_bytes <= 2000
+    assert 0 < len(small) < 50
+    assert list(small.window())[-1]['content'].startswith("49 ")
+
+    small.clear()
+    assert len(small) == 0 and small.memory_bytes == 0 and small.dropped == 0
+
+
+def test_render_stats():
+    """Test render time statistics over reruns."""
+    history = ChatHistory()
+    assert history.render_stats()['reruns'] == 0
+    for seconds in (0.001, 0.002, 0.010):
+        history.record_render(seconds)
+    stats = history.render_stats()
+    assert stats['last_ms'] == 10.0 and stats['median_ms'] == 2.0 and stats['reruns'] == 3
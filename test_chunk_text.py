@@ -0,0 +1,84 @@
+"""Unit tests for offset-based chunk storage."""
+import chromadb
+
+from src.document_loader import DocumentLoader
+from src.vectorstore.chunk_text import ChunkTextResolver, storable_documents
+from src.vectorstore.vector_store import VectorStore
+
+TEXT = "# Setup\n\nInstall the app with the installer. Configure the port in settings.\n" * 5 + "Fertig ✓\n"
+
+
+def offset_chunks(path, text=TEXT):
+    """Write a document and chunk it the way the loader does."""
+    path.write_bytes(text.encode('utf-8'))
+    loader = DocumentLoader(str(path.parent), chunk_size=120, chunk_overlap=30)
+    chunks = loader.chunk_documents(loader.load_documents())
+    contents = [chunk['content'] for chunk in chunks]
+    metadatas = [dict(chunk['metadata']) for chunk in chunks]
+    return contents, metadatas
+
+
+def test_offsets_mode_stores_hash_instead_of_text(tmp_path):
+    """Test that only chunks with byte offsets are stored without text."""
+    contents, metadatas = offset_chunks(tmp_path / "guide.md")
+    assert storable_documents('text', contents, metadatas) == contents
+    assert 'content_hash' not in metadatas[0]
+
+    metadatas.append({'source': 'old.md', 'chunk_start': 0, 'chunk_end': 3})
+    stored = storable_documents('offsets', contents + ["old"], metadatas)
+    assert stored == [None] * len(contents) + ["old"]
+    assert all('content_hash' in metadata for metadata in metadatas[:-1])
+
+
+def test_resolver_slices_mapped_file(tmp_path):
+    """Test that chunk text, including multi-byte characters, is read back exactly."""
+    contents, metadatas = offset_chunks(tmp_path / "guide.md")
+    storable_documents('offsets', contents, metadatas)
+    resolver = ChunkTextResolver()
+
+    assert resolver.fill([None] * len(contents), metadatas) == contents
+    assert resolver.get_stats()['resolved'] == len(contents)
+    assert resolver.get_stats()['open_files'] == 1
+    resolver.close()
+
+
+def test_resolver_falls_back_for_crlf_and_skips_changed_files(tmp_path):
+    """Test the character offset fallback and stale chunk handling."""
+    path = tmp_path / "guide.md"
+    contents, metadatas = offset_chunks(path, TEXT.replace("\n", "\r\n"))
+    storable_documents('offsets', contents, metadatas)
+    resolver = ChunkTextResolver()
+
+    # Reading in text mode drops the \r, so byte offsets are off but characters match
+    assert resolver.resolve(metadatas[-1]) == contents[-1]
+    assert resolver.get_stats()['fallbacks'] == 1
+
+    path.write_text("Completely rewritten.\n" * 20)
+    assert resolver.resolve(metadatas[-1]) is None
+    assert resolver.fill([None, "kept"], metadatas[-1:] * 2, missing='') == ['', "kept"]
+    assert resolver.get_stats()['stale'] == 2
+
+
+def test_vector_store_resolves_offset_chunks_in_queries_and_exports(tmp_path):
+    """Test that queries and exports return text for chunks stored as offsets."""
+    contents, metadatas = offset_chunks(tmp_path / "guide.md")
+    store = VectorStore.__new__(VectorStore)
+    store.chunk_storage = 'offsets'
+    store.text_resolver = ChunkTextResolver()
+    store.client = chromadb.EphemeralClient()
+    store.client.get_or_create_collection("offsets-test")
+    store.client.delete_collection("offsets-test")  # Reason: in-memory clients share state
+    store.collection = store.client.get_or_create_collection("offsets-test")
+    ids = [f"guide-{metadata['chunk_start']}" for metadata in metadatas]
+    embeddings = [[float(i), 1.0] for i in range(len(ids))]
+
+    store.add_records(ids, embeddings, list(contents), metadatas)
+    assert store.collection.get(ids=ids[:1], include=['documents'])['documents'] == [None]
+
+    results = store.query_by_embedding([0.0, 1.0], n_results=2)
+    assert [result['content'] for result in results] == contents[:2]
+    assert store.export_records()['documents'] == contents
+
+    # Chunks of a changed file are left out rather than returned with wrong text
+    (tmp_path / "guide.md").write_text("Something else entirely.\n" * 30)
+    assert store.query_by_embedding([0.0, 1.0], n_results=2) == []
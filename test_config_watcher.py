@@ -0,0 +1,186 @@
+"""Unit tests for config hot reload."""
+import os
+import threading
+import warnings
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+import yaml
+from pydantic.warnings import PydanticDeprecatedSince20
+
+from src.chat_handler import ChatHandler
+from src.utils.config_loader import load_config
+from src.utils.config_watcher import ConfigWatcher, diff_config
+
+
+def make_config(**overrides):
+    """Create a valid config with two models, overriding top-level keys."""
+    config = {
+        'docs_dir': 'docs',
+        'vectorstore_path': 'vectorstore',
+        'models': {
+            'small': {'path': 'small.gguf', 'max_tokens': 256, 'temperature': 0.7, 'top_p': 0.9},
+            'large': {'path': 'large.gguf', 'max_tokens': 512, 'temperature': 0.7, 'top_p': 0.9}
+        },
+        'active_model': 'small',
+        'chunk_size': 1000,
+        'chunk_overlap': 200,
+        'logging': {'level': 'INFO'}
+    }
+    config.update(overrides)
+    return config
+
+
+def write_config(path, config, mtime):
+    """Write a config file with a given modification time in nanoseconds."""
+    path.write_text(yaml.safe_dump(config))
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_diff_config_reports_only_changed_parts():
+    """Test that the diff isolates changed models, chunking and restart-only sections"""
+    old = make_config()
+    new = make_config(chunk_size=800, embedding={'model': 'other'})
+    new['models'] = {**old['models'], 'large': {**old['models']['large'], 'max_tokens': 1024}}
+
+    changes = diff_config(old, new)
+
+    assert changes['models'] == ['large']
+    assert changes['chunking'] is True
+    assert changes['active_model'] is False
+    assert changes['logging'] is False
+    assert changes['restart_required'] == ['embedding']
+
+
+def test_watcher_applies_valid_changes_and_ignores_invalid(tmp_path):
+    """Test that only validated, changed configs reach the callback"""
+    path = tmp_path / "config.yaml"
+    write_config(path, make_config(), 1_000_000_000)
+    applied = []
+    watcher = ConfigWatcher(str(path), applied.append)
+
+    assert watcher.check() is False  # Unchanged file
+
+    write_config(path, make_config(active_model='missing'), 2_000_000_000)
+    assert watcher.check() is False
+    assert 'active_model' in watcher.last_error
+
+    write_config(path, make_config(logging={'level': 'debug'}), 3_000_000_000)
+    assert watcher.check() is True
+    assert applied[0]['logging']['level'] == 'DEBUG'
+    assert watcher.last_error is None
+
+
+def test_config_validation_uses_current_pydantic_api(tmp_path):
+    """Test that validating a config on each reload emits no deprecation warnings"""
+    path = tmp_path / "config.yaml"
+    write_config(path, make_config(logging={'level': 'warning'}), 1_000_000_000)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', PydanticDeprecatedSince20)
+        config = load_config(str(path))
+    assert config['logging']['level'] == 'WARNING'
+    assert config['models']['small']['max_tokens'] == 256
+
+
+def test_hot_reload_changes_require_a_restart():
+    """Test that the watcher's own settings are reported as not applied"""
+    changes = diff_config(make_config(), make_config(hot_reload={'enabled': True, 'interval_seconds': 10}))
+    assert changes['restart_required'] == ['hot_reload']
+
+
+@pytest.fixture
+def handler():
+    """ChatHandler with mocked model, retriever and loader."""
+    with patch('src.chat_handler.ModelManager'), \
+         patch('src.chat_handler.Retriever'), \
+         patch('src.chat_handler.DocumentLoader'):
+        handler = ChatHandler(make_config())
+    handler.model.active_model = 'small'
+    handler.process_documents = MagicMock()
+    return handler
+
+
+def test_apply_config_reloads_changed_models(handler):
+    """Test that model changes reach the model manager and keep the picked model"""
+    new = make_config()
+    new['models'] = {**new['models'], 'large': {**new['models']['large'], 'max_tokens': 1024}}
+    handler.model.active_model = 'large'  # Picked in the UI
+
+    changes = handler.apply_config(new)
+    assert changes['models'] == ['large']
+    handler.model.apply_model_config.assert_called_once_with(new['models'], 'large')
+    assert handler.model.config is new and handler.config is new
+    handler.process_documents.assert_not_called()
+
+    # A removed model falls back to the configured active model
+    newer = make_config(active_model='small')
+    newer['models'] = {'small': newer['models']['small']}
+    handler.apply_config(newer)
+    handler.model.apply_model_config.assert_called_with(newer['models'], 'small')
+
+
+def test_apply_config_reindexes_only_for_chunking_or_docs_dir(handler):
+    """Test that only chunking and directory changes re-index documents"""
+    handler.apply_config(make_config(logging={'level': 'DEBUG'}))
+    handler.process_documents.assert_not_called()
+    handler.model.apply_model_config.assert_not_called()
+
+    rechunked = make_config(chunk_size=500)
+    handler.apply_config(rechunked)
+    handler.process_documents.assert_called_once()
+    assert handler.loader.chunk_size == 500 and handler.index_config is rechunked
+
+    handler.apply_config(make_config(chunk_size=500, docs_dir='other_docs'))
+    assert handler.process_documents.call_count == 2
+    assert handler.loader.docs_dir == Path('other_docs')
+
+
+def test_apply_config_reinitializes_changed_sections(handler):
+    """Test that compression, answer index and profiling are rebuilt in place"""
+    new = make_config(
+        context_compression={'enabled': True, 'token_budget': 128},
+        answer_index={'enabled': True, 'max_distance': 0.1},
+        profiling={'always': True}
+    )
+    with patch('src.chat_handler.ContextCompressor') as compressor, \
+         patch('src.chat_handler.AnswerIndex') as answer_index:
+        changes = handler.apply_config(new)
+
+    assert changes['sections'] == ['answer_index', 'context_compression', 'profiling']
+    assert handler.compressor is compressor.return_value
+    assert compressor.call_args.kwargs['token_budget'] == 128
+    answer_index.assert_called_once_with(handler.retriever.vectorstore, max_distance=0.1)
+    assert handler.profiler.settings()['always'] is True
+    handler.process_documents.assert_not_called()
+
+
+def test_apply_config_waits_for_running_queries(handler):
+    """Test that a config change is applied only after in-flight queries finish"""
+    generating, release = threading.Event(), threading.Event()
+
+    def generate(prompt):
+        """Block generation until the test releases it."""
+        generating.set()
+        release.wait(5)
+        return "answer"
+
+    handler.model.generate_response.side_effect = generate
+    handler.retriever.retrieve_relevant_chunks.return_value = [
+        {'content': 'ctx', 'metadata': {'source': 'a.md'}}
+    ]
+    query = threading.Thread(target=handler.process_query, args=("question",))
+    query.start()
+    assert generating.wait(5)
+
+    new = make_config(chunk_size=500)
+    apply = threading.Thread(target=handler.apply_config, args=(new,))
+    apply.start()
+    apply.join(0.2)
+    assert apply.is_alive() and handler.config is not new
+
+    release.set()
+    query.join(5)
+    apply.join(5)
+    assert handler.config is new
+    handler.process_documents.assert_called_once()
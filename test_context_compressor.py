@@ -0,0 +1,61 @@
+"""Unit tests for ContextCompressor functionality."""
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from src.context_compressor import ContextCompressor
+
+VOCAB = ['python', 'chroma', 'docker', 'llama']
+
+def fake_encode(texts, **kwargs):
+    """Embed texts as normalized keyword-count vectors."""
+    vectors = []
+    for text in texts:
+        vec = np.array([text.lower().count(w) for w in VOCAB], dtype=float) + 1e-3
+        vectors.append(vec / np.linalg.norm(vec))
+    return np.array(vectors)
+
+@pytest.fixture
+def compressor():
+    """Fixture providing a compressor with a fake embedding model."""
+    model = MagicMock()
+    model.encode.side_effect = fake_encode
+    return ContextCompressor(model, token_budget=8, min_sentence_chars=5)
+
+@pytest.fixture
+def chunks():
+    """Fixture providing retrieved chunks with mixed relevance."""
+    return [
+        {
+            'content': 'Python is a popular language. Docker runs containers for deployment.',
+            'metadata': {'source': 'a.md'}
+        },
+        {
+            'content': 'Chroma stores vectors on disk.\nLlama models run locally on CPU.',
+            'metadata': {'source': 'b.md'}
+        }
+    ]
+
+def test_split_sentences(compressor):
+    """Test sentence splitting on punctuation and newlines."""
+    sentences = compressor.split_sentences("First sentence here. Second one!\nThird line")
+    assert sentences == ['First sentence here.', 'Second one!', 'Third line']
+
+def test_compress_keeps_relevant_sentences(compressor, chunks):
+    """Test that only query-relevant sentences survive compression."""
+    compressed, stats = compressor.compress("Tell me about Python", chunks)
+    assert len(compressed) == 1
+    assert compressed[0]['metadata'] == {'source': 'a.md'}
+    assert 'Python' in compressed[0]['content']
+    assert 'Docker' not in compressed[0]['content']
+    assert stats['compressed_tokens'] <= 8
+    assert stats['ratio'] < 1.0
+    assert stats['tokens_saved'] == stats['original_tokens'] - stats['compressed_tokens']
+    assert stats['prefill_seconds_saved'] > 0
+
+def test_compress_under_budget_is_noop(compressor):
+    """Test that short context is returned unchanged."""
+    short = [{'content': 'Python rocks.', 'metadata': {}}]
+    compressed, stats = compressor.compress("python", short)
+    assert compressed == short
+    assert stats['ratio'] == 1.0
+    compressor.embedding_model.encode.assert_not_called()
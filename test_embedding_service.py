@@ -0,0 +1,122 @@
+"""Unit tests for the shared embedding service protocol and batching."""
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.vectorstore.embedding_service import RequestBatcher, recv_message, send_message
+from src.vectorstore.service_client import ServiceConnection
+
+def test_message_round_trip_with_arrays():
+    """Test that arrays cross the socket intact and writable."""
+    left, right = socket.socketpair()
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)
+    send_message(left, {'op': 'encode', 'vectors': vectors, 'score': np.float32(0.5), 'texts': ['a']})
+    message = recv_message(right)
+    assert message['op'] == 'encode' and message['texts'] == ['a']
+    assert message['score'] == 0.5
+    np.testing.assert_array_equal(message['vectors'], vectors)
+    message['vectors'] *= 2  # Must not raise on a read-only buffer
+    left.close()
+    right.close()
+
+def test_batcher_coalesces_concurrent_requests():
+    """Test that concurrent requests with the same key share one call."""
+    calls = []
+    release = threading.Event()
+
+    def run_batch(key, items):
+        """Answer a batch once all requests have been submitted."""
+        release.wait()
+        calls.append((key, list(items)))
+        return [f"{key[0]}:{item}" for item in items]
+
+    batcher = RequestBatcher(run_batch, max_wait=0.2, max_items=16)
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(batcher.submit, ('k',), i) for i in range(8)]
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert results == [f"k:{i}" for i in range(8)]
+    assert sum(len(items) for _, items in calls) == 8
+    assert len(calls) < 8
+
+def test_batcher_propagates_errors_to_each_caller():
+    """Test that a failing batch fails every request in it."""
+    def run_batch(key, items):
+        """Fail every batch."""
+        raise RuntimeError("model crashed")
+
+    batcher = RequestBatcher(run_batch, max_wait=0.001)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.submit(('k',), 1)
+
+
+@pytest.fixture
+def fake_service(tmp_path):
+    """Serve requests on a Unix socket, echoing each request's `texts`.
+
+    Requests whose texts start with "slow" are answered after 0.5 s, and
+    the connection is dropped without an answer for texts starting with
+    "drop" (once per text).
+    """
+    received, dropped = [], set()
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            """Answer requests on one connection until it closes."""
+            while True:
+                try:
+                    request = recv_message(self.request)
+                except ConnectionError:
+                    return
+                received.append(request)
+                text = request['texts'][0]
+                if text.startswith("drop") and text not in dropped:
+                    dropped.add(text)
+                    return
+                if text.startswith("slow"):
+                    time.sleep(0.5)
+                try:
+                    send_message(self.request, {'result': request['texts']})
+                except OSError:
+                    return
+
+    path = str(tmp_path / "service.sock")
+    server = socketserver.ThreadingUnixStreamServer(path, Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield path, received
+    server.shutdown()
+    server.server_close()
+
+
+def test_timed_out_request_does_not_leak_its_reply(fake_service):
+    """Test that the call after a timeout gets its own response, not the late one."""
+    path, _ = fake_service
+    connection = ServiceConnection(path, timeout=0.2)
+    with pytest.raises(socket.timeout):
+        connection.call('encode', texts=["slow"])
+    assert connection.call('encode', texts=["fast"]) == ["fast"]
+    time.sleep(0.5)  # The late reply has arrived by now
+    assert connection.call('encode', texts=["next"]) == ["next"]
+    connection.close()
+
+
+def test_only_read_requests_are_retried(fake_service):
+    """Test that a broken connection repeats reads but never writes."""
+    path, received = fake_service
+    connection = ServiceConnection(path, timeout=2.0)
+    assert connection.call('encode', texts=["drop-read"]) == ["drop-read"]
+    assert [r['texts'] for r in received] == [["drop-read"], ["drop-read"]]
+
+    received.clear()
+    with pytest.raises(ConnectionError):
+        connection.call('collection', name='documents', method='add', texts=["drop-write"])
+    assert len(received) == 1
+    assert connection.call('collection', name='documents', method='get', texts=["after"]) == ["after"]
+    connection.close()
@@ -0,0 +1,68 @@
+"""Unit tests for embedding model configuration helpers."""
+import chromadb
+import pytest
+from unittest.mock import MagicMock
+from src.vectorstore.embeddings import (
+    EmbeddingModelMismatchError,
+    check_fingerprint,
+    embedding_fingerprint,
+    fingerprint_settings
+)
+from src.vectorstore.vector_store import VectorStore
+
+def test_embedding_fingerprint_defaults_to_minilm():
+    """Test fingerprint records model name and dimension."""
+    model = MagicMock(backend='torch')
+    model.get_sentence_embedding_dimension.return_value = 384
+    assert embedding_fingerprint({}, model) == {
+        'embedding_model': 'all-MiniLM-L6-v2',
+        'embedding_dim': 384,
+        'embedding_backend': 'torch',
+        'embedding_quantization': 'none'
+    }
+
+def test_check_fingerprint_detects_runtime_switch():
+    """Test that vectors of another backend or quantization are rejected."""
+    model = MagicMock(backend='onnx')
+    model.get_sentence_embedding_dimension.return_value = 384
+    onnx = embedding_fingerprint({'backend': 'onnx', 'quantization': 'avx512'}, model)
+    assert onnx['embedding_quantization'] == 'avx512'
+    model.backend = 'torch'
+    torch_fp = embedding_fingerprint({'backend': 'onnx'}, model)  # ONNX runtime missing: loaded torch
+    assert torch_fp['embedding_backend'] == 'torch' and torch_fp['embedding_quantization'] == 'none'
+
+    with pytest.raises(EmbeddingModelMismatchError, match="onnx int8 avx512"):
+        check_fingerprint(onnx, torch_fp)
+    with pytest.raises(EmbeddingModelMismatchError):
+        check_fingerprint(torch_fp, onnx)
+    with pytest.raises(EmbeddingModelMismatchError):
+        check_fingerprint({**onnx, 'embedding_quantization': 'avx2'}, onnx)
+    # Indexes tagged before the runtime was recorded are only checked for model and dimension
+    check_fingerprint({'embedding_model': 'all-MiniLM-L6-v2', 'embedding_dim': 384}, onnx)
+    assert fingerprint_settings(onnx) == {'model': 'all-MiniLM-L6-v2', 'backend': 'onnx', 'quantization': 'avx512'}
+
+def test_check_fingerprint_detects_mismatch():
+    """Test that an index built with another model is rejected."""
+    expected = {'embedding_model': 'all-MiniLM-L6-v2', 'embedding_dim': 384}
+    check_fingerprint(dict(expected), expected)
+    with pytest.raises(EmbeddingModelMismatchError):
+        check_fingerprint({'embedding_model': 'bge-small-en', 'embedding_dim': 384}, expected)
+    with pytest.raises(ValueError):
+        check_fingerprint({'embedding_model': 'all-MiniLM-L6-v2', 'embedding_dim': 768}, expected)
+
+def test_vector_store_records_runtime_of_existing_index():
+    """Test that an index tagged without runtime gets it recorded, then enforced."""
+    legacy = {'embedding_model': 'all-MiniLM-L6-v2', 'embedding_dim': 2}
+    client = chromadb.EphemeralClient()
+    if "runtime-test" in [getattr(c, 'name', c) for c in client.list_collections()]:
+        client.delete_collection("runtime-test")  # Reason: in-memory clients share state
+    collection = client.create_collection("runtime-test", metadata=legacy)
+    collection.add(ids=["a"], embeddings=[[0.0, 1.0]], documents=["a"])
+    store = VectorStore.__new__(VectorStore)
+    store.fingerprint = {**legacy, 'embedding_backend': 'torch', 'embedding_quantization': 'none'}
+
+    store._verify_fingerprint(collection)
+    assert collection.metadata['embedding_backend'] == 'torch'
+    store.fingerprint = {**legacy, 'embedding_backend': 'onnx', 'embedding_quantization': 'avx2'}
+    with pytest.raises(EmbeddingModelMismatchError):
+        store._verify_fingerprint(collection)
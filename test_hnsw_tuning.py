@@ -0,0 +1,75 @@
+"""Unit tests for HNSW parameter tuning."""
+import json
+import os
+
+import numpy as np
+
+from src.vectorstore.hnsw_tuning import (
+    brute_force_neighbors,
+    choose,
+    format_report,
+    load_hnsw_settings,
+    save_hnsw_settings,
+    tune
+)
+
+
+def result(M, ef_search, recall, p95):
+    """Create a tuning result with the given measurements."""
+    return {'M': M, 'ef_construction': 100, 'ef_search': ef_search, 'recall': recall,
+            'p50_ms': p95 / 2, 'p95_ms': p95, 'p99_ms': p95 * 2, 'build_seconds': 0.1}
+
+
+def test_brute_force_neighbors_matches_naive_search():
+    """Test exact neighbours for l2 and cosine spaces."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    queries = rng.normal(size=(5, 8)).astype(np.float32)
+
+    l2 = brute_force_neighbors(vectors, queries, 3, 'l2')
+    for query, found in zip(queries, l2):
+        assert found.tolist() == np.argsort(np.linalg.norm(vectors - query, axis=1))[:3].tolist()
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    cosine = brute_force_neighbors(vectors, queries, 3, 'cosine')
+    for query, found in zip(queries, cosine):
+        assert found.tolist() == np.argsort(-(unit @ query))[:3].tolist()
+
+
+def test_choose_prefers_fastest_setting_reaching_target():
+    """Test selection by latency among settings with enough recall."""
+    results = [result(8, 10, 0.80, 0.2), result(16, 40, 0.97, 0.5), result(32, 100, 1.0, 0.9)]
+    assert choose(results, 0.95) is results[1]
+    assert choose(results, 0.999) is results[2]
+    # Reason: when nothing reaches the target the most accurate setting wins
+    assert choose(results[:1], 0.95) is results[0]
+    assert "<- chosen" in format_report(results, results[1], 5).splitlines()[2]
+
+
+def test_settings_round_trip(tmp_path):
+    """Test that saved settings load as collection metadata."""
+    assert load_hnsw_settings(str(tmp_path)) == {}
+    path = save_hnsw_settings(str(tmp_path), result(16, 40, 0.97, 0.5))
+
+    assert load_hnsw_settings(str(tmp_path)) == {
+        'hnsw:M': 16, 'hnsw:construction_ef': 100, 'hnsw:search_ef': 40
+    }
+    with open(path) as f:
+        assert json.load(f)['measured']['recall'] == 0.97
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_tune_measures_every_combination():
+    """Test recall and latency measurement on an in-memory index."""
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(300, 16)).astype(np.float32)
+    queries = vectors[:20]
+
+    results = tune(vectors, queries, k=5, m_values=[8, 16],
+                   ef_construction_values=[100], ef_search_values=[10, 100])
+
+    assert [(r['M'], r['ef_search']) for r in results] == [(8, 10), (8, 100), (16, 10), (16, 100)]
+    assert all(0.0 <= r['recall'] <= 1.0 for r in results)
+    assert all(r['p50_ms'] <= r['p95_ms'] <= r['p99_ms'] for r in results)
+    # A wide search over a small index is exact
+    assert results[-1]['recall'] > 0.95
@@ -0,0 +1,103 @@
+"""Unit tests for stable prompt ordering and the disk-backed prefix cache."""
+import os
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src.chat_handler import ChatHandler
+from src.models.model_manager import ModelManager
+from src.models.prefix_cache import PrefixDiskCache, cache_dir_for
+
+
+def test_prompt_context_order_is_independent_of_retrieval_order():
+    """Test that the same chunks always produce the same prompt prefix."""
+    chunks = [
+        {'content': "Port 8501.", 'metadata': {'source': 'docs/server.md', 'chunk_start': 800}},
+        {'content': "Run the installer.", 'metadata': {'source': 'docs/install.md', 'chunk_start': 0}},
+        {'content': "Start the server.", 'metadata': {'source': 'docs/server.md', 'chunk_start': 0}},
+    ]
+    first = ChatHandler._format_prompt(None, "Which port?", chunks)
+    second = ChatHandler._format_prompt(None, "How do I install it?", chunks[::-1])
+
+    shared = os.path.commonprefix([first, second])
+    assert shared.endswith("Content: Port 8501.\n\nQuestion: ")
+    assert shared.index("Run the installer.") < shared.index("Start the server.") < shared.index("Port 8501.")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Prefix cache bound to a fake model holding nothing in memory."""
+    cache = PrefixDiskCache(str(tmp_path / "prefix"), min_prefix_tokens=4)
+    llm = MagicMock()
+    llm._input_ids = np.array([], dtype=np.intc)
+    cache.bind(llm)
+    llm.set_cache.assert_called_once_with(cache)
+    return cache
+
+
+def test_lookup_restores_longest_stored_prefix(cache):
+    """Test that the state sharing the longest prefix is returned and kept."""
+    cache[(1, 2, 3, 4, 5, 6, 90)] = "state A"
+    cache[(1, 2, 3, 9)] = "state B"
+
+    assert cache[(1, 2, 3, 4, 5, 7)] == "state A"
+    assert cache[(1, 2, 3, 4, 5, 8)] == "state A"  # Entries survive lookups
+    with pytest.raises(KeyError):
+        cache[(1, 2, 3, 8)]  # Shared prefix shorter than min_prefix_tokens
+
+    stats = cache.get_stats()
+    assert stats['lookups'] == 3 and stats['hits'] == 2
+    assert stats['restored_tokens'] == 10 and stats['prompt_tokens'] == 16
+    assert stats['entries'] == 2 and stats['saved_fraction'] == 10 / 16
+
+
+def test_lookup_skips_states_the_model_already_holds(cache):
+    """Test that disk states are not loaded when memory already has the prefix."""
+    cache[(1, 2, 3, 4, 5, 6)] = "state"
+    cache.llm._input_ids = np.array([1, 2, 3, 4, 5, 6, 7], dtype=np.intc)
+
+    with pytest.raises(KeyError):
+        cache[(1, 2, 3, 4, 5, 6, 8)]
+    stats = cache.get_stats()
+    assert stats['hits'] == 0 and stats['tokens_saved'] == 6
+
+
+def test_capacity_evicts_oldest_states(tmp_path):
+    """Test that the cache stays within its size limit."""
+    cache = PrefixDiskCache(str(tmp_path / "prefix"), capacity_bytes=150_000, min_prefix_tokens=1)
+    for i in range(5):
+        cache[(i, 1, 2)] = b"x" * 60_000
+    assert cache.cache_size <= 150_000
+    assert (4, 1, 2) in cache and (0, 1, 2) not in cache
+
+
+def test_cache_dir_changes_with_model_file(tmp_path):
+    """Test that states of a replaced model file are never reused."""
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"v1")
+    first = cache_dir_for(str(tmp_path / "cache"), str(model))
+    model.write_bytes(b"version 2")
+    assert cache_dir_for(str(tmp_path / "cache"), str(model)) != first
+    assert os.path.basename(first).startswith("model-")
+
+
+def test_model_manager_attaches_prefix_cache(tmp_path):
+    """Test that GGUF models get the prefix cache when enabled."""
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"gguf")
+    config = {
+        'models': {'local': {'path': str(model)}},
+        'active_model': 'local',
+        'prefix_cache': {'enabled': True, 'path': str(tmp_path / "cache"), 'min_prefix_tokens': 16}
+    }
+    with patch('src.models.model_manager.Llama') as llama:
+        manager = ModelManager(config)
+        manager.load_model()
+        assert manager.prefix_cache.min_prefix_tokens == 16
+        llama.return_value.set_cache.assert_called_once_with(manager.prefix_cache)
+        assert manager.get_prefix_cache_stats()['lookups'] == 0
+
+        config['prefix_cache']['enabled'] = False
+        manager.load_model()
+        assert manager.get_prefix_cache_stats() is None
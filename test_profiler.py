@@ -0,0 +1,70 @@
+"""Unit tests for request profiling."""
+import os
+import pstats
+import time
+
+import pytest
+
+from src.utils.profiler import RequestProfiler
+
+
+def busy(seconds):
+    """Keep the CPU busy for the given number of seconds."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def profile_files(path):
+    """Return the names of the profiles written to path, oldest first."""
+    return sorted(name for name in os.listdir(path) if name.startswith('profile-'))
+
+
+def test_inactive_profiler_writes_nothing(tmp_path):
+    """Test that requests are not profiled unless enabled or forced"""
+    profiler = RequestProfiler(output_dir=str(tmp_path))
+    with profiler.capture("query"):
+        busy(0.01)
+    assert profile_files(tmp_path) == []
+
+
+def test_forced_sampling_capture_writes_collapsed_stacks(tmp_path):
+    """Test that a forced capture writes collapsed stacks containing the profiled code"""
+    profiler = RequestProfiler(output_dir=str(tmp_path), sample_interval=0.001)
+    with profiler.capture("what is docker?", force=True):
+        busy(0.1)
+
+    [name] = profile_files(tmp_path)
+    assert name.endswith("-what-is-docker.collapsed")
+    lines = (tmp_path / name).read_text().splitlines()
+    assert any("busy (test_profiler.py" in line for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_threshold_keeps_only_slow_requests(tmp_path):
+    """Test that threshold capture discards fast requests and keeps slow ones as pstats"""
+    profiler = RequestProfiler(output_dir=str(tmp_path), mode="cprofile", threshold_seconds=0.05)
+    with profiler.capture("fast"):
+        pass
+    with profiler.capture("slow"):
+        busy(0.06)
+
+    [name] = profile_files(tmp_path)
+    assert name.endswith("-slow.pstats")
+    stats = pstats.Stats(str(tmp_path / name))
+    assert any(func[2] == "busy" for func in stats.stats)
+
+
+def test_runtime_toggle_and_retention(tmp_path):
+    """Test that settings change at runtime and old profiles are pruned"""
+    profiler = RequestProfiler(output_dir=str(tmp_path), max_files=2)
+    profiler.configure(always=True, mode="cprofile")
+    for i in range(4):
+        with profiler.capture(f"q{i}"):
+            pass
+        time.sleep(0.01)
+
+    assert len(profile_files(tmp_path)) == 2
+    assert profile_files(tmp_path)[-1].endswith("-q3.pstats")
+    with pytest.raises(ValueError):
+        profiler.configure(mode="perf")
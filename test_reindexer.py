@@ -0,0 +1,227 @@
+"""Unit tests for index generations and background re-indexing."""
+import os
+import threading
+from unittest.mock import MagicMock, patch
+
+import chromadb
+import pytest
+
+from src.chat_handler import ChatHandler
+from src.reindexer import BackgroundReindexer
+from src.utils.config_watcher import diff_config
+from src.vectorstore.generations import (
+    collection_name,
+    drop_generations,
+    index_settings,
+    list_generations,
+    load_active_index,
+    manifest_path,
+    parse_collection_name,
+    save_active_index
+)
+
+
+def make_config(tmp_path, **overrides):
+    """Create a minimal config with background re-indexing enabled."""
+    config = {
+        'docs_dir': 'docs', 'vectorstore_path': str(tmp_path), 'chunk_size': 1000, 'chunk_overlap': 200,
+        'embedding': {'model': 'all-MiniLM-L6-v2', 'batch_size': 32},
+        'reindex': {'background': True, 'batch_size': 2, 'gc_delay_seconds': 0}
+    }
+    config.update(overrides)
+    return config
+
+
+def test_collection_names_and_index_settings():
+    """Test generation suffixes and which settings identify an index."""
+    assert collection_name("documents", None) == "documents"
+    assert parse_collection_name(collection_name("documents__dir-a-1234", "g1")) == ("documents__dir-a-1234", "g1")
+    assert parse_collection_name("documents") == ("documents", None)
+
+    settings = index_settings({'embedding': {'model': 'm', 'batch_size': 8}, 'chunk_size': 500, 'chunk_overlap': 50})
+    assert settings == {'embedding': {'model': 'm', 'backend': 'torch'}, 'chunk_size': 500, 'chunk_overlap': 50}
+    # Batch size does not change the vectors
+    assert index_settings({'embedding': {'model': 'm', 'batch_size': 64}, 'chunk_size': 500,
+                           'chunk_overlap': 50}) == settings
+
+
+def test_drop_generations_keeps_other_generations(tmp_path):
+    """Test that only the named generations and their manifests are deleted."""
+    client = chromadb.EphemeralClient()
+    for name in ("documents", "documents.g1", "documents__src-a-1.g1", "documents.g2", "answer_index"):
+        client.get_or_create_collection(name)
+    for generation in (None, "g1", "g2"):
+        open(manifest_path(str(tmp_path), generation), 'w').close()
+    assert list_generations(client) >= {None, "g1", "g2"}
+
+    deleted = drop_generations(client, str(tmp_path), {None, "g1"})
+    assert sorted(deleted) == ["documents", "documents.g1", "documents__src-a-1.g1"]
+    remaining = {getattr(c, 'name', c) for c in client.list_collections()}
+    assert {"documents.g2", "answer_index"} <= remaining
+    assert os.listdir(tmp_path) == ["manifest.g2.json"]
+    drop_generations(client, str(tmp_path), {"g2"})
+
+
+def test_active_index_pointer_round_trips(tmp_path):
+    """Test that the pointer to the live generation survives a restart."""
+    assert load_active_index(str(tmp_path)) == {}
+    save_active_index(str(tmp_path), "g7", {'chunk_size': 500})
+    active = load_active_index(str(tmp_path))
+    assert active['generation'] == "g7" and active['settings'] == {'chunk_size': 500}
+
+
+def test_diff_config_applies_embedding_live_with_background_reindex(tmp_path):
+    """Test that a model change needs no restart when rebuilt in the background."""
+    old = make_config(tmp_path)
+    new = make_config(tmp_path, embedding={'model': 'other'})
+    assert diff_config(old, new)['restart_required'] == []
+    assert 'embedding' in diff_config(old, new)['sections']
+
+    for config in (old, new):
+        config['reindex'] = {'background': False}
+    assert diff_config(old, new)['restart_required'] == ['embedding']
+
+
+def chunks(count):
+    """Create chunks of one source file."""
+    return [{'content': f"chunk {i}", 'metadata': {'source': 'a.md', 'chunk_start': i}} for i in range(count)]
+
+
+@pytest.fixture
+def handler():
+    """Fake chat handler serving from a live store of generation g0."""
+    handler = MagicMock()
+    handler.retriever.vectorstore.generation = "g0"
+    handler.retriever.vectorstore.encode_queries.return_value = [[0.0]]
+    return handler
+
+
+def run_rebuild(handler, config, chunk_count=5):
+    """Run a rebuild to completion with fake documents and a fake new store."""
+    with patch('src.reindexer.Retriever') as retriever, \
+         patch('src.reindexer.DocumentLoader') as loader, \
+         patch('src.reindexer.list_generations', return_value={"g0"}), \
+         patch('src.reindexer.drop_generations') as drop:
+        retriever.return_value.vectorstore.fingerprint = {'embedding_model': config['embedding']['model']}
+        retriever.return_value.vectorstore.generation = "g1"
+        loader.return_value.load_documents.return_value = [{'content': 'x', 'metadata': {'source': 'a.md'}}]
+        loader.return_value.chunk_documents.return_value = chunks(chunk_count)
+        reindexer = BackgroundReindexer(handler, config, config['reindex'])
+        reindexer.start()
+        reindexer.join(timeout=10)
+        return reindexer, retriever.return_value, drop
+
+
+def test_rebuild_embeds_in_batches_then_switches_and_drops_old_generation(tmp_path, handler):
+    """Test the full rebuild: batches, progress, switch, clean-up."""
+    config = make_config(tmp_path, embedding={'model': 'new-model'})
+    reindexer, retriever, drop = run_rebuild(handler, config)
+
+    store = retriever.vectorstore
+    assert [len(call.args[0]) for call in store.store_documents.call_args_list] == [2, 2, 1]
+    store.save_manifest.assert_called_once()
+    handler.switch_index.assert_called_once_with(retriever, config)
+    drop.assert_called_with(handler.retriever.vectorstore.client, handler.retriever.vectorstore.persist_dir, {"g0"})
+
+    progress = reindexer.progress()
+    assert progress['state'] == 'done' and progress['done'] == progress['total'] == 5
+    assert progress['percent'] == 100.0 and progress['chunks_per_second'] > 0
+
+
+def test_rebuild_fails_without_switching_when_model_differs(tmp_path, handler):
+    """Test that a store embedding with another model is never switched to."""
+    config = make_config(tmp_path, embedding={'model': 'new-model'})
+    with patch('src.reindexer.Retriever') as retriever, \
+         patch('src.reindexer.list_generations', return_value=set()), \
+         patch('src.reindexer.drop_generations') as drop:
+        retriever.return_value.vectorstore.fingerprint = {'embedding_model': 'service-model'}
+        reindexer = BackgroundReindexer(handler, config, config['reindex'])
+        reindexer.start()
+        reindexer.join(timeout=10)
+
+    assert reindexer.progress()['state'] == 'failed'
+    assert 'service-model' in reindexer.progress()['error']
+    handler.switch_index.assert_not_called()
+    drop.assert_called_with(handler.retriever.vectorstore.client, str(tmp_path), {reindexer.generation})
+
+
+def test_throttle_caps_busy_time_and_backs_off_on_slow_queries(tmp_path, handler):
+    """Test the duty cycle pause and the latency back-off."""
+    reindexer = BackgroundReindexer(handler, make_config(tmp_path),
+                                    {'max_busy_fraction': 0.25, 'latency_budget_ms': 100})
+    reindexer._cancel.wait = MagicMock()
+    live_store = handler.retriever.vectorstore
+
+    with patch('src.reindexer.time.perf_counter', side_effect=[0.0, 0.01]):
+        reindexer._throttle(live_store, [0.0], busy_seconds=1.0)
+    reindexer._cancel.wait.assert_called_with(3.0)
+    assert reindexer.last_probe_ms == 10.0
+
+    # Live queries slower than the budget add a growing back-off
+    with patch('src.reindexer.time.perf_counter', side_effect=[0.0, 0.5, 0.0, 0.5]):
+        reindexer._throttle(live_store, [0.0], busy_seconds=1.0)
+        reindexer._throttle(live_store, [0.0], busy_seconds=1.0)
+    assert reindexer._cancel.wait.call_args_list[-2].args == (3.5,)
+    assert reindexer._cancel.wait.call_args_list[-1].args == (4.0,)
+
+
+def test_apply_config_rebuilds_in_background_instead_of_in_place(tmp_path):
+    """Test that chunk and model changes start a rebuild and keep the live index."""
+    config = make_config(tmp_path)
+    with patch('src.chat_handler.ModelManager'), \
+         patch('src.reindexer.Retriever') as retriever, \
+         patch('src.chat_handler.DocumentLoader'), \
+         patch('src.chat_handler.BackgroundReindexer') as reindexer:
+        retriever.return_value.vectorstore.generation = None
+        retriever.return_value.vectorstore.load_manifest.return_value = {}
+        handler = ChatHandler(config)
+        assert load_active_index(str(tmp_path))['generation'] is None
+        assert handler._reindex_target is None
+        live_retriever = handler.retriever
+        handler.process_documents = MagicMock()
+
+        changes = handler.apply_config(make_config(tmp_path, chunk_size=500))
+        assert changes['chunking']
+        handler.process_documents.assert_not_called()
+        reindexer.return_value.start.assert_called_once()
+        assert handler.retriever is live_retriever
+        assert handler.index_config['chunk_size'] == 1000  # Live index keeps its chunking
+
+
+def test_rebuild_is_discarded_when_config_moved_on(tmp_path, handler):
+    """Test that a rebuild finishing after a config change is not switched to."""
+    handler.switch_index.return_value = False
+    config = make_config(tmp_path, embedding={'model': 'new-model'})
+    reindexer, retriever, drop = run_rebuild(handler, config)
+
+    assert reindexer.progress()['state'] == 'cancelled'
+    drop.assert_called_with(handler.retriever.vectorstore.client, str(tmp_path), {reindexer.generation})
+
+
+def test_switch_index_waits_for_queries_and_checks_config(tmp_path):
+    """Test that switching is serialized with queries and skipped for stale settings."""
+    config = make_config(tmp_path)
+    with patch('src.chat_handler.ModelManager'), \
+         patch('src.reindexer.Retriever') as retriever, \
+         patch('src.chat_handler.DocumentLoader'):
+        retriever.return_value.vectorstore.generation = None
+        retriever.return_value.vectorstore.load_manifest.return_value = {}
+        handler = ChatHandler(config)
+    handler.process_documents = MagicMock()
+    new_retriever = MagicMock()
+    new_retriever.vectorstore.generation = "g1"
+
+    # An index built for settings the config no longer has is not switched to
+    assert handler.switch_index(new_retriever, make_config(tmp_path, chunk_size=500)) is False
+    assert handler.retriever is not new_retriever
+
+    results = []
+    with handler._state_lock.read():  # A query in flight
+        switch = threading.Thread(target=lambda: results.append(handler.switch_index(new_retriever, config)))
+        switch.start()
+        switch.join(0.2)
+        assert switch.is_alive() and handler.retriever is not new_retriever
+    switch.join(5)
+    assert results == [True] and handler.retriever is new_retriever
+    assert load_active_index(str(tmp_path))['generation'] == "g1"
+    handler.process_documents.assert_called_once()
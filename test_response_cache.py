@@ -0,0 +1,64 @@
+"""Unit tests for ResponseCache functionality."""
+import itertools
+import pytest
+from unittest.mock import patch
+from src.models.response_cache import ResponseCache
+
+@pytest.fixture
+def cache(tmp_path):
+    """Fixture providing a small cache in a temporary directory."""
+    return ResponseCache(str(tmp_path / 'responses.sqlite'), max_entries=2, ttl_seconds=60)
+
+def make_key(prompt, index_version='v1', temperature=0.2):
+    """Build a cache key for a test prompt."""
+    return ResponseCache.make_key('mistral', {'temperature': temperature}, prompt, index_version)
+
+def test_key_depends_on_all_inputs():
+    """Test that model params, prompt and index version change the key."""
+    key = make_key('question')
+    assert key == make_key('question')
+    assert key != make_key('other question')
+    assert key != make_key('question', index_version='v2')
+    assert key != make_key('question', temperature=0.3)
+
+def test_put_get_and_persistence(cache, tmp_path):
+    """Test that responses survive reopening the cache file."""
+    cache.put(make_key('q'), 'answer', 'v1')
+    assert cache.get(make_key('q')) == 'answer'
+    assert cache.get(make_key('missing')) is None
+
+    reopened = ResponseCache(str(tmp_path / 'responses.sqlite'))
+    assert reopened.get(make_key('q')) == 'answer'
+    assert cache.get_stats()['hit_rate'] == 0.5
+
+def test_lru_eviction(cache):
+    """Test that the least recently used entry is evicted first."""
+    clock = itertools.count(1.0)
+    with patch('src.models.response_cache.time.time', side_effect=lambda: next(clock)):
+        cache.put(make_key('a'), 'A')
+        cache.put(make_key('b'), 'B')
+        cache.get(make_key('a'))  # Touch 'a' so 'b' becomes least recently used
+        cache.put(make_key('c'), 'C')
+        assert cache.get(make_key('b')) is None
+        assert cache.get(make_key('a')) == 'A'
+        assert cache.get(make_key('c')) == 'C'
+
+def test_ttl_expiry(cache):
+    """Test that expired entries are not served."""
+    with patch('src.models.response_cache.time.time', return_value=0.0):
+        cache.put(make_key('q'), 'old answer')
+    with patch('src.models.response_cache.time.time', return_value=120.0):
+        assert cache.get(make_key('q')) is None
+
+def test_invalidate_other_index_versions(cache):
+    """Test that a new index version drops answers built on old documents."""
+    cache.put(make_key('q', 'v1'), 'old', 'v1')
+    cache.put(make_key('q', 'v2'), 'new', 'v2')
+    cache.invalidate('v2')
+    assert cache.get(make_key('q', 'v1')) is None
+    assert cache.get(make_key('q', 'v2')) == 'new'
+
+def test_bypass_for_high_temperature(cache):
+    """Test the temperature threshold for caching."""
+    assert cache.should_bypass(0.9)
+    assert not cache.should_bypass(0.8)
@@ -0,0 +1,54 @@
+"""Unit tests for redundancy-aware result selection."""
+from src.result_diversifier import ResultDiversifier, merge_adjacent_chunks, mmr_select
+
+TEXT = "abcdefghijklmnopqrstuvwxyz"
+
+
+def chunk(start, end, distance, source='doc.md', embedding=None):
+    """Create a retrieved chunk covering TEXT[start:end]."""
+    result = {
+        'content': TEXT[start:end],
+        'metadata': {'source': source, 'chunk_start': start, 'chunk_end': end},
+        'distance': distance
+    }
+    if embedding is not None:
+        result['embedding'] = embedding
+    return result
+
+
+def test_merge_overlapping_and_touching_chunks():
+    """Test that overlapping spans of one file are merged without repeating text."""
+    merged = merge_adjacent_chunks([
+        chunk(8, 14, 0.4), chunk(0, 10, 0.2), chunk(14, 18, 0.6),
+        chunk(20, 26, 0.3), chunk(0, 10, 0.1, source='other.md')
+    ])
+    assert [(c['metadata']['source'], c['content']) for c in merged] == [
+        ('other.md', TEXT[0:10]), ('doc.md', TEXT[0:18]), ('doc.md', TEXT[20:26])
+    ]
+    assert merged[1]['distance'] == 0.2
+    assert merged[1]['metadata']['merged_chunks'] == 3
+    assert merged[1]['metadata']['chunk_end'] == 18
+
+
+def test_mmr_skips_near_duplicates():
+    """Test that MMR prefers a distinct candidate over a near-duplicate."""
+    query = [1.0, 1.0]
+    candidates = [[1.0, 0.9], [1.0, 0.89], [0.2, 1.0]]
+    assert mmr_select(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+    assert mmr_select(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_select_drops_embeddings_and_merges():
+    """Test the full selection on an over-fetched candidate set."""
+    diversifier = ResultDiversifier(fetch_k=4, lambda_mult=0.5)
+    candidates = [
+        chunk(0, 10, 0.1, embedding=[1.0, 0.0]),
+        chunk(0, 10, 0.1, source='copy.md', embedding=[1.0, 0.0]),
+        chunk(8, 16, 0.2, embedding=[0.8, 0.6]),
+        chunk(20, 26, 0.9, embedding=[-1.0, 0.2])
+    ]
+    selected = diversifier.select([1.0, 0.3], candidates, k=2)
+
+    assert diversifier.candidates_for(2) == 4
+    assert [c['content'] for c in selected] == [TEXT[0:16]]
+    assert 'embedding' not in selected[0]
@@ -68,3 +68,12 @@ def test_empty_query(mock_vectorstore):
         retriever = Retriever("test_path")
         results = retriever.retrieve_relevant_chunks("")
         assert results == []
+
+def test_retrieve_with_scope(mock_vectorstore):
+    """Test that a retrieval scope is passed to the vector store."""
+    mock_vectorstore.query.return_value = []
+    scope = {'file_name': ['python.md'], 'tags': ['basics']}
+    with patch('src.retriever.VectorStore', return_value=mock_vectorstore):
+        retriever = Retriever("test_path")
+        retriever.retrieve_relevant_chunks("What is Python?", scope=scope)
+        mock_vectorstore.query.assert_called_once_with("What is Python?", n_results=3, scope=scope)
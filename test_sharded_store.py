@@ -0,0 +1,94 @@
+"""Unit tests for ShardedVectorStore functionality."""
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from src.vectorstore.chunk_text import ChunkTextResolver
+from src.vectorstore.sharded_store import ShardedVectorStore
+
+def make_store(strategy='directory', num_shards=4):
+    """Create a sharded store without loading models or opening Chroma."""
+    store = ShardedVectorStore.__new__(ShardedVectorStore)
+    store.strategy = strategy
+    store.num_shards = num_shards
+    store.executor = ThreadPoolExecutor(max_workers=2)
+    store.shards = {}
+    store._sources_by_name = None
+    store.text_resolver = ChunkTextResolver()
+    return store
+
+def make_shard(distances):
+    """Create a mock shard collection returning the given distances."""
+    collection = MagicMock()
+    collection.count.return_value = len(distances)
+    collection.query.return_value = {
+        'documents': [[f"doc {d}" for d in distances]],
+        'metadatas': [[{'distance': d} for d in distances]],
+        'distances': [distances]
+    }
+    return collection
+
+def test_shard_for_source_by_directory():
+    """Test that files in the same directory share a shard."""
+    store = make_store()
+    assert store.shard_for_source('docs/a/x.md') == store.shard_for_source('docs/a/y.md')
+    assert store.shard_for_source('docs/a/x.md') != store.shard_for_source('docs/b/x.md')
+    assert store.shard_for_source('docs/a/x.md').startswith('dir-docs-a-')
+
+def test_shard_for_source_by_hash():
+    """Test that hash sharding is stable and bounded."""
+    store = make_store(strategy='hash', num_shards=3)
+    shards = {store.shard_for_source(f'docs/{i}.md') for i in range(50)}
+    assert shards <= {'hash-0', 'hash-1', 'hash-2'}
+    assert store.shard_for_source('docs/1.md') == store.shard_for_source('docs/1.md')
+
+def test_scatter_gather_merges_top_k():
+    """Test that results from all shards are merged by distance."""
+    store = make_store()
+    shards = [make_shard([0.3, 0.9]), make_shard([0.1, 0.5]), make_shard([])]
+    results = store._scatter_gather(shards, [0.0, 1.0], n_results=3)
+    assert [r['distance'] for r in results] == [0.1, 0.3, 0.5]
+    shards[2].query.assert_not_called()
+
+def test_invalid_strategy():
+    """Test that unknown strategies are rejected."""
+    with pytest.raises(ValueError):
+        ShardedVectorStore("unused", config={'sharding': {'strategy': 'random'}})
+
+def test_build_where_from_scope():
+    """Test translation of a retrieval scope into a Chroma filter."""
+    assert ShardedVectorStore.build_where(None) is None
+    assert ShardedVectorStore.build_where({'section': 'Install'}) == {'section': 'Install'}
+    assert ShardedVectorStore.build_where({'file_name': ['a.md'], 'tags': ['Ops Guide']}) == {
+        '$and': [{'file_name': {'$in': ['a.md']}}, {'tag_ops_guide': True}]
+    }
+
+def test_scoped_query_only_searches_selected_sources():
+    """Test that per-source sub-indexes limit the shards searched."""
+    store = make_store(strategy='source')
+    store.load_manifest = MagicMock(return_value={'files': {'docs/a.md': 'x', 'docs/b.md': 'y'}})
+    store.shards = {
+        store.shard_for_source('docs/a.md'): 'shard-a',
+        store.shard_for_source('docs/b.md'): 'shard-b'
+    }
+    assert store._shards_in_scope({'file_name': ['b.md']}) == ['shard-b']
+    assert store._shards_in_scope({'source': ['docs/a.md']}) == ['shard-a']
+    assert len(store._shards_in_scope({'section': 'Intro'})) == 2
+    assert store._shards_in_scope({'file_name': ['a.md']}) == ['shard-a']
+    store.load_manifest.assert_called_once()  # File name lookup is cached
+
+def test_file_name_lookup_follows_manifest_changes(tmp_path):
+    """Test that the cached file name lookup is rebuilt after the manifest changes."""
+    store = make_store(strategy='source')
+    store.persist_dir, store.generation = str(tmp_path), None
+    store.save_manifest({'files': {'docs/a.md': 'x'}})
+    shard_b = store.shard_for_source('docs/new/b.md')
+    store.shards = {store.shard_for_source('docs/a.md'): 'shard-a', shard_b: 'shard-b'}
+    assert store._shards_in_scope({'file_name': ['b.md']}) == []
+
+    store.save_manifest({'files': {'docs/a.md': 'x', 'docs/new/b.md': 'y'}})
+    assert store._shards_in_scope({'file_name': ['b.md']}) == ['shard-b']
+
+    store.client = MagicMock()
+    store.shards[shard_b] = MagicMock()
+    store.drop_shard(shard_b)
+    assert store._shards_in_scope({'file_name': ['b.md']}) == []
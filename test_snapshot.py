@@ -0,0 +1,84 @@
+"""Unit tests for index manifests and snapshots."""
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from src.vectorstore.embeddings import EmbeddingModelMismatchError
+from src.vectorstore.manifest import build_manifest, diff_manifest
+from src.vectorstore.snapshot import export_snapshot, import_snapshot, read_snapshot
+
+FINGERPRINT = {'embedding_model': 'all-MiniLM-L6-v2', 'embedding_dim': 3}
+
+@pytest.fixture
+def documents():
+    """Fixture providing loaded documents."""
+    return [
+        {'content': 'Python docs', 'metadata': {'source': 'docs/python.md'}},
+        {'content': 'Chroma docs', 'metadata': {'source': 'docs/chroma.md'}}
+    ]
+
+@pytest.fixture
+def store():
+    """Fixture providing a mock vector store with two records."""
+    mock = MagicMock()
+    mock.fingerprint = FINGERPRINT
+    mock.load_manifest.return_value = {'chunk_size': 1000, 'chunk_overlap': 200, 'files': {}}
+    mock.export_records.return_value = {
+        'ids': ['a-0', 'b-0'],
+        'embeddings': [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]],
+        'documents': ['Python docs', 'Chroma docs'],
+        'metadatas': [{'source': 'a'}, {'source': 'b'}]
+    }
+    return mock
+
+def test_diff_manifest_detects_changed_and_removed(documents):
+    """Test that only changed, new and deleted files are reported."""
+    indexed = build_manifest(documents, 1000, 200)
+    documents[0]['content'] = 'Python docs, updated'
+    documents.append({'content': 'New', 'metadata': {'source': 'docs/new.md'}})
+    indexed['files']['docs/old.md'] = 'deadbeef'
+
+    changed, removed = diff_manifest(indexed, build_manifest(documents, 1000, 200))
+    assert sorted(changed) == ['docs/new.md', 'docs/python.md']
+    assert removed == ['docs/old.md']
+
+def test_diff_manifest_reindexes_all_on_chunking_change(documents):
+    """Test that new chunking settings invalidate every file."""
+    indexed = build_manifest(documents, 1000, 200)
+    changed, removed = diff_manifest(indexed, build_manifest(documents, 500, 100))
+    assert len(changed) == 2
+    assert len(removed) == 2
+
+def test_snapshot_round_trip(store, tmp_path):
+    """Test export followed by a memory-mapped import."""
+    path = str(tmp_path / 'index.snap')
+    header = export_snapshot(store, path)
+    assert header['vectors_offset'] % 64 == 0
+
+    snapshot = read_snapshot(path)
+    assert isinstance(snapshot['vectors'], np.memmap)
+    np.testing.assert_allclose(snapshot['vectors'], [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]], rtol=1e-6)
+
+    target = MagicMock()
+    target.fingerprint = FINGERPRINT
+    manifest = import_snapshot(target, path)
+    assert manifest == store.load_manifest.return_value
+    ids, vectors, docs, metas = target.add_records.call_args[0]
+    assert ids == ['a-0', 'b-0']
+    assert docs == ['Python docs', 'Chroma docs']
+    target.save_manifest.assert_called_once_with(manifest)
+
+def test_snapshot_rejects_other_embedding_model(store, tmp_path):
+    """Test that a snapshot from another embedding model is refused."""
+    path = str(tmp_path / 'index.snap')
+    export_snapshot(store, path)
+    target = MagicMock()
+    target.fingerprint = {'embedding_model': 'bge-small-en', 'embedding_dim': 3}
+    with pytest.raises(EmbeddingModelMismatchError):
+        import_snapshot(target, path)
+
+def test_read_snapshot_rejects_foreign_file(tmp_path):
+    """Test that non-snapshot files are rejected."""
+    path = tmp_path / 'bogus.snap'
+    path.write_bytes(b'x' * 64)
+    with pytest.raises(ValueError):
+        read_snapshot(str(path))
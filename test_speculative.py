@@ -0,0 +1,34 @@
+"""Unit tests for speculative decoding helpers."""
+import numpy as np
+import pytest
+from src.models.speculative import AcceptanceTracker, create_draft_model
+
+def test_acceptance_tracker_counts_accepted_prefix():
+    """Test acceptance is the matched prefix of the previous draft."""
+    drafts = iter([np.array([5, 6, 7], dtype=np.intc), np.array([9], dtype=np.intc)])
+    tracker = AcceptanceTracker(lambda ids, **kwargs: next(drafts), 'test')
+
+    tracker(np.array([1, 2, 3], dtype=np.intc))
+    # Target accepted 5 and 6, then sampled 8 instead of 7
+    tracker(np.array([1, 2, 3, 5, 6, 8], dtype=np.intc))
+
+    stats = tracker.get_stats()
+    assert stats['proposed_tokens'] == 3
+    assert stats['accepted_tokens'] == 2
+    assert stats['acceptance_rate'] == pytest.approx(2 / 3)
+
+def test_acceptance_tracker_reset_discards_pending_draft():
+    """Test that a reset between requests does not count stale drafts."""
+    tracker = AcceptanceTracker(lambda ids, **kwargs: np.array([4], dtype=np.intc), 'test')
+    tracker(np.array([1], dtype=np.intc))
+    tracker.reset()
+    tracker(np.array([7, 8, 9], dtype=np.intc))
+    assert tracker.get_stats()['proposed_tokens'] == 0
+
+def test_create_draft_model_modes():
+    """Test draft model factory for each configured mode."""
+    assert create_draft_model({'mode': 'off'}) is None
+    assert create_draft_model({'mode': 'draft_model'}) is None
+    assert create_draft_model({'mode': 'prompt_lookup'}).mode == 'prompt_lookup'
+    with pytest.raises(ValueError):
+        create_draft_model({'mode': 'unknown'})
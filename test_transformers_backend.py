@@ -0,0 +1,100 @@
+"""Unit tests for the transformers backend and batched generation."""
+from unittest.mock import patch
+
+import pytest
+import torch
+from tokenizers import Tokenizer, models, pre_tokenizers
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+from src.models.model_manager import ModelManager
+from src.models.transformers_backend import TransformersBackend
+
+WORDS = "the a port install server run docs how what is".split()
+PROMPTS = ["how is the port", "a", "what docs run the install server"]
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    """Save a tiny randomly initialized GPT-2 model with a word-level tokenizer."""
+    path = tmp_path_factory.mktemp("tiny_gpt2")
+    vocab = {"<eos>": 0, "<unk>": 1, **{word: i + 2 for i, word in enumerate(WORDS)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="<eos>",
+                            unk_token="<unk>").save_pretrained(path)
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=len(vocab), n_positions=64, n_embd=16, n_layer=1, n_head=2,
+                        bos_token_id=0, eos_token_id=0)
+    GPT2LMHeadModel(config).save_pretrained(path)
+    return path
+
+
+def plain_options():
+    """Options without int8 quantization and static cache."""
+    return {'quantize_int8': False, 'static_cache': False, 'compile': False}
+
+
+def test_batch_is_left_padded_and_keeps_prompt_order(model_dir):
+    """Test that a padded batch gives the same greedy output as single prompts."""
+    backend = TransformersBackend(str(model_dir), options=plain_options())
+    assert backend.tokenizer.padding_side == 'left'
+    assert backend.tokenizer.pad_token == "<eos>"
+
+    batched = backend.generate(PROMPTS, max_new_tokens=4, temperature=0)
+    single = [backend.generate([prompt], max_new_tokens=4, temperature=0)[0] for prompt in PROMPTS]
+    assert batched == single
+
+
+def test_only_new_tokens_are_decoded(model_dir):
+    """Test that the prompt is not part of the returned text."""
+    backend = TransformersBackend(str(model_dir), options=plain_options())
+    prompt_ids = backend.tokenizer(PROMPTS, return_tensors='pt', padding=True)['input_ids']
+    new_ids = torch.full((len(PROMPTS), 2), WORDS.index("server") + 2)
+
+    with patch.object(backend.model, 'generate', return_value=torch.cat([prompt_ids, new_ids], dim=1)):
+        assert backend.generate(PROMPTS, max_new_tokens=2, temperature=0) == ["server server"] * len(PROMPTS)
+
+
+def test_int8_quantization_and_static_cache_options(model_dir):
+    """Test that the default options quantize Linear layers and preallocate the cache."""
+    backend = TransformersBackend(str(model_dir))
+    assert isinstance(backend.model.lm_head, torch.ao.nn.quantized.dynamic.Linear)
+    assert backend.model.generation_config.cache_implementation == 'static'
+    assert len(backend.generate(PROMPTS[:2], max_new_tokens=2, temperature=0)) == 2
+
+    backend = TransformersBackend(str(model_dir), options=plain_options())
+    assert isinstance(backend.model.lm_head, torch.nn.Linear)
+    assert backend.model.generation_config.cache_implementation != 'static'
+
+
+def test_compile_falls_back_to_eager_mode(model_dir):
+    """Test that generation works when torch.compile is missing or fails."""
+    options = {**plain_options(), 'compile': True}
+    with patch('src.models.transformers_backend.torch.compile', side_effect=RuntimeError("no compiler")):
+        backend = TransformersBackend(str(model_dir), options=options)
+    assert backend.generate(PROMPTS[:1], max_new_tokens=2, temperature=0)
+
+    with patch('src.models.transformers_backend.torch.compile', create=True) as compile_fn:
+        del torch.compile  # Reason: simulate PyTorch < 2.0 for the duration of the patch
+        backend = TransformersBackend(str(model_dir), options=options)
+    compile_fn.assert_not_called()
+    assert backend.generate(PROMPTS[:1], max_new_tokens=2, temperature=0)
+
+
+def test_model_manager_generates_batch_and_caches_responses(model_dir, tmp_path):
+    """Test the ModelManager.generate_batch path of transformers models."""
+    config = {
+        'models': {'tiny': {'path': str(model_dir / "model.safetensors"), 'max_tokens': 3, 'temperature': 0}},
+        'active_model': 'tiny',
+        'response_cache': {'enabled': True, 'path': str(tmp_path / "responses.sqlite")}
+    }
+    manager = ModelManager(config)
+    manager.load_model()
+    assert manager.supports_batching()
+
+    expected = manager.llm.generate(PROMPTS, max_new_tokens=3, temperature=0)
+    assert manager.generate_batch(PROMPTS) == expected
+
+    # Cached responses are served without generating again
+    with patch.object(manager.llm, 'generate', side_effect=AssertionError("not cached")):
+        assert manager.generate_batch(PROMPTS[::-1]) == expected[::-1]
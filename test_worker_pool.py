@@ -0,0 +1,159 @@
+"""Unit tests for the GGUF worker pool."""
+import itertools
+import os
+import queue
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.chat_handler import ChatHandler
+from src.models.model_manager import ModelManager
+from src.models.worker_pool import GGUFWorkerPool, _Worker, memory_usage
+
+
+def make_pool(num_workers: int) -> GGUFWorkerPool:
+    """Create a pool with in-process queues instead of worker processes."""
+    pool = GGUFWorkerPool.__new__(GGUFWorkerPool)
+    pool._lock = threading.Lock()
+    pool._closed = False
+    pool._request_ids = itertools.count()
+    pool._results = queue.Queue()
+    pool.workers = []
+    for worker_id in range(num_workers):
+        worker = _Worker(worker_id)
+        worker.process = MagicMock(pid=1000 + worker_id)
+        worker.requests = queue.Queue()
+        worker.ready.set()
+        pool.workers.append(worker)
+    return pool
+
+
+def test_memory_usage_reads_proc():
+    """Test RSS, PSS and shared memory of the current process."""
+    usage = memory_usage(os.getpid())
+    if usage is None:
+        pytest.skip("/proc/<pid>/smaps_rollup not available")
+    assert usage['rss'] > 0 and 0 < usage['pss'] <= usage['rss']
+    assert memory_usage(-1) is None
+
+
+def test_submit_dispatches_to_least_loaded_worker():
+    """Test that prompts spread over workers by requests in flight."""
+    pool = make_pool(3)
+    for i in range(5):
+        pool.submit(f"prompt {i}")
+    assert [w.requests.qsize() for w in pool.workers] == [2, 2, 1]
+
+    # Workers still loading after a restart only get work if no other is ready
+    pool = make_pool(3)
+    pool.workers[1].ready.clear()
+    pool.workers[2].error = "failed to load"
+    for i in range(2):
+        pool.submit(f"prompt {i}")
+    assert [w.requests.qsize() for w in pool.workers] == [2, 0, 0]
+    pool.workers[0].error = "failed to load"
+    pool.submit("prompt")
+    assert pool.workers[1].requests.qsize() == 1
+
+    pool.workers[1].error = "failed to load"
+    with pytest.raises(RuntimeError):
+        pool.submit("prompt")
+
+
+def test_results_resolve_futures_and_track_throughput():
+    """Test that worker results complete futures and update statistics."""
+    pool = make_pool(2)
+    futures = [pool.submit(f"prompt {i}") for i in range(3)]
+    for worker in pool.workers:
+        while not worker.requests.empty():
+            request_id, prompt = worker.requests.get()
+            if prompt == "prompt 2":
+                pool._results.put((worker.worker_id, request_id, None, "ValueError: bad prompt"))
+            else:
+                pool._results.put((worker.worker_id, request_id,
+                                   {'response': prompt.upper(), 'seconds': 0.5, 'tokens': 10}, None))
+    collector = threading.Thread(target=pool._collect, daemon=True)
+    collector.start()
+
+    assert futures[0].result(timeout=5) == "PROMPT 0"
+    assert futures[1].result(timeout=5) == "PROMPT 1"
+    with pytest.raises(RuntimeError, match="bad prompt"):
+        futures[2].result(timeout=5)
+    pool._closed = True
+    collector.join(timeout=5)
+
+    stats = pool.get_stats()
+    assert [s['completed'] for s in stats] == [1, 1]
+    assert stats[0]['tokens_per_second'] == 20.0
+    assert sum(s['failed'] for s in stats) == 1
+    assert all(s['in_flight'] == 0 for s in stats)
+
+
+class FakePool:
+    """Stand-in for GGUFWorkerPool recording how it is used."""
+
+    def __init__(self, config, model_name, num_workers, threads_per_worker):
+        """Record the pool settings and answer every prompt immediately."""
+        self.config = config
+        self.model_name = model_name
+        self.num_workers = num_workers
+        self.generate = MagicMock(side_effect=lambda prompt: f"answer to {prompt}")
+        self.generate_many = MagicMock(side_effect=lambda prompts: [f"answer to {p}" for p in prompts])
+        self.close = MagicMock()
+
+    def get_stats(self):
+        """Return fixed per-worker statistics."""
+        return [{'worker': 0}]
+
+
+def test_model_manager_serves_gguf_from_worker_pool():
+    """Test that GGUF generation goes through the pool when workers are configured."""
+    config = {
+        'models': {'local': {'path': 'model.gguf'}},
+        'active_model': 'local',
+        'serving': {'workers': 3}
+    }
+    with patch('src.models.model_manager.GGUFWorkerPool', FakePool), \
+         patch('src.models.model_manager.Llama') as llama:
+        manager = ModelManager(config)
+        manager.load_model()
+        pool = manager.llm
+        assert isinstance(pool, FakePool) and pool.num_workers == 3
+        llama.assert_not_called()
+
+        assert manager.supports_batching()
+        assert manager.generate_response("q") == "answer to q"
+        assert manager.generate_batch(["a", "b"]) == ["answer to a", "answer to b"]
+        pool.generate_many.assert_called_once_with(["a", "b"])
+        assert manager.get_worker_stats() == [{'worker': 0}]
+
+        # Reloading stops the old workers first
+        manager.load_model()
+        pool.close.assert_called_once()
+
+
+def test_reloaded_pool_runs_with_new_models_section():
+    """Test that workers restarted by a config change get the new model settings."""
+    config = {
+        'docs_dir': 'docs', 'vectorstore_path': 'vectorstore', 'chunk_size': 1000, 'chunk_overlap': 200,
+        'models': {'small': {'path': 'small.gguf', 'temperature': 0.7}},
+        'active_model': 'small',
+        'serving': {'workers': 2}
+    }
+    with patch('src.models.model_manager.GGUFWorkerPool', FakePool), \
+         patch('src.chat_handler.Retriever'), \
+         patch('src.chat_handler.DocumentLoader'):
+        handler = ChatHandler(config)
+        handler.model.load_model()
+
+        new_models = {'small': {'path': 'small.gguf', 'temperature': 0.2},
+                      'large': {'path': 'large.gguf', 'temperature': 0.7}}
+        handler.apply_config({**config, 'models': new_models, 'active_model': 'large'})
+        pool = handler.model.llm
+        assert pool.model_name == 'large'
+        assert pool.config['models'] == new_models
+
+        # Settings of the served model changed: the restarted workers see them
+        handler.model.apply_model_config({**new_models, 'large': {'path': 'large.gguf', 'temperature': 0.1}}, 'large')
+        assert handler.model.llm.config['models']['large']['temperature'] == 0.1